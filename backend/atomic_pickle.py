@@ -0,0 +1,32 @@
+from typing import Any, Optional
+import os
+import pickle
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def dump(path: str, format_version: int, payload: Any) -> None:
+    """Pickle ``payload`` under a format stamp.
+
+    The file is written next to ``path`` and renamed over it, so a reader
+    sees either the old file or the complete new one.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(
+            {"format": format_version, **payload}, f, protocol=pickle.HIGHEST_PROTOCOL
+        )
+    os.replace(tmp_path, path)
+
+
+def load(path: str, format_version: int) -> Optional[dict]:
+    """The payload written by ``dump``; None if the file is missing or stamped differently."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    if data.get("format") != format_version:
+        logger.warning(f"Ignoring {path}: format {data.get('format')}, expected {format_version}")
+        return None
+    return data
@@ -0,0 +1,197 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import copy
+import heapq
+import logging
+from lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text: str) -> str:
+    """Casefolded words joined by single spaces, matching how queries are typed."""
+    return " ".join(tokenize(text))
+
+
+class Autocomplete:
+    """Popularity-ranked prefix completion over titles and authors.
+
+    Entries are ranked by view popularity, then by how many titles the
+    author has in the catalogue. Completion keys live in one sorted list searched with ``bisect``; a
+    prefix maps to a contiguous key range. Each title is also keyed from
+    its first few word starts so "potter" finds "Harry Potter". Top
+    completions for short prefixes, whose ranges are large, are
+    precomputed. Longer prefixes with a large range walk their
+    three-character bucket in weight order and stop at ``n`` matches.
+    """
+
+    # Word starts within a title that get their own completion key
+    MAX_WORD_STARTS = 4
+    # Prefixes up to this length have their completions precomputed
+    PRECOMPUTED_PREFIX_LENGTH = 3
+    # Key ranges up to this size are ranked directly instead of walked
+    DIRECT_RANK_LIMIT = 512
+
+    def __init__(self, max_results: int = 20):
+        self.max_results = max_results
+        self.keys: List[str] = []
+        self.key_entries = array("I")  # key -> entry
+        self.texts: List[str] = []  # entry -> display text
+        self.kinds: List[str] = []  # entry -> "title" or "author"
+        self.book_ids = array("q")  # entry -> catalogue book id, 0 for authors
+        self.weights = array("f")  # entry -> view popularity
+        self.priors = array("f")  # entry -> the author's title count
+        self.author_entries = array("l")  # entry -> its author's entry, -1 for none
+        # Key positions, each bucket's slice reordered by descending weight
+        self.by_weight = array("I")
+        self._top: Dict[str, List[int]] = {}
+
+    @classmethod
+    def from_catalogue(
+        cls,
+        catalogue,
+        popularity: Optional[Dict[int, float]] = None,
+        max_results: int = 20,
+    ) -> "Autocomplete":
+        """Build completions for every title and author in the catalogue.
+
+        ``popularity`` maps book ids to their view counts; see
+        ``set_popularity``.
+        """
+        index = cls(max_results)
+        records = list(catalogue)
+        author_counts = Counter(record.author for record in records if record.author)
+
+        author_titles: Dict[str, List[int]] = {}
+        keyed = []
+        for record in records:
+            entry = index._add_entry(record.title, "title", record.book_id, author_counts.get(record.author, 1))
+            words = normalize(record.title).split()
+            for start in range(min(len(words), cls.MAX_WORD_STARTS)):
+                keyed.append((" ".join(words[start:]), entry))
+            if record.author:
+                author_titles.setdefault(record.author, []).append(entry)
+        for author, entries in author_titles.items():
+            entry = index._add_entry(author, "author", 0, len(entries))
+            for title_entry in entries:
+                index.author_entries[title_entry] = entry
+            keyed.append((normalize(author), entry))
+
+        keyed = [(key, entry) for key, entry in keyed if key]
+        keyed.sort()
+        index.keys = [key for key, _ in keyed]
+        index.key_entries = array("I", (entry for _, entry in keyed))
+        index.set_popularity(popularity or {})
+        logger.info(
+            f"Autocomplete built with {len(index.texts)} entries and {len(index.keys)} keys"
+        )
+        return index
+
+    def _add_entry(self, text: str, kind: str, book_id: int, prior: float) -> int:
+        self.texts.append(text)
+        self.kinds.append(kind)
+        self.book_ids.append(book_id)
+        self.weights.append(0.0)
+        self.priors.append(prior)
+        self.author_entries.append(-1)
+        return len(self.texts) - 1
+
+    def set_popularity(self, popularity: Dict[int, float]) -> None:
+        """Rank completions by ``popularity``, book ids mapped to view counts.
+
+        Authors get the sum of their books' counts. The rankings are
+        rebuilt aside and swapped in, so completions can be served
+        meanwhile.
+        """
+        weights = array("f", bytes(4 * len(self.texts)))
+        for entry, kind in enumerate(self.kinds):
+            if kind != "title":
+                continue
+            weight = popularity.get(self.book_ids[entry], 0.0)
+            weights[entry] = weight
+            if self.author_entries[entry] >= 0:
+                weights[self.author_entries[entry]] += weight
+        ranked = copy.copy(self)
+        ranked.weights = weights
+        ranked._precompute()
+        ranked._order_buckets()
+        self.weights, self._top, self.by_weight = ranked.weights, ranked._top, ranked.by_weight
+
+    def _range(self, prefix: str):
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def _rank(self, lo: int, hi: int, n: int) -> List[int]:
+        entries = dict.fromkeys(self.key_entries[lo:hi])
+        return heapq.nlargest(
+            n, entries, key=lambda e: (self.weights[e], self.priors[e], -len(self.texts[e]))
+        )
+
+    def _precompute(self) -> None:
+        prefixes = {
+            key[:length]
+            for key in self.keys
+            for length in range(1, self.PRECOMPUTED_PREFIX_LENGTH + 1)
+        }
+        self._top = {
+            prefix: self._rank(*self._range(prefix), self.max_results)
+            for prefix in prefixes
+        }
+
+    def _sort_key(self, position: int):
+        entry = self.key_entries[position]
+        return (-self.weights[entry], -self.priors[entry], len(self.texts[entry]))
+
+    def _order_buckets(self) -> None:
+        # A bucket is the run of keys sharing their first three characters
+        self.by_weight = array("I")
+        length = self.PRECOMPUTED_PREFIX_LENGTH
+        lo = 0
+        while lo < len(self.keys):
+            hi = lo + 1
+            while hi < len(self.keys) and self.keys[hi][:length] == self.keys[lo][:length]:
+                hi += 1
+            self.by_weight.extend(sorted(range(lo, hi), key=self._sort_key))
+            lo = hi
+
+    def _walk(self, prefix: str, lo: int, hi: int, n: int) -> List[int]:
+        """Heaviest entries keyed in [lo, hi), found by walking the bucket in weight order.
+
+        A large range is a large share of its bucket, so matches turn up early.
+        """
+        bucket_lo, bucket_hi = self._range(prefix[: self.PRECOMPUTED_PREFIX_LENGTH])
+        entries: Dict[int, None] = {}
+        for position in self.by_weight[bucket_lo:bucket_hi]:
+            if lo <= position < hi:
+                entries[self.key_entries[position]] = None
+                if len(entries) == n:
+                    break
+        return list(entries)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def complete(self, prefix: str, n: int = 10) -> List[Dict[str, Any]]:
+        """Up to ``n`` titles and authors starting with ``prefix``, most popular first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= self.PRECOMPUTED_PREFIX_LENGTH and n <= self.max_results:
+            entries = self._top.get(prefix, [])[:n]
+        else:
+            lo, hi = self._range(prefix)
+            if hi - lo > self.DIRECT_RANK_LIMIT and len(prefix) >= self.PRECOMPUTED_PREFIX_LENGTH:
+                entries = self._walk(prefix, lo, hi, n)
+            else:
+                entries = self._rank(lo, hi, n)
+        return [
+            {
+                "text": self.texts[e],
+                "type": self.kinds[e],
+                **({"id": str(self.book_ids[e])} if self.kinds[e] == "title" else {}),
+            }
+            for e in entries
+        ]
@@ -0,0 +1,304 @@
+"""Benchmark the search, book details and recommendation hot paths.
+
+Builds a synthetic catalogue in a temporary ChromaDB store using a
+deterministic stub embedding (no model download, no network), then
+measures latency percentiles and throughput and writes the results as
+JSON so runs can be compared:
+
+    python benchmark.py --books 10000 --output before.json
+    python benchmark.py --books 10000 --output after.json --compare before.json
+
+With --index-recall it also compares recall@k and latency of the Chroma
+index against the in-process quantized index at several re-rank factors.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+from unittest import mock
+from urllib.parse import quote
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import chromadb
+from csv_loader import book_id
+from similar_books import load_embeddings
+from vector_index import ChromaIndex, QuantizedIndex
+
+WORDS = (
+    "shadow river crown garden winter storm silent empire glass city "
+    "forgotten star hollow iron secret night summer ocean last golden "
+    "broken king queen wolf paper fire house road song dark light"
+).split()
+GENRES = [
+    "Fantasy", "Romance", "Mystery", "Thriller", "Fiction", "Nonfiction",
+    "History", "Science", "Horror", "Classics", "Poetry", "Biography",
+    "Young Adult", "Adventure", "Humor", "Memoir",
+]
+
+
+class StubEmbeddingFunction:
+    """Deterministic pseudo-random unit vectors seeded by a hash of the text."""
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        vectors = []
+        for text in input:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return vectors
+
+
+def synthetic_books(n_books: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    books = []
+    for i in range(n_books):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title() + f" {i}"
+        author = f"Author {rng.randint(1, max(1, n_books // 10))}"
+        genres = ", ".join(rng.sample(GENRES, rng.randint(1, 3)))
+        books.append(
+            {
+                "id": book_id(title, author),
+                "book_title": title,
+                "author": author,
+                "num_pages": rng.randint(80, 900),
+                "cover_image_uri": f"https://example.com/covers/{i}.jpg",
+                "book_details": " ".join(rng.choice(WORDS) for _ in range(60)),
+                "genres": genres,
+                "format": rng.choice(["Hardcover", "Paperback", "Kindle Edition"]),
+            }
+        )
+    return books
+
+
+def build_store(db_path: str, books: List[Dict[str, Any]], embed: StubEmbeddingFunction) -> None:
+    client = chromadb.PersistentClient(path=db_path)
+    collection = client.create_collection(
+        name="books", metadata={"description": "Books collection"}
+    )
+    batch_size = 5000
+    for i in range(0, len(books), batch_size):
+        batch = books[i : i + batch_size]
+        collection.add(
+            ids=[book["id"] for book in batch],
+            embeddings=[
+                v.tolist() for v in embed([f"{b['book_title']} {b['genres']}" for b in batch])
+            ],
+            documents=[book["book_title"] for book in batch],
+            metadatas=[
+                {k: book[k] for k in ("author", "num_pages", "cover_image_uri", "book_details", "genres", "format")}
+                for book in batch
+            ],
+        )
+    client.clear_system_cache()
+
+
+def load_app(db_path: str, embed: StubEmbeddingFunction):
+    """Import routes against the temporary store with Firebase initialization disabled."""
+    os.environ["BOOKS_DB_PATH"] = db_path
+    os.environ["VIEW_HISTORY_DB"] = ""
+    os.environ["COVIEW_DB"] = ""
+    os.environ["CATALOGUE_SNAPSHOT"] = os.path.join(os.path.dirname(db_path), "catalogue_snapshot.pickle")
+    os.environ["LEXICAL_INDEX_PATH"] = os.path.join(os.path.dirname(db_path), "lexical_index.pickle")
+    fake_cred = mock.Mock(project_id="benchmark")
+    with mock.patch("firebase_admin.credentials.Certificate", return_value=fake_cred), \
+            mock.patch("firebase_admin.initialize_app"):
+        import routes
+    routes.recommendation_system.embedding_function = embed
+    return routes
+
+
+def measure(fn: Callable[[Any], Any], inputs: List[Any], threads: int) -> Dict[str, float]:
+    latencies: List[float] = []
+
+    def timed(arg):
+        start = time.perf_counter()
+        fn(arg)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(timed, inputs))
+    else:
+        for arg in inputs:
+            timed(arg)
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = (float(x) * 1000 for x in np.percentile(latencies, [50, 95, 99]))
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+    }
+
+
+def index_recall(
+    db_path: str, workdir: str, queries: List[List[float]], k: int
+) -> Dict[str, Any]:
+    """Recall@k against exact search, latency and size for each vector index."""
+    collection = chromadb.PersistentClient(path=db_path).get_collection("books")
+    ids, embeddings = load_embeddings(collection)
+    truth = [
+        {ids[row] for row in np.argsort(-(embeddings @ np.asarray(q, dtype=np.float32)))[:k]}
+        for q in queries
+    ]
+
+    index_path = os.path.join(workdir, "quantized_index")
+    start = time.perf_counter()
+    QuantizedIndex.build(ids, embeddings, index_path)
+    build_seconds = time.perf_counter() - start
+
+    indexes = {"chroma": ChromaIndex(collection)}
+    start = time.perf_counter()
+    quantized = QuantizedIndex.load(index_path)
+    load_seconds = time.perf_counter() - start
+    for factor in (1, 2, 4, 8):
+        indexes[f"quantized_rerank_{factor}"] = QuantizedIndex(
+            quantized.ids, quantized.codes, quantized.scales, quantized.vectors, rerank_factor=factor
+        )
+
+    results = {}
+    for name, index in indexes.items():
+        found = [set(index.query([q], k)[0]) for q in queries]
+        recall = float(np.mean([len(f & t) / k for f, t in zip(found, truth)]))
+        results[name] = measure(lambda q: index.query([q], k), queries, 1) | {
+            f"recall_at_{k}": round(recall, 4)
+        }
+    return {
+        "indexes": results,
+        "quantized_build_seconds": round(build_seconds, 2),
+        "quantized_load_seconds": round(load_seconds, 4),
+        "float32_bytes": int(embeddings.nbytes),
+        "int8_bytes": int(quantized.codes.nbytes + quantized.scales.nbytes),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    embed = StubEmbeddingFunction(args.dim)
+    books = synthetic_books(args.books, args.seed)
+    workdir = tempfile.mkdtemp(prefix="library-bench-")
+    try:
+        db_path = os.path.join(workdir, "db_storage")
+        start = time.perf_counter()
+        build_store(db_path, books, embed)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        routes = load_app(db_path, embed)
+        startup_seconds = time.perf_counter() - start
+        system = routes.recommendation_system
+        test_client = routes.app.test_client()
+
+        query_pool = [
+            rng.choice([rng.choice(GENRES), " ".join(rng.sample(WORDS, 2))])
+            for _ in range(args.query_pool)
+        ]
+        queries = [rng.choice(query_pool) for _ in range(args.requests)]
+
+        users = [f"user-{i}" for i in range(args.users)]
+        for user_id in users:
+            for book in rng.sample(books, rng.randint(1, 5)):
+                system.add_to_view_history(user_id, book["book_title"], book["genres"].split(", "))
+        recommend_users = [rng.choice(users) for _ in range(args.requests)]
+
+        detail_titles = [rng.choice(books)["book_title"] for _ in range(args.requests)]
+
+        results = {
+            "search_books": measure(
+                lambda q: system.search_books("bench", q, 10), queries, args.threads
+            ),
+            "recommend_books_based_on_history": measure(
+                lambda u: system.recommend_books_based_on_history(u), recommend_users, args.threads
+            ),
+            "book_details": measure(
+                lambda t: test_client.get(f"/api/book_details/{quote(t)}"),
+                detail_titles,
+                args.threads,
+            ),
+        }
+        recall = None
+        if args.index_recall:
+            recall = index_recall(
+                db_path,
+                workdir,
+                [v.tolist() for v in embed(query_pool[: args.recall_queries])],
+                args.recall_k,
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "config": vars(args) | {"output": None, "compare": None},
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "chromadb": chromadb.__version__,
+        },
+        "setup": {
+            "build_store_seconds": round(build_seconds, 2),
+            "app_startup_seconds": round(startup_seconds, 2),
+        },
+        "results": results,
+    } | ({"index_recall": recall} if recall else {})
+
+
+def compare(current: Dict[str, Any], baseline_path: str, tolerance: float) -> bool:
+    """Print per-path p95 changes; False if any regressed beyond ``tolerance``."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    ok = True
+    for name, stats in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms ({change:+.1%}){flag}")
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark search, details and recommendations")
+    parser.add_argument("--books", type=int, default=10_000, help="Synthetic catalogue size")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per measured path")
+    parser.add_argument("--users", type=int, default=500, help="Users with synthetic view history")
+    parser.add_argument("--query-pool", type=int, default=500, help="Distinct search queries")
+    parser.add_argument("--threads", type=int, default=1, help="Concurrent client threads")
+    parser.add_argument("--dim", type=int, default=64, help="Stub embedding dimension")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--index-recall", action="store_true", help="Also compare Chroma and quantized index recall")
+    parser.add_argument("--recall-queries", type=int, default=200, help="Queries used for the recall comparison")
+    parser.add_argument("--recall-k", type=int, default=10, help="Neighbours compared for recall")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p95 slowdown before failing")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    if args.compare and not compare(report, args.compare, args.tolerance):
+        sys.exit(1)
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import contextvars
+from typing import Any, Callable
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """Raised when the pool's concurrency limit is reached or a call times out."""
+
+
+class BlockingPool:
+    """Bounded thread pool for blocking calls such as vector queries and token checks.
+
+    At most ``max_workers`` calls run at once and at most ``max_pending``
+    more may wait; beyond that callers get ``Overloaded`` right away instead
+    of queueing behind a slow query.
+    """
+
+    def __init__(self, max_workers: int = 8, max_pending: int = 32, timeout: float = 10.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="blocking"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded("Too many concurrent requests")
+        try:
+            # Run in a copy of the caller's context so request traces follow the call
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            logger.warning(f"Blocking call {getattr(fn, '__name__', fn)} timed out")
+            raise Overloaded("Request timed out")
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
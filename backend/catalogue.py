@@ -0,0 +1,285 @@
+from array import array
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import re
+import sys
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_num_pages(value: Any) -> int:
+    """Page count as an int, -1 when missing or unparseable."""
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if value is None or value == "":
+        return -1
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        digits = re.search(r"\d+", str(value))
+        return int(digits.group()) if digits else -1
+
+
+class BookRecord:
+    """Lightweight view of one catalogue row; holds no copies of the data."""
+
+    __slots__ = ("_catalogue", "row")
+
+    def __init__(self, catalogue: "Catalogue", row: int):
+        self._catalogue = catalogue
+        self.row = row
+
+    @property
+    def book_id(self) -> int:
+        return self._catalogue.book_ids[self.row]
+
+    @property
+    def chroma_id(self) -> str:
+        return self._catalogue.chroma_ids[self.row]
+
+    @property
+    def title(self) -> str:
+        return self._catalogue.titles[self.row]
+
+    @property
+    def author(self) -> str:
+        return self._catalogue.authors[self._catalogue.author_codes[self.row]]
+
+    @property
+    def num_pages(self) -> Any:
+        pages = self._catalogue.num_pages[self.row]
+        return pages if pages >= 0 else ""
+
+    @property
+    def genre_codes(self) -> array:
+        offsets = self._catalogue.genre_offsets
+        return self._catalogue.genre_codes[offsets[self.row] : offsets[self.row + 1]]
+
+    @property
+    def genres(self) -> List[str]:
+        names = self._catalogue.genre_names
+        return [names[code] for code in self.genre_codes]
+
+    @property
+    def genres_text(self) -> str:
+        return ", ".join(self.genres)
+
+    @property
+    def format(self) -> str:
+        return self._catalogue.formats[self._catalogue.format_codes[self.row]]
+
+    @property
+    def cover_image_uri(self) -> str:
+        return self._catalogue.cover_uris[self.row]
+
+    @property
+    def book_details(self) -> str:
+        return self._catalogue.details[self.row]
+
+    @property
+    def available(self) -> bool:
+        return bool(self._catalogue.available[self.row])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": str(self.book_id),
+            "title": self.title,
+            "author": self.author,
+            "num_pages": self.num_pages,
+            "cover_image_uri": self.cover_image_uri,
+            "book_details": self.book_details,
+            "genres": self.genres_text,
+            "available": self.available,
+        }
+
+
+class Catalogue:
+    """Column-oriented, in-memory copy of the ``books`` collection.
+
+    Authors, genres and formats are interned and stored as integer codes;
+    each book's genres live in one flat code array addressed by offsets.
+    Every book has a stable integer id derived from its collection id.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self):
+        self.chroma_ids: List[str] = []
+        self.book_ids = array("q")
+        self.titles: List[str] = []
+        self.author_codes = array("I")
+        self.authors: List[str] = []
+        self.num_pages = array("i")
+        self.genre_codes = array("I")
+        self.genre_offsets = array("I", [0])
+        self.genre_names: List[str] = []
+        self.format_codes = array("H")
+        self.formats: List[str] = []
+        self.cover_uris: List[str] = []
+        self.details: List[str] = []
+        self.available = array("b")
+
+        self._codes: Dict[int, Dict[str, int]] = {}
+        self._by_chroma_id: Dict[str, int] = {}
+        self._by_book_id: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        # Rows ordered by book id for keyset paging, rebuilt after changes
+        self._changes = 0
+        self._sorted = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.__dict__.setdefault("_changes", 0)
+        self.__dict__.setdefault("_sorted", None)
+
+    @staticmethod
+    def stable_book_id(chroma_id: str) -> int:
+        """Positive 60-bit id taken from the collection's hex id."""
+        try:
+            return int(chroma_id.replace("-", "")[:15], 16)
+        except ValueError:
+            return int.from_bytes(chroma_id.encode("utf-8")[-7:], "big")
+
+    @classmethod
+    def from_collection(cls, collection) -> "Catalogue":
+        """Load every book by paging through the collection once."""
+        catalogue = cls()
+        offset = 0
+        while True:
+            page = collection.get(
+                limit=cls.PAGE_SIZE,
+                offset=offset,
+                include=["documents", "metadatas"],
+            )
+            if not page["ids"]:
+                break
+            for chroma_id, title, metadata in zip(
+                page["ids"], page["documents"], page["metadatas"]
+            ):
+                catalogue.add(chroma_id, title, metadata)
+            offset += len(page["ids"])
+        logger.info(
+            f"Catalogue loaded with {len(catalogue)} books, "
+            f"{len(catalogue.authors)} authors, {len(catalogue.genre_names)} genres"
+        )
+        return catalogue
+
+    def _code(self, values: List[str], kind: int, value: str) -> int:
+        lookup = self._codes.setdefault(kind, {})
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(values)
+            values.append(sys.intern(value))
+        return code
+
+    def add(self, chroma_id: str, title: str, metadata: Optional[Dict[str, Any]]) -> int:
+        """Append a book and return its row; a re-added id points at the new row."""
+        metadata = metadata or {}
+        genres = metadata.get("genres", "")
+        if isinstance(genres, str):
+            genres = [g.strip() for g in genres.split(",") if g.strip()]
+
+        with self._lock:
+            row = len(self.titles)
+            book_id = self.stable_book_id(chroma_id)
+            self.chroma_ids.append(chroma_id)
+            self.book_ids.append(book_id)
+            self.titles.append(title or "")
+            self.author_codes.append(
+                self._code(self.authors, 0, str(metadata.get("author", "")))
+            )
+            self.num_pages.append(parse_num_pages(metadata.get("num_pages")))
+            for genre in genres:
+                self.genre_codes.append(self._code(self.genre_names, 1, str(genre)))
+            self.genre_offsets.append(len(self.genre_codes))
+            self.format_codes.append(
+                self._code(self.formats, 2, str(metadata.get("format", "")))
+            )
+            self.cover_uris.append(str(metadata.get("cover_image_uri", "")))
+            self.details.append(str(metadata.get("book_details", "")))
+            self.available.append(1 if metadata.get("available", True) else 0)
+
+            previous = self._by_book_id.get(book_id)
+            if previous is not None and self.chroma_ids[previous] != chroma_id:
+                logger.warning(
+                    f"Book id {book_id} of {chroma_id} collides with "
+                    f"{self.chroma_ids[previous]}; only the newer book is served by id"
+                )
+            self._by_chroma_id[chroma_id] = row
+            self._by_book_id[book_id] = row
+            self._changes += 1
+        return row
+
+    def __len__(self) -> int:
+        return len(self._by_chroma_id)
+
+    def __iter__(self):
+        for row in self._by_chroma_id.values():
+            yield BookRecord(self, row)
+
+    def record(self, row: int) -> BookRecord:
+        return BookRecord(self, row)
+
+    def get(self, book_id: int) -> Optional[BookRecord]:
+        row = self._by_book_id.get(book_id)
+        return BookRecord(self, row) if row is not None else None
+
+    def by_chroma_id(self, chroma_id: str) -> Optional[BookRecord]:
+        row = self._by_chroma_id.get(chroma_id)
+        return BookRecord(self, row) if row is not None else None
+
+    def _sorted_rows(self) -> Tuple[array, array]:
+        """(book ids, rows) of current books in ascending book id order."""
+        with self._lock:
+            if self._sorted is None or self._sorted[0] != self._changes:
+                rows = sorted(self._by_book_id.values(), key=self.book_ids.__getitem__)
+                book_ids = array("q", (self.book_ids[row] for row in rows))
+                self._sorted = (self._changes, book_ids, array("I", rows))
+            return self._sorted[1], self._sorted[2]
+
+    def page(
+        self,
+        after: Optional[int] = None,
+        limit: int = 100,
+        predicate: Optional[Callable[[BookRecord], bool]] = None,
+    ) -> Tuple[List[BookRecord], Optional[int]]:
+        """Up to ``limit`` books with ids above the ``after`` cursor, in id order.
+
+        Returns the records and the cursor for the next page, or None when
+        there are no more books.
+        """
+        book_ids, rows = self._sorted_rows()
+        start = bisect_right(book_ids, after) if after is not None else 0
+        records: List[BookRecord] = []
+        position = start
+        while position < len(rows) and len(records) < limit:
+            record = BookRecord(self, rows[position])
+            position += 1
+            if predicate is None or predicate(record):
+                records.append(record)
+        next_cursor = book_ids[position - 1] if position < len(rows) and records else None
+        return records, next_cursor
+
+    def hydrate(self, collection, chroma_ids: Iterable[str]) -> List[BookRecord]:
+        """Records for query result ids, fetching any the catalogue has not seen."""
+        chroma_ids = list(chroma_ids)
+        missing = [i for i in chroma_ids if i not in self._by_chroma_id]
+        if missing:
+            page = collection.get(ids=missing, include=["documents", "metadatas"])
+            for chroma_id, title, metadata in zip(
+                page["ids"], page["documents"], page["metadatas"]
+            ):
+                self.add(chroma_id, title, metadata)
+        return [
+            BookRecord(self, self._by_chroma_id[i])
+            for i in chroma_ids
+            if i in self._by_chroma_id
+        ]
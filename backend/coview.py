@@ -0,0 +1,257 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import heapq
+import math
+import sqlite3
+import threading
+import time
+import logging
+from sqlite_buffer import SQLiteWriteBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class CoViewStore:
+    """Co-view counts in a SQLite file, shared by worker processes.
+
+    Workers write count increments rather than totals, so concurrent
+    flushes add up instead of overwriting each other. After each flush
+    the books just written are pruned to their ``keep`` strongest
+    neighbours, which bounds the table by catalogue size.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        keep: int = 100,
+        batch_size: int = 256,
+        flush_interval: float = 5.0,
+    ):
+        self.path = path
+        self.keep = keep
+        self._buffer = SQLiteWriteBuffer(
+            path,
+            """
+            CREATE TABLE IF NOT EXISTS coview_items (
+                item TEXT PRIMARY KEY,
+                views INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS coview_pairs (
+                item TEXT NOT NULL,
+                neighbor TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (item, neighbor)
+            ) WITHOUT ROWID;
+            """,
+            self._write,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            name="co-view counts",
+        )
+
+    def reopen(self) -> None:
+        self._buffer.reopen()
+
+    def add(self, item: str, neighbors: Iterable[str]) -> None:
+        """Buffer one view of ``item`` co-viewed with ``neighbors``."""
+        self._buffer.add((item, tuple(neighbors)))
+
+    def flush(self) -> None:
+        self._buffer.flush()
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    def _write(self, conn: sqlite3.Connection, views: List[Tuple[str, tuple]]) -> None:
+        items: Dict[str, int] = {}
+        pairs: Dict[Tuple[str, str], int] = {}
+        for item, neighbors in views:
+            items[item] = items.get(item, 0) + 1
+            for neighbor in neighbors:
+                for pair in ((item, neighbor), (neighbor, item)):
+                    pairs[pair] = pairs.get(pair, 0) + 1
+        conn.executemany(
+            "INSERT INTO coview_items (item, views) VALUES (?, ?) "
+            "ON CONFLICT(item) DO UPDATE SET views = views + excluded.views",
+            list(items.items()),
+        )
+        conn.executemany(
+            "INSERT INTO coview_pairs (item, neighbor, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(item, neighbor) DO UPDATE SET count = count + excluded.count",
+            [(item, neighbor, count) for (item, neighbor), count in pairs.items()],
+        )
+        touched = {item for item, _ in pairs}
+        conn.executemany(
+            "DELETE FROM coview_pairs WHERE item = ? AND neighbor NOT IN ("
+            "SELECT neighbor FROM coview_pairs WHERE item = ? "
+            "ORDER BY count DESC LIMIT ?)",
+            [(item, item, self.keep) for item in touched],
+        )
+
+    def neighbors(self, items: Iterable[str], n: int) -> Dict[str, Tuple[int, List[Tuple[str, int, int]]]]:
+        """Each item's view count and its ``n`` strongest neighbours.
+
+        Neighbours are (neighbour, co-views, neighbour's views) tuples. Each
+        item is two primary-key lookups, so the cost does not grow with the
+        table. Views still buffered in this process are not included.
+        """
+
+        def query(conn, pending):
+            found = {}
+            for item in items:
+                row = conn.execute("SELECT views FROM coview_items WHERE item = ?", (item,)).fetchone()
+                neighbors = conn.execute(
+                    "SELECT p.neighbor, p.count, COALESCE(i.views, 1) FROM coview_pairs p "
+                    "LEFT JOIN coview_items i ON i.item = p.neighbor "
+                    "WHERE p.item = ? ORDER BY p.count DESC LIMIT ?",
+                    (item, n),
+                ).fetchall()
+                found[item] = (row[0] if row else 1, neighbors)
+            return found
+
+        return self._buffer.read(query)
+
+
+class CoViewModel:
+    """Item-to-item recommendations from books viewed by the same users.
+
+    Each view of a book counts one co-view with every other book in the
+    viewer's recent history. Counts live in a sparse item -> neighbour
+    map kept to the ``max_neighbors`` strongest neighbours per book, so
+    recommending for a history is a merge of a few short lists. Neighbour
+    scores are cosine-normalized by view counts so bestsellers do not
+    dominate every list.
+
+    With a ``store`` the counts stay in SQLite, shared by every worker,
+    and only the neighbour lists of books in recent histories are read.
+    They are kept in an LRU cache of ``cache_size`` books for up to
+    ``cache_ttl`` seconds, so memory does not grow with the table.
+    """
+
+    def __init__(
+        self,
+        max_neighbors: int = 50,
+        store: Optional[CoViewStore] = None,
+        cache_ttl: float = 60.0,
+        cache_size: int = 10_000,
+    ):
+        self.max_neighbors = max_neighbors
+        self.store = store
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        # Without a store: item -> views, and item -> neighbour -> co-view
+        # count trimmed back to max_neighbors when it doubles
+        self.views: Dict[str, int] = {}
+        self.neighbors: Dict[str, Dict[str, int]] = {}
+        # With a store: item -> (expiry, views, neighbour lists)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bump(self, item: str, neighbor: str) -> None:
+        counts = self.neighbors.setdefault(item, {})
+        counts[neighbor] = counts.get(neighbor, 0) + 1
+        if len(counts) > 2 * self.max_neighbors:
+            self.neighbors[item] = dict(
+                heapq.nlargest(self.max_neighbors, counts.items(), key=lambda entry: entry[1])
+            )
+
+    def record(self, item: str, previous: Iterable[str]) -> None:
+        """Count a view of ``item`` by a user who had viewed ``previous``."""
+        previous = [other for other in dict.fromkeys(previous) if other != item]
+        if self.store is not None:
+            self.store.add(item, previous)
+            return
+        with self._lock:
+            self.views[item] = self.views.get(item, 0) + 1
+            for other in previous:
+                self._bump(item, other)
+                self._bump(other, item)
+
+    def _lookup(self, items: List[str]) -> Dict[str, Tuple[int, List[Tuple[str, int, int]]]]:
+        if self.store is None:
+            with self._lock:
+                return {
+                    item: (
+                        self.views.get(item, 1),
+                        [
+                            (neighbor, count, self.views.get(neighbor, 1))
+                            for neighbor, count in self.neighbors.get(item, {}).items()
+                        ],
+                    )
+                    for item in items
+                }
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for item in items:
+                cached = self._cache.get(item)
+                if cached is not None and cached[0] > now:
+                    self._cache.move_to_end(item)
+                    found[item] = cached[1:]
+                else:
+                    missing.append(item)
+        if missing:
+            try:
+                loaded = self.store.neighbors(missing, self.max_neighbors)
+            except sqlite3.Error as e:
+                logger.error(f"Error reading co-view counts: {e}")
+                return found
+            with self._lock:
+                for item, entry in loaded.items():
+                    self._cache[item] = (now + self.cache_ttl, *entry)
+                    self._cache.move_to_end(item)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            found.update(loaded)
+        return found
+
+    def recommend(
+        self,
+        history: List[str],
+        n: int,
+        exclude: Iterable[str] = (),
+        decay: float = 0.7,
+    ) -> List[str]:
+        """Up to ``n`` books co-viewed with ``history`` (newest first), best first.
+
+        Each history book's neighbour scores are weighted by ``decay`` per
+        step back in the history and summed.
+        """
+        excluded = set(exclude) | set(history)
+        found = self._lookup(list(dict.fromkeys(history)))
+        scores: Dict[str, float] = {}
+        for position, item in enumerate(history):
+            if item not in found:
+                continue
+            views, neighbors = found[item]
+            weight = decay ** position / math.sqrt(views)
+            for neighbor, count, neighbor_views in neighbors:
+                if neighbor in excluded:
+                    continue
+                score = weight * count / math.sqrt(neighbor_views)
+                scores[neighbor] = scores.get(neighbor, 0.0) + score
+        return heapq.nlargest(n, scores, key=scores.get)
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+
+    def reopen(self) -> None:
+        if self.store is not None:
+            self.store.reopen()
+        self._lock = threading.Lock()
+
+
+def create_coview_model(
+    path: Optional[str] = None,
+    max_neighbors: int = 50,
+    cache_ttl: float = 60.0,
+    **kwargs,
+) -> CoViewModel:
+    """SQLite-persisted model when ``path`` is given, in-memory otherwise.
+
+    The store keeps twice ``max_neighbors`` per book, so a neighbour can
+    climb into the served list before it is pruned.
+    """
+    store = CoViewStore(path, keep=2 * max_neighbors, **kwargs) if path else None
+    return CoViewModel(max_neighbors, store, cache_ttl)
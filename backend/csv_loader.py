@@ -0,0 +1,130 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+import ast
+import csv
+import hashlib
+import threading
+import time
+from catalogue import parse_num_pages
+from search_filters import METADATA_VERSION
+
+required_columns = ["cover_image_uri", "book_title", "book_details", "author", "num_pages", "genres"]
+# Columns whose values make up a book's content fingerprint
+fingerprint_columns = ["book_title", "author", "num_pages", "cover_image_uri", "book_details", "genres", "format"]
+
+# book_details can be far longer than the csv module's default field limit
+csv.field_size_limit(2**31 - 1)
+
+
+class RejectedRow(ValueError):
+    """Raised by normalize_row with the reason a CSV row was dropped."""
+
+
+class LoaderStats:
+    """Row counts, rejection reasons and cumulative per-stage timings."""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_accepted = 0
+        self.rejected = Counter()
+        self.timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+
+    def report(self) -> str:
+        lines = [
+            f"Rows read: {self.rows_read}, accepted: {self.rows_accepted}, "
+            f"rejected: {sum(self.rejected.values())}"
+        ]
+        for reason, count in self.rejected.most_common():
+            lines.append(f"  rejected ({reason}): {count}")
+        for stage, seconds in self.timings.items():
+            lines.append(f"  {stage}: {seconds:.2f}s")
+        return "\n".join(lines)
+
+
+def book_id(title, author):
+    """Deterministic id derived from a book's title and author."""
+    key = f"{str(title).strip().casefold()}\x1f{str(author).strip().casefold()}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def content_fingerprint(values):
+    """Hash of the stored fields, used to detect changed rows on re-ingestion."""
+    return hashlib.sha1("\x1f".join(str(v) for v in values).encode("utf-8")).hexdigest()
+
+
+def normalize_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """Validate one raw CSV row and return the record that gets stored."""
+    for column in required_columns:
+        if not (row.get(column) or "").strip():
+            raise RejectedRow(f"missing {column}")
+
+    try:
+        genres = ast.literal_eval(row["genres"])
+    except (ValueError, SyntaxError):
+        raise RejectedRow("unparseable genres")
+    if isinstance(genres, str):
+        genres = [genres]
+    if not isinstance(genres, (list, tuple)) or not genres:
+        raise RejectedRow("empty genres")
+
+    num_pages = parse_num_pages(row["num_pages"])
+    if num_pages < 0:
+        raise RejectedRow("invalid num_pages")
+
+    book = {
+        "book_title": row["book_title"].strip(),
+        "author": row["author"].strip(),
+        "num_pages": num_pages,
+        "cover_image_uri": row["cover_image_uri"].strip(),
+        "book_details": row["book_details"],
+        "genres": ", ".join(str(g) for g in genres),
+        "format": (row.get("format") or "").strip(),
+    }
+    book["id"] = book_id(book["book_title"], book["author"])
+    book["fingerprint"] = content_fingerprint(
+        [METADATA_VERSION] + [book[c] for c in fingerprint_columns]
+    )
+    return book
+
+
+def iter_book_batches(
+    csv_path: str, batch_size: int, stats: LoaderStats
+) -> Iterator[List[Dict[str, Any]]]:
+    """Stream validated books from the CSV in batches of at most ``batch_size``.
+
+    Only the current batch is held in memory. Within a batch the last row
+    for a given id wins.
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        batch: Dict[str, Dict[str, Any]] = {}
+        while True:
+            with stats.timer("parse"):
+                for row in reader:
+                    stats.rows_read += 1
+                    try:
+                        book = normalize_row(row)
+                    except RejectedRow as e:
+                        stats.rejected[str(e)] += 1
+                        continue
+                    stats.rows_accepted += 1
+                    batch.pop(book["id"], None)
+                    batch[book["id"]] = book
+                    if len(batch) >= batch_size:
+                        break
+            if not batch:
+                return
+            yield list(batch.values())
+            batch = {}
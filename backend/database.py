@@ -1,89 +1,297 @@
-import pandas as pd
 import chromadb
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
-import uuid
-import ast
-
-# Step 1: Load the dataset
-df_books = pd.read_csv(
-    "D:\\CITL project\\library-management\\backend\\updated_books_new.csv", sep=","
-)
-
-# Step 2: Drop rows with empty required columns
-required_columns = ["cover_image_uri", "book_title", "book_details", "author", "num_pages", "genres"]
-df_books = df_books.dropna(subset=required_columns)
-
-# Step 3: Parse the genres field to ensure it is a list and filter out rows with empty genres
-df_books['genres'] = df_books['genres'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-df_books = df_books[df_books['genres'].apply(lambda x: len(x) > 0)]
-
-# Step 4: Convert genres list to a single string
-df_books['genres'] = df_books['genres'].apply(lambda x: ', '.join(x))
-
-# Step 5: Reset index after filtering
-df_books = df_books.reset_index(drop=True)
-
-# Display the titles of invalid books
-invalid_books = df_books[df_books['genres'].apply(lambda x: len(x) == 0)]
-if not invalid_books.empty:
-    print("Books that have been dropped due to empty genres:")
-    for title in invalid_books['book_title']:
-        print(title)
-
-# Proceed with valid books
-df_books = df_books.reset_index(drop=True)
-
-# Initialize the SentenceTransformer model
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-# Generate embeddings for each book with progress tracking
-tqdm.pandas()
-df_books['embedding'] = df_books.progress_apply(
-    lambda row: model.encode(f"{row['book_title']} {str(row['genres'])}").tolist(), axis=1
-)
-
-# Initialize ChromaDB Client
-client = chromadb.PersistentClient(
-    path="D:\\CITL project\\library-management\\backend\\db_storage"
-)
-
-try:
-    collection = client.get_collection("books")
-except chromadb.errors.InvalidCollectionException:
-    collection = client.create_collection(
-        name="books",
-        metadata={"description": "Books collection"}
-    )
+import argparse
+import os
+import time
+from csv_loader import LoaderStats, iter_book_batches
+from catalogue import Catalogue
+from search_filters import METADATA_VERSION, filter_metadata
+from lexical_index import LexicalIndex
+from snapshot import CatalogueSnapshot
+from vector_index import shard_for, shard_name
+
+CSV_PATH = "D:\\CITL project\\library-management\\backend\\updated_books_new.csv"
+DB_PATH = "D:\\CITL project\\library-management\\backend\\db_storage"
+LEXICAL_INDEX_PATH = "D:\\CITL project\\library-management\\backend\\lexical_index.pickle"
+SNAPSHOT_PATH = "D:\\CITL project\\library-management\\backend\\catalogue_snapshot.pickle"
+
+# Rows read from the CSV and encoded together
+DEFAULT_BATCH_SIZE = 1024
+# Batch size handed to the embedding model
+DEFAULT_ENCODE_BATCH_SIZE = 256
+# Threads writing encoded batches to ChromaDB while the next batch encodes
+DEFAULT_WORKERS = 2
+# Above this share of rejected rows the CSV is treated as malformed and nothing is pruned
+DEFAULT_MAX_REJECT_RATIO = 0.5
+
+
+def select_changed(collection, batch):
+    """Return only the books that are new or whose fingerprint has changed."""
+    existing = collection.get(ids=[book['id'] for book in batch], include=["metadatas"])
+    stored = {
+        id_: (meta or {}).get('fingerprint')
+        for id_, meta in zip(existing['ids'], existing['metadatas'])
+    }
+    return [book for book in batch if stored.get(book['id']) != book['fingerprint']]
+
+
+def prune_skip_reason(stats, max_reject_ratio):
+    """Why pruning should be skipped for this run, or None if it is safe.
+
+    A renamed or missing column rejects every row, and pruning against an
+    empty set of seen ids would delete the whole catalogue.
+    """
+    if not stats.rows_accepted:
+        return "no CSV rows were accepted"
+    rejected = sum(stats.rejected.values())
+    if rejected > max_reject_ratio * stats.rows_read:
+        return f"{rejected} of {stats.rows_read} CSV rows were rejected"
+    return None
+
+
+def prune_missing(collection, seen_ids, page_size=1000, shards=None):
+    """Delete stored books whose ids did not appear in this ingestion run."""
+    stale = []
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=[])
+        if not page['ids']:
+            break
+        stale.extend(id_ for id_ in page['ids'] if id_ not in seen_ids)
+        offset += len(page['ids'])
+
+    for i in range(0, len(stale), page_size):
+        collection.delete(ids=stale[i:i + page_size])
+        if shards:
+            for shard, positions in route_to_shards(stale[i:i + page_size], len(shards)).items():
+                shards[shard].delete(ids=[stale[i + p] for p in positions])
+    return len(stale)
+
+
+def route_to_shards(ids, shard_count):
+    """Positions in ``ids`` grouped by the shard each id belongs to."""
+    routed = {}
+    for position, id_ in enumerate(ids):
+        routed.setdefault(shard_for(id_, shard_count), []).append(position)
+    return routed
+
+
+def shard_metadata(metadata):
+    """The subset of a book's metadata that where clauses filter on."""
+    return {
+        key: value
+        for key, value in metadata.items()
+        if key in ('num_pages', 'format', 'book_id', 'available') or key.startswith('genre_')
+    }
+
+
+def open_shards(db_path, shard_count):
+    client = chromadb.PersistentClient(path=db_path)
+    return [client.get_or_create_collection(shard_name(i)) for i in range(shard_count)]
+
+
+def upsert_to_shards(shards, ids, embeddings, metadatas):
+    for shard, positions in route_to_shards(ids, len(shards)).items():
+        shards[shard].upsert(
+            ids=[ids[p] for p in positions],
+            embeddings=[embeddings[p] for p in positions],
+            metadatas=[shard_metadata(metadatas[p]) for p in positions],
+        )
+
+
+def rebuild_shards(db_path, collection, shard_count, page_size=1000):
+    """Drop any existing shard collections and repartition the whole collection."""
+    client = chromadb.PersistentClient(path=db_path)
+    shard_count = shard_count or 0
+    old_count = (collection.metadata or {}).get('shard_count', 0)
+    for i in range(max(old_count, shard_count)):
+        try:
+            client.delete_collection(shard_name(i))
+        except Exception:
+            pass
+    shards = open_shards(db_path, shard_count)
+    offset = 0
+    while shards:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+        if not len(page['ids']):
+            break
+        upsert_to_shards(shards, page['ids'], page['embeddings'], page['metadatas'])
+        offset += len(page['ids'])
+    print(f"Partitioned {offset} books into {shard_count} shards")
+
 
-# Add books to the collection with progress tracking
-batch_size = 100
-for i in tqdm(range(0, len(df_books), batch_size), desc="Adding books to ChromaDB"):
-    batch = df_books.iloc[i:i + batch_size]
-    ids = [str(uuid.uuid4()) for _ in range(len(batch))]  # Generate unique IDs
-    documents = batch['book_title'].tolist()
-    metadatas = batch.apply(lambda row: {
-        'author': row['author'],
-        'num_pages': row['num_pages'],
-        'cover_image_uri': row['cover_image_uri'],
-        'book_details': row['book_details'],
-        'genres': row['genres'],
-        'format': row['format']
-    }, axis=1).tolist()
-    embeddings = batch['embedding'].tolist()
-
-    collection.add(
-        ids=ids,
-        embeddings=embeddings,
-        documents=documents,
-        metadatas=metadatas
+def bump_catalogue_version(collection, shard_count=None):
+    """Record a new catalogue version so running servers drop their query caches."""
+    metadata = dict(collection.metadata or {})
+    if shard_count is not None:
+        metadata['shard_count'] = shard_count
+    metadata['catalogue_version'] = int(time.time() * 1000)
+    metadata['metadata_version'] = METADATA_VERSION
+    collection.modify(metadata=metadata)
+
+
+def build_serving_state(collection, lexical_index_path, snapshot_path):
+    """Write the BM25 index and catalogue snapshot the server loads at startup."""
+    catalogue = Catalogue.from_collection(collection)
+    version = (collection.metadata or {}).get('catalogue_version')
+    if lexical_index_path:
+        index = LexicalIndex.from_catalogue(catalogue, version)
+        index.save(lexical_index_path)
+        print(f"Lexical index with {len(index)} books written to {lexical_index_path}")
+    if snapshot_path:
+        CatalogueSnapshot.build(catalogue, version).save(snapshot_path)
+        print(f"Catalogue snapshot written to {snapshot_path}")
+
+
+def encode_batch(model, batch, encode_batch_size, pool=None):
+    """Encode titles and genres of a batch into a single NumPy matrix."""
+    texts = [f"{book['book_title']} {book['genres']}" for book in batch]
+    if pool is not None:
+        return model.encode_multi_process(texts, pool, batch_size=encode_batch_size)
+    return model.encode(
+        texts,
+        batch_size=encode_batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False,
     )
-    print(f"Added batch {i//batch_size + 1} of {(len(df_books) + batch_size - 1)//batch_size}")
 
-print("All books have been added to the collection.")
+
+def add_batch(collection, batch, embeddings, stats, shards=None):
+    """Upsert one encoded batch into the collection and, if sharded, its shards."""
+    ids = [book['id'] for book in batch]
+    with stats.timer("write"):
+        metadatas = [
+            {
+                'author': book['author'],
+                'num_pages': book['num_pages'],
+                'cover_image_uri': book['cover_image_uri'],
+                'book_details': book['book_details'],
+                'genres': book['genres'],
+                'format': book['format'],
+                'fingerprint': book['fingerprint'],
+                **filter_metadata(
+                    Catalogue.stable_book_id(book['id']), book['genres'].split(", ")
+                )
+            }
+            for book in batch
+        ]
+        collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=[book['book_title'] for book in batch],
+            metadatas=metadatas,
+        )
+        if shards:
+            upsert_to_shards(shards, ids, embeddings, metadatas)
+    return len(batch)
+
+
+def get_books_collection(db_path):
+    client = chromadb.PersistentClient(path=db_path)
+    try:
+        return client.get_collection("books")
+    except chromadb.errors.InvalidCollectionException:
+        return client.create_collection(
+            name="books",
+            metadata={"description": "Books collection"}
+        )
+
+
+def ingest(
+    csv_path=CSV_PATH,
+    db_path=DB_PATH,
+    batch_size=DEFAULT_BATCH_SIZE,
+    encode_batch_size=DEFAULT_ENCODE_BATCH_SIZE,
+    workers=DEFAULT_WORKERS,
+    encode_processes=0,
+    prune=True,
+    lexical_index_path=LEXICAL_INDEX_PATH,
+    snapshot_path=SNAPSHOT_PATH,
+    shards=None,
+    model=None,
+    max_reject_ratio=DEFAULT_MAX_REJECT_RATIO,
+):
+    """Stream the CSV through validation, encoding and collection.upsert.
+
+    Encoding of the next batch overlaps with writing the previous ones; at
+    most ``workers`` batches are in flight so memory stays bounded. Rows
+    whose fingerprint is unchanged are skipped without being encoded, and
+    with ``prune`` books missing from the CSV are deleted afterwards,
+    unless more than ``max_reject_ratio`` of the rows were rejected.
+
+    ``shards=None`` keeps the stored shard count; a different count
+    repartitions the collection. ``model`` defaults to the
+    all-MiniLM-L6-v2 sentence transformer.
+    """
+    collection = get_books_collection(db_path)
+    stored_shards = (collection.metadata or {}).get('shard_count', 0)
+    if shards is None:
+        shards = stored_shards
+    # New books go straight into the shards only when they are already partitioned this way
+    shard_collections = open_shards(db_path, shards) if shards and shards == stored_shards else None
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer('all-MiniLM-L6-v2')
+    pool = model.start_multi_process_pool(["cpu"] * encode_processes) if encode_processes > 1 else None
+
+    stats = LoaderStats()
+    total = 0
+    skipped = 0
+    seen_ids = set()
+    pending = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor, tqdm(desc="Adding books to ChromaDB", unit="book") as progress:
+            for batch in iter_book_batches(csv_path, batch_size, stats):
+                seen_ids.update(book['id'] for book in batch)
+                with stats.timer("diff"):
+                    changed = select_changed(collection, batch)
+                skipped += len(batch) - len(changed)
+                progress.update(len(batch) - len(changed))
+                if not changed:
+                    continue
+
+                with stats.timer("encode"):
+                    embeddings = encode_batch(model, changed, encode_batch_size, pool)
+                pending.append(executor.submit(add_batch, collection, changed, embeddings, stats, shard_collections))
+
+                # Wait for the oldest write once more than `workers` batches are queued
+                while len(pending) > workers:
+                    added = pending.pop(0).result()
+                    total += added
+                    progress.update(added)
+
+            for future in pending:
+                added = future.result()
+                total += added
+                progress.update(added)
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    removed = 0
+    skip_reason = prune_skip_reason(stats, max_reject_ratio) if prune else None
+    if skip_reason:
+        print(f"Not pruning missing books: {skip_reason}. Check the CSV columns.")
+    elif prune:
+        with stats.timer("prune"):
+            removed = prune_missing(collection, seen_ids, shards=shard_collections)
+    if shards != stored_shards:
+        with stats.timer("shard"):
+            rebuild_shards(db_path, collection, shards)
+    if total or removed or shards != stored_shards:
+        bump_catalogue_version(collection, shards)
+    outputs = [path for path in (lexical_index_path, snapshot_path) if path]
+    if outputs and (total or removed or not all(os.path.exists(path) for path in outputs)):
+        with stats.timer("serving_state"):
+            build_serving_state(collection, lexical_index_path, snapshot_path)
+    print(f"Upserted {total} books, skipped {skipped} unchanged, removed {removed} missing.")
+    print(stats.report())
+    return collection
+
 
 # Search function
-def search_books(query_text, n_results=5):
+def search_books(collection, query_text, n_results=5):
     results = collection.query(
         query_texts=[query_text],
         n_results=n_results,
@@ -91,12 +299,45 @@ def search_books(query_text, n_results=5):
     )
     return results['documents'][0], results['metadatas'][0]
 
-# Example usage
-search_query = "fantasy"
-documents, metadatas = search_books(search_query)
-print("Search results:")
-for doc, meta in zip(documents, metadatas):
-    print(f"""
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load the books CSV into ChromaDB")
+    parser.add_argument("--csv", default=CSV_PATH, help="Path to the books CSV")
+    parser.add_argument("--db", default=DB_PATH, help="ChromaDB storage directory")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows read and encoded per batch")
+    parser.add_argument("--encode-batch-size", type=int, default=DEFAULT_ENCODE_BATCH_SIZE, help="Batch size passed to the embedding model")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent ChromaDB writer threads")
+    parser.add_argument("--encode-processes", type=int, default=0, help="Embedding worker processes (0 encodes in-process)")
+    parser.add_argument("--no-prune", action="store_true", help="Keep books that are no longer in the CSV")
+    parser.add_argument("--max-reject-ratio", type=float, default=DEFAULT_MAX_REJECT_RATIO, help="Skip pruning when more than this share of rows is rejected")
+    parser.add_argument("--lexical-index", default=LEXICAL_INDEX_PATH, help="Where to write the BM25 search index (empty to skip)")
+    parser.add_argument("--shards", type=int, default=None, help="Partition vectors across this many shard collections (0 disables; default keeps the stored count)")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="Where to write the server's catalogue snapshot (empty to skip)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    collection = ingest(
+        csv_path=args.csv,
+        db_path=args.db,
+        batch_size=args.batch_size,
+        encode_batch_size=args.encode_batch_size,
+        workers=args.workers,
+        encode_processes=args.encode_processes,
+        prune=not args.no_prune,
+        max_reject_ratio=args.max_reject_ratio,
+        lexical_index_path=args.lexical_index,
+        snapshot_path=args.snapshot,
+        shards=args.shards,
+    )
+
+    # Example usage
+    search_query = "fantasy"
+    documents, metadatas = search_books(collection, search_query)
+    print("Search results:")
+    for doc, meta in zip(documents, metadatas):
+        print(f"""
     Title: {doc}
     Author: {meta['author']}
     Pages: {meta['num_pages']}
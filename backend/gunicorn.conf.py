@@ -0,0 +1,40 @@
+# Production serving config: gunicorn -c gunicorn.conf.py routes:app
+#
+# The app (catalogue, title index, embedding model) is loaded once in the
+# master and shared copy-on-write with the forked workers. Each worker then
+# opens its own ChromaDB client and SQLite handle, and serves requests on a
+# pool of threads so one slow vector query does not block the others.
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_WORKERS", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 8))
+timeout = int(os.environ.get("WEB_TIMEOUT", 30))
+preload_app = True
+
+# Each worker keeps its own metrics; /api/metrics merges them from here
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "library-metrics"))
+
+
+def on_starting(server):
+    import metrics
+
+    # Counts left by a previous run would otherwise be added to this one's
+    metrics.registry.clear_shared_dir()
+
+
+def when_ready(server):
+    import routes
+
+    # Warm the master before forking so workers share the model copy-on-write
+    routes.start_warm_up(wait=True)
+
+
+def post_fork(server, worker):
+    import routes
+
+    routes.reopen_after_fork()
+    # Re-warm anything the fork left cold (the worker's own ChromaDB client)
+    routes.start_warm_up()
@@ -0,0 +1,196 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+import logging
+from sqlite_buffer import SQLiteWriteBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class ViewHistoryStore(ABC):
+    """Interface for per-user view history backends.
+
+    Entries are dicts with ``title``, ``genres`` and ``timestamp`` keys and
+    are returned most recent first.
+    """
+
+    # Entries kept per user; adding one more evicts the oldest
+    max_per_user = 5
+
+    @abstractmethod
+    def add(self, user_id: str, entry: Dict[str, Any]) -> None:
+        """Record a view, evicting the user's oldest beyond ``max_per_user``."""
+
+    @abstractmethod
+    def get(self, user_id: str) -> List[Dict[str, Any]]:
+        """The user's views, most recent first."""
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def reopen(self) -> None:
+        """Re-create file handles after the process has been forked."""
+        pass
+
+
+class InMemoryHistoryStore(ViewHistoryStore):
+    """Process-local store: capped deque per user, idle users evicted LRU."""
+
+    def __init__(self, max_per_user: int = 5, max_users: int = 100_000):
+        self.max_per_user = max_per_user
+        self.max_users = max_users
+        self._histories: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, user_id: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            history = self._histories.get(user_id)
+            if history is None:
+                history = self._histories[user_id] = deque(maxlen=self.max_per_user)
+            history.appendleft(entry)
+            self._histories.move_to_end(user_id)
+            while len(self._histories) > self.max_users:
+                self._histories.popitem(last=False)
+
+    def get(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            history = self._histories.get(user_id)
+            if history is None:
+                return []
+            self._histories.move_to_end(user_id)
+            return list(history)
+
+
+class SQLiteHistoryStore(ViewHistoryStore):
+    """View history in a local SQLite file in WAL mode, shared by worker processes.
+
+    Writes are buffered and flushed in one transaction once ``batch_size``
+    entries are pending, and at least every ``flush_interval`` seconds by
+    a background thread. Reads in the same process see pending entries
+    immediately; other processes see them after the next flush.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_per_user: int = 5,
+        max_users: int = 1_000_000,
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+    ):
+        self.path = path
+        self.max_per_user = max_per_user
+        self.max_users = max_users
+        self._buffer = SQLiteWriteBuffer(
+            path,
+            """
+            CREATE TABLE IF NOT EXISTS view_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                genres TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_view_history_user
+                ON view_history (user_id, id);
+            CREATE TABLE IF NOT EXISTS history_users (
+                user_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_history_users_last_seen
+                ON history_users (last_seen);
+            """,
+            self._write,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            name="view history",
+        )
+
+    def reopen(self) -> None:
+        self._buffer.reopen()
+
+    def add(self, user_id: str, entry: Dict[str, Any]) -> None:
+        self._buffer.add(
+            (
+                user_id,
+                entry["title"],
+                json.dumps(entry.get("genres", [])),
+                entry.get("timestamp", ""),
+            )
+        )
+
+    def get(self, user_id: str) -> List[Dict[str, Any]]:
+        def query(conn, pending):
+            entries = [
+                self._to_entry(row[1], row[2], row[3])
+                for row in reversed(pending)
+                if row[0] == user_id
+            ]
+            rows = conn.execute(
+                "SELECT title, genres, timestamp FROM view_history "
+                "WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, self.max_per_user),
+            ).fetchall()
+            return entries + [self._to_entry(*row) for row in rows]
+
+        return self._buffer.read(query)[: self.max_per_user]
+
+    def flush(self) -> None:
+        self._buffer.flush()
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    @staticmethod
+    def _to_entry(title: str, genres: str, timestamp: str) -> Dict[str, Any]:
+        return {"title": title, "genres": json.loads(genres), "timestamp": timestamp}
+
+    def _write(self, conn: sqlite3.Connection, pending: List[tuple]) -> None:
+        users = {row[0] for row in pending}
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO view_history (user_id, title, genres, timestamp) "
+            "VALUES (?, ?, ?, ?)",
+            pending,
+        )
+        conn.executemany(
+            "INSERT INTO history_users (user_id, last_seen) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET last_seen = excluded.last_seen",
+            [(user_id, now) for user_id in users],
+        )
+        # Keep only the newest max_per_user rows for the users just written
+        conn.executemany(
+            "DELETE FROM view_history WHERE user_id = ? AND id NOT IN ("
+            "SELECT id FROM view_history WHERE user_id = ? "
+            "ORDER BY id DESC LIMIT ?)",
+            [(user_id, user_id, self.max_per_user) for user_id in users],
+        )
+        self._evict_idle_users(conn)
+
+    def _evict_idle_users(self, conn: sqlite3.Connection) -> None:
+        (n_users,) = conn.execute("SELECT COUNT(*) FROM history_users").fetchone()
+        excess = n_users - self.max_users
+        if excess <= 0:
+            return
+        idle = conn.execute(
+            "SELECT user_id FROM history_users ORDER BY last_seen LIMIT ?", (excess,)
+        ).fetchall()
+        conn.executemany("DELETE FROM view_history WHERE user_id = ?", idle)
+        conn.executemany("DELETE FROM history_users WHERE user_id = ?", idle)
+        logger.info(f"Evicted view history of {len(idle)} idle users")
+
+
+def create_history_store(
+    path: Optional[str] = None, max_per_user: int = 5, **kwargs
+) -> ViewHistoryStore:
+    """SQLite-backed store when ``path`` is given, in-memory otherwise."""
+    if path:
+        return SQLiteHistoryStore(path, max_per_user=max_per_user, **kwargs)
+    return InMemoryHistoryStore(max_per_user=max_per_user, **kwargs)
@@ -0,0 +1,115 @@
+from functools import wraps
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+import gzip
+import hashlib
+import logging
+from flask import Response, make_response, request
+from query_cache import TTLCache
+import metrics
+
+logger = logging.getLogger(__name__)
+
+http_cache_total = metrics.registry.counter(
+    "library_http_cache_total", "Read responses by cache outcome", ("result",)
+)
+
+
+def select_fields(payload: Any, fields: Optional[Iterable[str]]) -> Any:
+    """Reduce every book object (a dict with a title) in ``payload`` to ``fields``."""
+    if not fields:
+        return payload
+    if isinstance(payload, list):
+        return [select_fields(item, fields) for item in payload]
+    if isinstance(payload, dict):
+        if "title" in payload:
+            return {field: payload[field] for field in fields if field in payload}
+        return {key: select_fields(value, fields) for key, value in payload.items()}
+    return payload
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    gzipped: Optional[bytes]
+    etag: str
+    mimetype: str
+
+
+class ResponseCache:
+    """Caches serialized read responses and serves them with validators.
+
+    Entries are keyed by path, query arguments and the catalogue version,
+    so a re-ingestion invalidates them. Every response gets a strong ETag
+    (a hash of the body) and Cache-Control; a matching If-None-Match is
+    answered with 304, and bodies above ``min_compress_size`` are sent
+    gzipped, compressed once when cached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 4096,
+        ttl: float = 300,
+        version_fn: Optional[Callable[[], Any]] = None,
+        min_compress_size: int = 1024,
+    ):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.version_fn = version_fn
+        self.min_compress_size = min_compress_size
+
+    def _body(self, response: Response) -> CachedBody:
+        body = response.get_data()
+        gzipped = gzip.compress(body, 6) if len(body) >= self.min_compress_size else None
+        return CachedBody(
+            body, gzipped, hashlib.sha256(body).hexdigest()[:32], response.mimetype
+        )
+
+    def _respond(self, entry: CachedBody, cache_control: str) -> Response:
+        use_gzip = entry.gzipped is not None and "gzip" in request.accept_encodings
+        # Each encoding is its own representation, so it gets its own strong tag
+        etag = f"{entry.etag}-gzip" if use_gzip else entry.etag
+        if request.if_none_match.contains(etag):
+            http_cache_total.inc("not_modified")
+            response = Response(status=304)
+        else:
+            response = Response(entry.gzipped if use_gzip else entry.body, mimetype=entry.mimetype)
+            if use_gzip:
+                response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def cached(self, max_age: int = 60, private: bool = False, store: bool = True):
+        """Decorate a read-only view.
+
+        ``store=False`` still adds validators and compression but recomputes
+        every time, for responses that depend on state outside the key.
+        """
+        cache_control = f"{'private' if private else 'public'}, max-age={max_age}"
+        if max_age == 0:
+            cache_control = f"{'private' if private else 'public'}, no-cache"
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = None
+                if store:
+                    version = self.version_fn() if self.version_fn else None
+                    key = (request.path, tuple(sorted(request.args.items(multi=True))), version)
+                    entry = self.entries.get(key)
+                    if entry is not None:
+                        http_cache_total.inc("hit")
+                        return self._respond(entry, cache_control)
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                with metrics.timer("http_cache"):
+                    entry = self._body(response)
+                if key is not None:
+                    http_cache_total.inc("miss")
+                    self.entries.set(key, entry)
+                return self._respond(entry, cache_control)
+
+            return wrapper
+
+        return decorator
@@ -0,0 +1,205 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import heapq
+import math
+import re
+import logging
+import atomic_pickle
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes so stale files are rebuilt
+FORMAT_VERSION = 2
+
+# Term-frequency weight of each field; a title hit counts for more than one in the blurb
+FIELD_WEIGHTS = {"title": 3.0, "author": 2.0, "genres": 1.0, "details": 1.0}
+
+# Reciprocal rank fusion constant; larger values flatten the rank contribution
+RRF_K = 60
+
+# Terms in more books than this are not scanned; they only add to the
+# scores of books a rarer query term found
+MAX_SCANNED_POSTINGS = 2000
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or that the this to with".split()
+)
+
+_TOKEN = re.compile(r"\w+")
+_DIGIT_HYPHEN = re.compile(r"(?<=\d)[-\s](?=\d)")
+
+
+def tokenize(text: str) -> List[str]:
+    """Casefolded word tokens; hyphenated digit runs (ISBNs) are kept as one token."""
+    return _TOKEN.findall(_DIGIT_HYPHEN.sub("", text.casefold()))
+
+
+def reciprocal_rank_fusion(*rankings: Iterable[str], k: int = RRF_K) -> List[str]:
+    """Merge ranked id lists; each contributes 1 / (k + rank) per id."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            scores[doc] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.__getitem__, reverse=True)
+
+
+class LexicalIndex:
+    """BM25 inverted index over title, author, genres and book details.
+
+    Postings are parallel ``array`` columns of document numbers, in
+    ascending order, and field-weighted term frequencies. Title and author
+    terms are also kept in a separate name index, alongside each book's
+    normalized title and author, to recognise known-item queries.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []  # document number -> collection id
+        self.doc_lengths = array("f")
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.names: Dict[str, array] = {}  # title/author term -> document numbers
+        self.titles: List[str] = []  # document number -> normalized title
+        self.authors: List[str] = []  # document number -> normalized author
+        self.catalogue_version = None
+        self._avg_length = 0.0
+
+    @classmethod
+    def from_catalogue(cls, catalogue, catalogue_version=None) -> "LexicalIndex":
+        """Index every book in the in-memory catalogue."""
+        index = cls()
+        postings = defaultdict(lambda: (array("I"), array("f")))
+        names = defaultdict(lambda: array("I"))
+        for doc, record in enumerate(catalogue):
+            index.ids.append(record.chroma_id)
+            index.titles.append(" ".join(tokenize(record.title)))
+            index.authors.append(" ".join(tokenize(record.author)))
+            weighted = Counter()
+            for field, text in (
+                ("title", record.title),
+                ("author", record.author),
+                ("genres", record.genres_text),
+                ("details", record.book_details),
+            ):
+                for term in tokenize(text):
+                    weighted[term] += FIELD_WEIGHTS[field]
+            for term in set(tokenize(record.title)) | set(tokenize(record.author)):
+                names[term].append(doc)
+            for term, tf in weighted.items():
+                docs, tfs = postings[term]
+                docs.append(doc)
+                tfs.append(tf)
+            index.doc_lengths.append(sum(weighted.values()))
+        index.postings = dict(postings)
+        index.names = dict(names)
+        index.catalogue_version = catalogue_version
+        index._update_stats()
+        logger.info(f"Lexical index built with {len(index)} books, {len(index.postings)} terms")
+        return index
+
+    def _update_stats(self) -> None:
+        self._avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def save(self, path: str) -> None:
+        """Persist the postings and BM25 parameters built at ingestion time."""
+        atomic_pickle.dump(
+            path,
+            FORMAT_VERSION,
+            {
+                "catalogue_version": self.catalogue_version,
+                "k1": self.k1,
+                "b": self.b,
+                "ids": self.ids,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+                "names": self.names,
+                "titles": self.titles,
+                "authors": self.authors,
+            },
+        )
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LexicalIndex"]:
+        """The index ``database.py`` saved, or None so the caller rebuilds it."""
+        data = atomic_pickle.load(path, FORMAT_VERSION)
+        if data is None:
+            return None
+        index = cls(k1=data["k1"], b=data["b"])
+        index.ids = data["ids"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = data["postings"]
+        index.names = data["names"]
+        index.titles = data["titles"]
+        index.authors = data["authors"]
+        index.catalogue_version = data["catalogue_version"]
+        index._update_stats()
+        logger.info(f"Lexical index loaded with {len(index)} books from {path}")
+        return index
+
+    def _bm25(self, doc: int, tf: float, idf: float) -> float:
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / self._avg_length)
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def search(self, query: str, n: int = 10) -> List[Tuple[str, float]]:
+        """Top ``n`` (collection id, BM25 score) pairs for ``query``.
+
+        Only the postings of rare terms are scanned. Terms found in more
+        than ``MAX_SCANNED_POSTINGS`` books add their score to the books
+        already found, looked up by binary search, so the cost does not
+        grow with the catalogue. Queries with no rare term return nothing
+        and are left to the semantic search. Stopwords are ignored.
+        """
+        terms = set(tokenize(query)) - STOPWORDS
+        if not terms or not self.ids:
+            return []
+        total = len(self.ids)
+        rare, common = [], []
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                (rare if len(posting[0]) <= MAX_SCANNED_POSTINGS else common).append(posting)
+
+        scores: Dict[int, float] = defaultdict(float)
+        for docs, tfs in rare:
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc, tf in zip(docs, tfs):
+                scores[doc] += self._bm25(doc, tf, idf)
+        for docs, tfs in common:
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc in scores:
+                i = bisect_left(docs, doc)
+                if i < len(docs) and docs[i] == doc:
+                    scores[doc] += self._bm25(doc, tfs[i], idf)
+        best = heapq.nlargest(n, scores.items(), key=lambda item: item[1])
+        return [(self.ids[doc], score) for doc, score in best]
+
+    def is_known_item(self, query: str) -> bool:
+        """True when the query is a book's title or author, or a phrase of a title.
+
+        Such queries are lookups for a specific book or author and are
+        answered from the index alone, without embedding the query. A
+        phrase match needs two or more words, not all stopwords.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return False
+        postings = [self.names.get(term) for term in set(tokens)]
+        if any(docs is None for docs in postings):
+            return False
+        candidates = min(postings, key=len)
+        if len(candidates) > MAX_SCANNED_POSTINGS:
+            return False
+        phrase = " ".join(tokens)
+        is_phrase = len(tokens) > 1 and not set(tokens) <= STOPWORDS
+        for doc in candidates:
+            title = self.titles[doc]
+            if phrase == title or phrase == self.authors[doc]:
+                return True
+            if is_phrase and f" {phrase} " in f" {title} ":
+                return True
+        return False
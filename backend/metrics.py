@@ -0,0 +1,355 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import atexit
+import glob
+import json
+import os
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow vector queries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Per-request stage timings; set by begin_trace, filled in by timer()
+_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar("trace", default=None)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.registry: Optional["Registry"] = None
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        if self.registry is not None:
+            self.registry.track()
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def collect(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._values = {}
+
+    @staticmethod
+    def merge(collected: List[Dict[LabelValues, float]]) -> Dict[LabelValues, float]:
+        merged: Dict[LabelValues, float] = {}
+        for values in collected:
+            for labels, total in values.items():
+                merged[labels] = merged.get(labels, 0.0) + total
+        return merged
+
+    def expose(self, values: Optional[Dict[LabelValues, float]] = None) -> List[str]:
+        values = self.collect() if values is None else values
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, total in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {total:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.registry: Optional["Registry"] = None
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        if self.registry is not None:
+            self.registry.track()
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> Dict[LabelValues, List[float]]:
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._series = {}
+
+    @staticmethod
+    def merge(collected: List[Dict[LabelValues, List[float]]]) -> Dict[LabelValues, List[float]]:
+        merged: Dict[LabelValues, List[float]] = {}
+        for values in collected:
+            for labels, series in values.items():
+                total = merged.setdefault(labels, [0.0] * len(series))
+                for i, count in enumerate(series):
+                    total[i] += count
+        return merged
+
+    def expose(self, values: Optional[Dict[LabelValues, List[float]]] = None) -> List[str]:
+        values = self.collect() if values is None else values
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket = _format_labels(self.labels, labels, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative:g}")
+            cumulative += series[len(self.buckets)]
+            bucket = _format_labels(self.labels, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket} {cumulative:g}")
+            plain = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{plain} {series[-1]:g}")
+            lines.append(f"{self.name}_count{plain} {cumulative:g}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time.
+
+    Across processes the values of live processes are combined by
+    ``aggregate``: "sum" for per-process quantities, "max" for ones every
+    process shares, such as the catalogue size.
+    """
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float], aggregate: str = "sum"):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.aggregate = aggregate
+        self.registry: Optional["Registry"] = None
+
+    def collect(self) -> Optional[float]:
+        try:
+            return float(self.read())
+        except Exception as e:
+            logger.error(f"Error reading gauge {self.name}: {e}")
+            return None
+
+    def reset(self) -> None:
+        pass
+
+    def merge(self, collected: List[Optional[float]]) -> Optional[float]:
+        values = [value for value in collected if value is not None]
+        if not values:
+            return None
+        return max(values) if self.aggregate == "max" else sum(values)
+
+    def expose(self, value: Optional[float] = None) -> List[str]:
+        value = self.collect() if value is None else value
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value:g}"]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """Metrics of this process, or of every worker when ``shared_dir`` is set.
+
+    With a shared directory each process writes its values to
+    ``<pid>.json`` there every ``write_interval`` seconds, and a scrape
+    writes its own file and then merges all of them. Counters and
+    histograms of exited workers stay in the totals, so they never go
+    backwards between scrapes that land on different workers; gauges only
+    count live processes. Clear the directory when the server starts.
+    """
+
+    def __init__(self, shared_dir: Optional[str] = None, write_interval: float = 5.0):
+        self.shared_dir = shared_dir
+        self.write_interval = write_interval
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def _register(self, metric):
+        with self._lock:
+            metric = self._metrics.setdefault(metric.name, metric)
+        metric.registry = self
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float], aggregate: str = "sum") -> Gauge:
+        return self._register(Gauge(name, help_text, read, aggregate))
+
+    def track(self) -> None:
+        """Start this process's writer thread once it records something."""
+        # Threads do not survive fork, so each worker starts its own
+        if not self.shared_dir or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # A forked worker starts from zero: the parent's own file
+                # already holds what it recorded before the fork
+                for metric in self._metrics.values():
+                    metric.reset()
+            self._pid = os.getpid()
+        threading.Thread(target=self._run_writer, name="metrics-writer", daemon=True).start()
+        atexit.register(self.write)
+
+    def _run_writer(self) -> None:
+        while True:
+            time.sleep(self.write_interval)
+            self.write()
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.shared_dir, f"{pid}.json")
+
+    def write(self) -> None:
+        """Write this process's values to the shared directory."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {
+            metric.name: (
+                metric.collect()
+                if isinstance(metric, Gauge)
+                else [[list(labels), values] for labels, values in metric.collect().items()]
+            )
+            for metric in metrics
+        }
+        path = self._path(os.getpid())
+        try:
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(snapshot, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.error(f"Error writing metrics to {path}: {e}")
+
+    def clear_shared_dir(self) -> None:
+        """Remove every process's values, for a fresh start of the server."""
+        for path in glob.glob(os.path.join(self.shared_dir, "*.json")):
+            os.remove(path)
+
+    def _merged(self) -> Dict[str, Any]:
+        self.write()
+        collected: Dict[str, list] = {}
+        for path in glob.glob(os.path.join(self.shared_dir, "*.json")):
+            pid = int(os.path.basename(path).split(".")[0])
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading metrics from {path}: {e}")
+                continue
+            alive = _pid_alive(pid)
+            for name, values in snapshot.items():
+                if isinstance(values, list):
+                    values = {tuple(labels): value for labels, value in values}
+                elif not alive:
+                    continue
+                collected.setdefault(name, []).append(values)
+        return collected
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        collected = self._merged() if self.shared_dir else {}
+        lines = []
+        for metric in metrics:
+            if self.shared_dir:
+                lines.extend(metric.expose(metric.merge(collected.get(metric.name, []))))
+            else:
+                lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+# Set METRICS_DIR when several worker processes serve /api/metrics
+registry = Registry(os.environ.get("METRICS_DIR"))
+
+stage_seconds = registry.histogram(
+    "library_stage_seconds", "Time spent in each hot-path stage", ("stage",)
+)
+request_seconds = registry.histogram(
+    "library_request_seconds", "End-to-end request latency", ("endpoint",)
+)
+requests_total = registry.counter(
+    "library_requests_total", "Requests served", ("endpoint", "status")
+)
+slow_requests_total = registry.counter(
+    "library_slow_requests_total", "Requests slower than the slow-request threshold", ("endpoint",)
+)
+
+
+@contextmanager
+def timer(stage: str):
+    """Record the duration of a stage in the histogram and the current request trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace[stage] = trace.get(stage, 0.0) + elapsed
+
+
+def begin_trace() -> Dict[str, float]:
+    trace: Dict[str, float] = {}
+    _trace.set(trace)
+    return trace
+
+
+def end_trace(
+    endpoint: str,
+    status: int,
+    elapsed: float,
+    slow_threshold: float = 0.5,
+    slow_sample_rate: float = 0.1,
+) -> None:
+    """Record a finished request and log a sample of the slow ones with their stages."""
+    trace = _trace.get() or {}
+    _trace.set(None)
+    request_seconds.observe(elapsed, endpoint)
+    requests_total.inc(endpoint, str(status))
+    if elapsed >= slow_threshold:
+        slow_requests_total.inc(endpoint)
+        if random.random() < slow_sample_rate:
+            stages = ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in sorted(trace.items()))
+            logger.warning(f"Slow request {endpoint} {status} {elapsed * 1000:.1f}ms [{stages}]")
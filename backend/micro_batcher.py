@@ -0,0 +1,95 @@
+from concurrent.futures import Future
+from typing import Any, Callable, List
+import os
+import queue
+import threading
+import time
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+batch_size = metrics.registry.histogram(
+    "library_batch_size",
+    "Items per coalesced batch",
+    ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+batch_fill = metrics.registry.histogram(
+    "library_batch_fill_ratio",
+    "Batch size as a fraction of the batcher's maximum",
+    ("batcher",),
+    buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item calls into one call of ``fn`` on a list.
+
+    Callers block in ``submit`` while a background thread collects items
+    for up to ``max_wait`` seconds or ``max_batch_size`` items, runs
+    ``fn(items)`` once and hands each caller its own result. ``fn`` must
+    return one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        name: str = "batch",
+    ):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue: "queue.Queue" = queue.Queue()
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so each process starts its own worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(
+                    target=self._run, args=(self._queue,), name=f"{self.name}-batcher", daemon=True
+                ).start()
+                self._pid = os.getpid()
+
+    def submit(self, item: Any) -> Any:
+        """Result of ``fn`` for ``item``, computed in a batch with concurrent callers."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _collect(self, pending: "queue.Queue") -> list:
+        batch = [pending.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pending: "queue.Queue") -> None:
+        while True:
+            batch = self._collect(pending)
+            batch_size.observe(len(batch), self.name)
+            batch_fill.observe(len(batch) / self.max_batch_size, self.name)
+            try:
+                results = self.fn([item for item, _ in batch])
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
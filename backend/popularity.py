@@ -0,0 +1,286 @@
+from array import array
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import hashlib
+import heapq
+import math
+import sqlite3
+import threading
+import time
+import logging
+from sqlite_buffer import SQLiteWriteBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class DecayedCountMinSketch:
+    """Count-min sketch of exponentially time-decayed counts.
+
+    Instead of decaying every counter, increments are scaled up by
+    ``exp(rate * (t - origin))`` and estimates scaled back down on read.
+    Scaled counts of different keys stay comparable without any decay,
+    which lets the top-K tracker rank them directly.
+    """
+
+    # Rescale all counters before the growth factor overflows float precision
+    MAX_SCALE = 1e12
+
+    def __init__(self, width: int = 4096, depth: int = 4, half_life: float = 7 * 24 * 3600):
+        self.width = width
+        self.depth = depth
+        self.rate = math.log(2) / half_life
+        self.origin = time.time()
+        self.counters = [array("d", bytes(8 * width)) for _ in range(depth)]
+
+    def _slots(self, key: Hashable) -> List[int]:
+        digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=4 * self.depth).digest()
+        return [
+            int.from_bytes(digest[4 * row : 4 * row + 4], "little") % self.width
+            for row in range(self.depth)
+        ]
+
+    def _scale(self, timestamp: float) -> float:
+        scale = math.exp(self.rate * (timestamp - self.origin))
+        if scale > self.MAX_SCALE:
+            self._rebase(timestamp)
+            scale = 1.0
+        return scale
+
+    def _rebase(self, timestamp: float) -> None:
+        factor = math.exp(-self.rate * (timestamp - self.origin))
+        for row in self.counters:
+            for i in range(len(row)):
+                row[i] *= factor
+        self.origin = timestamp
+
+    def add(self, key: Hashable, weight: float = 1.0, timestamp: Optional[float] = None) -> float:
+        """Record ``weight`` for ``key`` and return its new scaled estimate."""
+        scaled = weight * self._scale(timestamp or time.time())
+        estimate = math.inf
+        for row, slot in zip(self.counters, self._slots(key)):
+            row[slot] += scaled
+            estimate = min(estimate, row[slot])
+        return estimate
+
+    def scaled_estimate(self, key: Hashable) -> float:
+        return min(row[slot] for row, slot in zip(self.counters, self._slots(key)))
+
+    def estimate(self, key: Hashable, timestamp: Optional[float] = None) -> float:
+        """Decayed count of ``key`` as of ``timestamp``."""
+        return self.scaled_estimate(key) * math.exp(
+            -self.rate * ((timestamp or time.time()) - self.origin)
+        )
+
+
+class DecayedTopK:
+    """Heaviest keys of a decayed sketch, kept in bounded memory."""
+
+    def __init__(self, k: int = 100, width: int = 4096, depth: int = 4, half_life: float = 7 * 24 * 3600):
+        self.k = k
+        self.sketch = DecayedCountMinSketch(width, depth, half_life)
+        # Candidate key -> scaled estimate; trimmed back to k when it doubles
+        self.candidates: Dict[Hashable, float] = {}
+
+    def add(self, key: Hashable, weight: float = 1.0, timestamp: Optional[float] = None) -> None:
+        origin = self.sketch.origin
+        estimate = self.sketch.add(key, weight, timestamp)
+        if self.sketch.origin != origin:
+            # The sketch rebased; re-read candidates in the new scale
+            self.candidates = {c: self.sketch.scaled_estimate(c) for c in self.candidates}
+        self.candidates[key] = estimate
+        if len(self.candidates) > 2 * self.k:
+            self.candidates = dict(
+                heapq.nlargest(self.k, self.candidates.items(), key=lambda item: item[1])
+            )
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """(key, decayed count) pairs, heaviest first."""
+        decay = math.exp(-self.sketch.rate * (time.time() - self.sketch.origin))
+        best = heapq.nlargest(n or self.k, self.candidates.items(), key=lambda item: item[1])
+        return [(key, scaled * decay) for key, scaled in best]
+
+
+class PopularityStore:
+    """Decayed view counts of books and genres in a SQLite file shared by worker processes.
+
+    Like the sketch, each view is stored scaled up by
+    ``exp(rate * (t - origin))`` and added to its key's score, so every
+    worker's increments simply add up and ranking needs no decay pass.
+    The origin lives in the file and moves forward, rescaling every score,
+    before the scale would overflow float precision.
+    """
+
+    MAX_SCALE = 1e12
+
+    def __init__(
+        self,
+        path: str,
+        half_life: float = 7 * 24 * 3600,
+        batch_size: int = 256,
+        flush_interval: float = 5.0,
+    ):
+        self.path = path
+        self.rate = math.log(2) / half_life
+        self._buffer = SQLiteWriteBuffer(
+            path,
+            """
+            CREATE TABLE IF NOT EXISTS popularity (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_popularity_score ON popularity (kind, score);
+            CREATE TABLE IF NOT EXISTS popularity_origin (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                origin REAL NOT NULL
+            );
+            """,
+            self._write,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            name="popularity counts",
+        )
+
+    def reopen(self) -> None:
+        self._buffer.reopen()
+
+    def add(self, kind: str, key: Hashable, weight: float = 1.0, timestamp: Optional[float] = None) -> None:
+        """Buffer ``weight`` views of ``key`` (a book or a genre, by ``kind``)."""
+        self._buffer.add((kind, str(key), weight, timestamp or time.time()))
+
+    def flush(self) -> None:
+        self._buffer.flush()
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    def _origin(self, conn: sqlite3.Connection, timestamp: float) -> float:
+        conn.execute(
+            "INSERT OR IGNORE INTO popularity_origin (id, origin) VALUES (0, ?)", (timestamp,)
+        )
+        (origin,) = conn.execute("SELECT origin FROM popularity_origin").fetchone()
+        return origin
+
+    def _write(self, conn: sqlite3.Connection, views: List[tuple]) -> None:
+        latest = max(timestamp for _, _, _, timestamp in views)
+        origin = self._origin(conn, latest)
+        if math.exp(self.rate * (latest - origin)) > self.MAX_SCALE:
+            conn.execute(
+                "UPDATE popularity SET score = score * ?",
+                (math.exp(-self.rate * (latest - origin)),),
+            )
+            conn.execute("UPDATE popularity_origin SET origin = ?", (latest,))
+            origin = latest
+        scores: Dict[Tuple[str, str], float] = {}
+        for kind, key, weight, timestamp in views:
+            scaled = weight * math.exp(self.rate * (timestamp - origin))
+            scores[(kind, key)] = scores.get((kind, key), 0.0) + scaled
+        conn.executemany(
+            "INSERT INTO popularity (kind, key, score) VALUES (?, ?, ?) "
+            "ON CONFLICT(kind, key) DO UPDATE SET score = score + excluded.score",
+            [(kind, key, score) for (kind, key), score in scores.items()],
+        )
+
+    def top(self, kind: str, n: int) -> List[Tuple[str, float]]:
+        """(key, decayed count) pairs of the ``n`` most viewed keys, heaviest first.
+
+        Reads on a connection of its own, so writers are not held up.
+        """
+        self.flush()
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            # One statement, so a concurrent rebase cannot split origin and scores
+            rows = conn.execute(
+                "SELECT key, score, origin FROM popularity, popularity_origin "
+                "WHERE kind = ? ORDER BY score DESC LIMIT ?",
+                (kind, n),
+            ).fetchall()
+        finally:
+            conn.close()
+        now = time.time()
+        return [(key, score * math.exp(-self.rate * (now - origin))) for key, score, origin in rows]
+
+
+class PopularityTracker:
+    """Time-decayed view popularity of books and genres.
+
+    Views update the sketches, or with a ``store`` the counts every worker
+    shares; the ranked lists read by cold-start recommendations are
+    recomputed at most every ``refresh_interval`` seconds, so reads are a
+    lookup of a precomputed list.
+    """
+
+    def __init__(
+        self,
+        half_life: float = 7 * 24 * 3600,
+        top_k: int = 200,
+        refresh_interval: float = 30.0,
+        store: Optional[PopularityStore] = None,
+    ):
+        self.top_k = top_k
+        self.store = store
+        self.books = DecayedTopK(k=top_k, half_life=half_life)
+        self.genres = DecayedTopK(k=top_k, width=1024, half_life=half_life)
+        self.refresh_interval = refresh_interval
+        self._top_books: List[Tuple[Hashable, float]] = []
+        self._top_genres: List[Tuple[Hashable, float]] = []
+        self._refreshed_at = -math.inf  # refresh on first read
+        self._lock = threading.Lock()
+
+    def record(self, book_key: Hashable, genres: Iterable[str] = (), weight: float = 1.0) -> None:
+        now = time.time()
+        if self.store is not None:
+            self.store.add("book", book_key, weight, now)
+            for genre in genres:
+                self.store.add("genre", genre, weight, now)
+            return
+        with self._lock:
+            self.books.add(book_key, weight, now)
+            for genre in genres:
+                self.genres.add(genre, weight, now)
+
+    def refresh(self) -> None:
+        if self.store is not None:
+            try:
+                top_books = self.store.top("book", self.top_k)
+                top_genres = self.store.top("genre", self.top_k)
+            except sqlite3.Error as e:
+                logger.error(f"Error reading popularity counts: {e}")
+                top_books, top_genres = self._top_books, self._top_genres
+        else:
+            with self._lock:
+                top_books, top_genres = self.books.top(), self.genres.top()
+        with self._lock:
+            self._top_books, self._top_genres = top_books, top_genres
+            self._refreshed_at = time.monotonic()
+
+    def _maybe_refresh(self) -> None:
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
+
+    def top_books(self) -> List[Tuple[Hashable, float]]:
+        self._maybe_refresh()
+        return self._top_books
+
+    def top_genres(self) -> List[Tuple[Hashable, float]]:
+        self._maybe_refresh()
+        return self._top_genres
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+
+    def reopen(self) -> None:
+        if self.store is not None:
+            self.store.reopen()
+        self._lock = threading.Lock()
+
+
+def create_popularity_tracker(
+    path: Optional[str] = None,
+    half_life: float = 7 * 24 * 3600,
+    **kwargs,
+) -> PopularityTracker:
+    """Tracker on a shared SQLite store when ``path`` is given, in-memory otherwise."""
+    store = PopularityStore(path, half_life=half_life) if path else None
+    return PopularityTracker(half_life=half_life, store=store, **kwargs)
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value``; ``ttl`` overrides the cache-wide TTL for this entry."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class QueryCache:
+    """Caches query embeddings and query results for the recommendation system.
+
+    ``version_fn`` returns the current catalogue version; it is polled at
+    most every ``version_check_interval`` seconds and both caches are
+    cleared whenever the version changes, e.g. after a re-ingestion.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = 300,
+        version_fn: Optional[Callable[[], Any]] = None,
+        version_check_interval: float = 30,
+    ):
+        self.embeddings = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self._version = version_fn() if version_fn else None
+        self._next_version_check = time.monotonic() + version_check_interval
+
+    def check_version(self) -> None:
+        """Clear both caches if the catalogue version has moved."""
+        if self.version_fn is None or time.monotonic() < self._next_version_check:
+            return
+        self._next_version_check = time.monotonic() + self.version_check_interval
+        try:
+            version = self.version_fn()
+        except Exception as e:
+            logger.error(f"Error reading catalogue version: {e}")
+            return
+        if version != self._version:
+            logger.info(f"Catalogue version changed to {version}, clearing query cache")
+            self._version = version
+            self.invalidate()
+
+    def version(self) -> Any:
+        """Current catalogue version, polled like ``check_version``."""
+        self.check_version()
+        return self._version
+
+    def embedding(self, text: str, compute: Callable[[], Any]) -> Any:
+        self.check_version()
+        return self.embeddings.get_or_set(text, compute)
+
+    def result(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        self.check_version()
+        return self.results.get_or_set(key, compute)
+
+    def invalidate(self) -> None:
+        self.embeddings.clear()
+        self.results.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
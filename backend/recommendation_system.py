@@ -1,38 +1,303 @@
 import chromadb
-from collections import Counter, deque
-from typing import List, Dict, Any
+from chromadb.utils import embedding_functions
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+import ast
+import json
 import logging
+import numpy as np
+from query_cache import QueryCache
+from history_store import InMemoryHistoryStore
+from taste_vectors import TasteVectorStore
+from catalogue import BookRecord, Catalogue
+import metrics
+from search_filters import METADATA_VERSION, SearchFilters
+from lexical_index import reciprocal_rank_fusion
+from vector_index import ChromaIndex
+from micro_batcher import MicroBatcher
+from popularity import PopularityTracker
+from coview import CoViewModel
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class BookRecommendationSystem:
-    def __init__(self, collection):
+    def __init__(
+        self,
+        collection,
+        embedding_function=None,
+        cache_size: int = 1024,
+        cache_ttl: float = 300,
+        catalogue_version_fn=None,
+        history_store=None,
+        title_index=None,
+        taste_decay: float = 0.7,
+        catalogue=None,
+        lexical_index=None,
+        vector_index=None,
+        batch_max_size: int = 32,
+        batch_max_wait: float = 0.005,
+        popularity=None,
+        coview=None,
+    ):
         self.collection = collection
-        self.view_history = {}  # Changed from search_history to view_history
+        # Query results are ids hydrated from this in-memory catalogue
+        self.catalogue = (
+            catalogue if catalogue is not None else Catalogue.from_collection(collection)
+        )
+        # Same model the collection was built with, so cached vectors match Chroma's
+        self.embedding_function = (
+            embedding_function or embedding_functions.DefaultEmbeddingFunction()
+        )
+        self.query_cache = QueryCache(
+            maxsize=cache_size, ttl=cache_ttl, version_fn=catalogue_version_fn
+        )
         self.MAX_HISTORY_SIZE = 5
+        # Pluggable view history backend; see history_store.py
+        self.view_history = history_store or InMemoryHistoryStore(
+            max_per_user=self.MAX_HISTORY_SIZE
+        )
+        # Title -> collection id lookups for fetching stored book embeddings
+        self.title_index = title_index
+        # Taste vectors cover exactly the views the history store keeps
+        self.taste_vectors = TasteVectorStore(
+            decay=taste_decay, window=self.view_history.max_per_user
+        )
+        # Optional BM25 index fused with vector results in search; see lexical_index.py
+        self.lexical_index = lexical_index
+        # Nearest-neighbour backend; see vector_index.py
+        self.vector_index = vector_index or ChromaIndex(collection)
+        # Filters run inside the vector query once database.py has written the
+        # filterable metadata; older stores and in-process indexes fall back
+        # to filtering the catalogue.
+        self.filter_pushdown = self.vector_index.supports_where and (
+            (collection.metadata or {}).get("metadata_version", 0) >= METADATA_VERSION
+        )
+        # Decayed view counts behind cold-start recommendations; see popularity.py
+        self.popularity = popularity or PopularityTracker()
+        # Books viewed by the same users, tried before the taste vector; see coview.py
+        self.coview = coview if coview is not None else CoViewModel()
+        # Concurrent single-query embeddings and vector searches are coalesced
+        # into batched calls; a max size of 1 turns batching off.
+        self.embedding_batcher = self.query_batcher = None
+        if batch_max_size > 1:
+            self.embedding_batcher = MicroBatcher(
+                self._embed_batch, batch_max_size, batch_max_wait, name="embed"
+            )
+            self.query_batcher = MicroBatcher(
+                self._vector_query_batch, batch_max_size, batch_max_wait, name="vector_query"
+            )
         logger.info("Recommendation system initialized")
 
+    def _embed(self, text: str) -> List[float]:
+        """Embed a query string, reusing the cached vector when available."""
+
+        def compute():
+            if self.embedding_batcher is None:
+                return list(self._run_embedding([text])[0])
+            with metrics.timer("embed"):
+                return self.embedding_batcher.submit(text)
+
+        return self.query_cache.embedding(text, compute)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [list(embedding) for embedding in self.embedding_function(texts)]
+
+    def _run_embedding(self, texts: List[str]) -> List[Any]:
+        with metrics.timer("embed"):
+            return self.embedding_function(texts)
+
+    def _vector_query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[List[str]]:
+        with metrics.timer("vector_query"):
+            if self.query_batcher is not None and len(query_embeddings) == 1:
+                return [self.query_batcher.submit((query_embeddings[0], n_results, where))]
+            return self.vector_index.query(query_embeddings, n_results, where)
+
+    def _vector_query_batch(self, items: List[tuple]) -> List[List[str]]:
+        """One multi-query search per distinct (n_results, where) among coalesced queries."""
+        groups: Dict[tuple, List[int]] = {}
+        for i, (_, n_results, where) in enumerate(items):
+            key = (n_results, json.dumps(where, sort_keys=True))
+            groups.setdefault(key, []).append(i)
+
+        results: List[List[str]] = [[] for _ in items]
+        for positions in groups.values():
+            _, n_results, where = items[positions[0]]
+            found = self.vector_index.query(
+                [items[i][0] for i in positions], n_results, where
+            )
+            for i, ids in zip(positions, found):
+                results[i] = ids
+        return results
+
+    def _filtered_query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        filters: Optional[SearchFilters],
+    ) -> List[List[str]]:
+        """Vector query returning ids per embedding, with ``filters`` applied.
+
+        With pushdown the filters become the query's ``where`` clause;
+        otherwise extra candidates are fetched and filtered on the catalogue.
+        """
+        if not filters:
+            return self._vector_query(query_embeddings, n_results)
+
+        if self.filter_pushdown:
+            return self._vector_query(query_embeddings, n_results, filters.to_where())
+
+        results = self._vector_query(
+            query_embeddings, n_results * 4 + len(filters.exclude_ids)
+        )
+        filtered = []
+        with metrics.timer("post_filter"):
+            for ids in results:
+                records = [r for r in self._records(ids) if filters.matches(r)]
+                filtered.append([r.chroma_id for r in records[:n_results]])
+        return filtered
+
+    def _query(
+        self, text: str, n_results: int, filters: Optional[SearchFilters] = None
+    ) -> List[str]:
+        """Run a cached single-text vector query returning collection ids."""
+
+        def run_query():
+            return self._filtered_query([self._embed(text)], n_results, filters)[0]
+
+        key = (text, n_results, filters.cache_key() if filters else None)
+        return self.query_cache.result(key, run_query)
+
+    def _lexical_ids(
+        self, query_text: str, n_results: int, filters: Optional[SearchFilters] = None
+    ) -> List[str]:
+        """BM25 matches for ``query_text`` as collection ids, best first."""
+        with metrics.timer("lexical"):
+            hits = self.lexical_index.search(
+                query_text, n_results * 4 if filters else n_results
+            )
+            ids = [chroma_id for chroma_id, _ in hits]
+            if filters:
+                ids = [r.chroma_id for r in self._records(ids) if filters.matches(r)]
+            return ids[:n_results]
+
+    def _is_lexical_answer(self, query_text: str, lexical_ids: List[str]) -> bool:
+        """Known-item queries are answered by their lexical hits alone, however few.
+
+        The rest of the list is the lexical index's next best matches;
+        the query is never embedded.
+        """
+        return bool(lexical_ids) and self.lexical_index.is_known_item(query_text)
+
+    def _hybrid_query(
+        self, query_text: str, n_results: int, filters: Optional[SearchFilters] = None
+    ) -> List[str]:
+        """Lexical and vector results merged with reciprocal rank fusion."""
+        lexical = self._lexical_ids(query_text, n_results, filters)
+        if self._is_lexical_answer(query_text, lexical):
+            return lexical
+        semantic = self._query(query_text, n_results, filters)
+        return reciprocal_rank_fusion(lexical, semantic)[:n_results]
+
+    def _records(self, ids: List[str]) -> List[BookRecord]:
+        with metrics.timer("hydrate"):
+            return self.catalogue.hydrate(self.collection, ids)
+
+    def _book_embeddings(self, entries: List[Dict[str, Any]]) -> List[np.ndarray]:
+        """Stored embeddings for viewed books, in the order of ``entries``.
+
+        Books the title index cannot resolve are embedded from the same
+        "title genres" text used at ingestion time.
+        """
+        ids = [
+            self.title_index.book_id(entry["title"]) if self.title_index else None
+            for entry in entries
+        ]
+        stored = {}
+        known_ids = [book_id for book_id in ids if book_id]
+        if known_ids:
+            results = self.collection.get(ids=known_ids, include=["embeddings"])
+            stored = dict(zip(results["ids"], results["embeddings"]))
+
+        embeddings = []
+        for entry, book_id in zip(entries, ids):
+            embedding = stored.get(book_id)
+            if embedding is None:
+                embedding = self._embed(f"{entry['title']} {', '.join(entry['genres'])}")
+            embeddings.append(np.asarray(embedding, dtype=np.float32))
+        return embeddings
+
+    def _taste_vector(
+        self, user_id: str, history: List[Dict[str, Any]]
+    ) -> Optional[np.ndarray]:
+        """User's taste vector, rebuilt from history if missing or stale in this process."""
+        latest = history[0]["timestamp"]
+        vector = self.taste_vectors.get(user_id, latest)
+        if vector is None:
+            oldest_first = list(reversed(history))
+            vector = self.taste_vectors.rebuild(
+                user_id, self._book_embeddings(oldest_first), latest
+            )
+        return vector
+
+    def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed several query strings with one model call for the uncached ones."""
+        self.query_cache.check_version()
+        embeddings = {text: self.query_cache.embeddings.get(text) for text in texts}
+        missing = [text for text, embedding in embeddings.items() if embedding is None]
+        if missing:
+            for text, embedding in zip(missing, self._run_embedding(missing)):
+                embeddings[text] = list(embedding)
+                self.query_cache.embeddings.set(text, embeddings[text])
+        return [embeddings[text] for text in texts]
+
+    @staticmethod
+    def _recommendation(record: BookRecord) -> Dict[str, Any]:
+        return record.to_dict()
+
+    @staticmethod
+    def _search_result(record: BookRecord) -> Dict[str, Any]:
+        book = record.to_dict()
+        book["genres"] = [book["genres"]]
+        return book
+
+    def _exclude_viewed(
+        self,
+        records: List[BookRecord],
+        viewed_titles: set,
+        n_recommendations: int,
+    ) -> List[Dict[str, Any]]:
+        """Format up to ``n_recommendations`` results the user has not viewed."""
+        recommendations = []
+        with metrics.timer("post_filter"):
+            for record in records:
+                if record.title not in viewed_titles:  # Only recommend books not in view history
+                    recommendations.append(self._recommendation(record))
+                    if len(recommendations) >= n_recommendations:
+                        break
+        return recommendations
+
     def add_to_view_history(
         self, user_id: str, book_title: str, genres: List[str]
     ) -> None:
-        """Store a book view in memory using a fixed-size deque."""
+        """Store a book view in the capped per-user history store."""
         if not user_id or not book_title or not genres:
             logger.warning(
                 f"Invalid input: user_id={user_id}, title={book_title}, genres={genres}"
             )
             return
 
-        if user_id not in self.view_history:
-            self.view_history[user_id] = deque(maxlen=self.MAX_HISTORY_SIZE)
-
         # Ensure genres is a list
         if isinstance(genres, str):
             try:
-                genres = eval(genres) if genres.startswith("[") else [genres]
-            except:
+                genres = ast.literal_eval(genres) if genres.startswith("[") else [genres]
+            except (ValueError, SyntaxError):
                 genres = [genres]
 
         view_entry = {
@@ -42,182 +307,313 @@ class BookRecommendationSystem:
         }
 
         # Only add if it's not already the most recent entry
-        if (
-            not self.view_history[user_id]
-            or self.view_history[user_id][0]["title"] != book_title
-        ):
-            self.view_history[user_id].appendleft(view_entry)  # Add to front of deque
-            logger.info(f"Added to view history for user {user_id}: {view_entry}")
+        history = self.view_history.get(user_id)
+        if not history or history[0]["title"] != book_title:
+            self.view_history.add(user_id, view_entry)
+            chroma_id = self.title_index.book_id(book_title) if self.title_index else None
+            self.popularity.record(chroma_id or book_title, genres)
+            if chroma_id:
+                self.coview.record(chroma_id, self._viewed_chroma_ids(history))
+            try:
+                # A full history drops its oldest entry, which leaves the taste vector too
+                full = len(history) >= self.view_history.max_per_user
+                embedding, *evicted = self._book_embeddings(
+                    [view_entry] + history[-1:] if full else [view_entry]
+                )
+                self.taste_vectors.update(
+                    user_id,
+                    embedding,
+                    view_entry["timestamp"],
+                    previous=history[0]["timestamp"] if history else None,
+                    evicted=evicted[0] if evicted else None,
+                )
+            except Exception as e:
+                # The vector is rebuilt from history on the next recommendation
+                logger.error(f"Error updating taste vector for user {user_id}: {e}")
+            logger.debug(f"Added to view history for user {user_id}: {book_title}")
 
     def get_user_view_history(self, user_id: str) -> List[Dict[str, Any]]:
         """Get user's complete view history."""
-        history = list(self.view_history.get(user_id, []))
-        logger.info(f"Retrieved view history for user {user_id}: {history}")
+        history = self.view_history.get(user_id)
+        logger.debug(f"Retrieved {len(history)} view history entries for user {user_id}")
         return history
 
+    def _viewed_chroma_ids(self, history: List[Dict[str, Any]]) -> List[str]:
+        """Collection ids of the viewed books the title index can resolve, newest first."""
+        if not self.title_index:
+            return []
+        chroma_ids = (self.title_index.book_id(item["title"]) for item in history)
+        return [chroma_id for chroma_id in chroma_ids if chroma_id]
+
+    def _viewed_book_ids(self, history: List[Dict[str, Any]]) -> List[int]:
+        """Catalogue ids of the viewed books the title index can resolve."""
+        book_ids = []
+        for chroma_id in self._viewed_chroma_ids(history):
+            record = self.catalogue.by_chroma_id(chroma_id)
+            if record is not None:
+                book_ids.append(record.book_id)
+        return book_ids
+
+    def _coview_recommendations(
+        self,
+        history: List[Dict[str, Any]],
+        n_recommendations: int,
+        filters: SearchFilters,
+    ) -> List[Dict[str, Any]]:
+        """Books most co-viewed with the user's history that pass ``filters``."""
+        with metrics.timer("coview"):
+            ids = self.coview.recommend(
+                self._viewed_chroma_ids(history), n_recommendations * 2
+            )
+            recommendations = []
+            for record in self._records(ids):
+                if filters.matches(record):
+                    recommendations.append(self._recommendation(record))
+                    if len(recommendations) == n_recommendations:
+                        break
+        return recommendations
+
     def recommend_books_based_on_history(
-        self, user_id: str, n_recommendations: int = 5
+        self,
+        user_id: str,
+        n_recommendations: int = 5,
+        filters: Optional[SearchFilters] = None,
     ) -> List[Dict[str, Any]]:
-        """Recommend books based on the genres of the books in the user's view history."""
-        logger.info(f"Generating recommendations for user {user_id}")
+        """Recommend books co-viewed with the user's history, excluding viewed books.
 
-        if user_id not in self.view_history or not self.view_history[user_id]:
+        Co-view neighbours need no model call; when they are too sparse to
+        fill the list, the rest comes from the taste vector query.
+        """
+        logger.debug(f"Generating recommendations for user {user_id}")
+
+        history = self.view_history.get(user_id)
+        if not history:
             logger.info(
                 f"No view history found for user {user_id}, returning default recommendations"
             )
-            return self._get_default_recommendations(n_recommendations)
-
-        # Get the genres from the user's view history
-        genres = []
-        viewed_titles = (
-            set()
-        )  # Track viewed titles to exclude them from recommendations
-
-        for item in self.view_history[user_id]:
-            viewed_titles.add(item["title"])
-            item_genres = item["genres"]
-            if isinstance(item_genres, str):
-                try:
-                    genre_list = (
-                        eval(item_genres)
-                        if item_genres.startswith("[")
-                        else [item_genres]
-                    )
-                    genres.extend(genre_list)
-                except:
-                    genres.append(item_genres)
-            else:
-                genres.extend(item_genres)
-
-        # Weight recent views more heavily by counting them multiple times
-        genre_counter = Counter()
-        for i, item in enumerate(self.view_history[user_id]):
-            weight = len(self.view_history[user_id]) - i  # More recent = higher weight
-            item_genres = item["genres"]
-            if isinstance(item_genres, str):
-                try:
-                    genre_list = (
-                        eval(item_genres)
-                        if item_genres.startswith("[")
-                        else [item_genres]
-                    )
-                except:
-                    genre_list = [item_genres]
-            else:
-                genre_list = item_genres
+            return self._get_default_recommendations(n_recommendations, filters)
 
-            for genre in genre_list:
-                genre_counter[genre] += weight
+        # Track viewed titles to exclude them from recommendations
+        viewed_titles = {item["title"] for item in history}
+        viewed_ids = set(self._viewed_book_ids(history))
+        # Viewed books are excluded inside the query; only unresolved titles need over-fetch
+        query_filters = (filters or SearchFilters()).excluding(viewed_ids)
 
-        most_common_genres = [genre for genre, _ in genre_counter.most_common()]
+        coviewed = []
+        try:
+            coviewed = self._coview_recommendations(history, n_recommendations, query_filters)
+            if len(coviewed) == n_recommendations:
+                return coviewed
+        except Exception as e:
+            logger.error(f"Error generating co-view recommendations: {e}")
 
-        logger.info(f"Most common genres for user {user_id}: {most_common_genres}")
+        try:
+            taste = self._taste_vector(user_id, history)
+            if taste is None:
+                logger.warning("No taste vector available for user history")
+                return coviewed or self._get_default_recommendations(n_recommendations, filters)
 
-        if not most_common_genres:
-            logger.warning("No genres found in user history")
-            return self._get_default_recommendations(n_recommendations)
+            ids = self._filtered_query(
+                [TasteVectorStore.normalize(taste).tolist()],
+                n_recommendations + len(viewed_titles) - len(viewed_ids) + len(coviewed),
+                query_filters,
+            )[0]
 
-        try:
-            # Query the collection for books with similar genres
-            results = self.collection.query(
-                query_texts=[", ".join(most_common_genres[:3])],  # Use top 3 genres
-                n_results=n_recommendations
-                + len(viewed_titles),  # Get extra results to account for filtering
-                include=["documents", "metadatas"],
+            seen = {book["id"] for book in coviewed}
+            recommendations = coviewed + self._exclude_viewed(
+                [record for record in self._records(ids) if str(record.book_id) not in seen],
+                viewed_titles,
+                n_recommendations - len(coviewed),
             )
 
-            recommendations = []
-            for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
-                if doc not in viewed_titles:  # Only recommend books not in view history
-                    book = {
-                        "id": meta.get("id", str(hash(doc))),
-                        "title": doc,
-                        "author": meta.get("author", ""),
-                        "num_pages": meta.get("num_pages", ""),
-                        "cover_image_uri": meta.get("cover_image_uri", ""),
-                        "book_details": meta.get("book_details", ""),
-                        "genres": meta.get("genres", []),
-                        "available": meta.get("available", True),
-                    }
-                    recommendations.append(book)
-                    if len(recommendations) >= n_recommendations:
-                        break
-
-            logger.info(f"Generated {len(recommendations)} recommendations")
+            logger.debug(f"Generated {len(recommendations)} recommendations")
             return recommendations
 
         except Exception as e:
             logger.error(f"Error generating recommendations: {e}")
-            return self._get_default_recommendations(n_recommendations)
+            return coviewed or self._get_default_recommendations(n_recommendations, filters)
 
     def search_books(
-        self, user_id: str, query_text: str, n_results: int = 10
+        self,
+        user_id: str,
+        query_text: str,
+        n_results: int = 10,
+        filters: Optional[SearchFilters] = None,
     ) -> List[Dict[str, Any]]:
-        """Search for books and update user history."""
+        """Search for books matching ``query_text`` and optional ``filters``."""
         try:
-            results = self.collection.query(
-                query_texts=[query_text],
-                n_results=n_results,
-                include=["documents", "metadatas"],
+            if self.lexical_index is not None:
+                results = self._hybrid_query(query_text, n_results, filters)
+            else:
+                results = self._query(query_text, n_results, filters)
+            return [self._search_result(record) for record in self._records(results)]
+        except Exception as e:
+            logger.error(
+                f"Error searching books for query '{query_text}' by user {user_id}: {e}"
             )
+            return []
 
-            # Debugging: Print the raw results
-            print(
-                f"Raw search results for query '{query_text}' by user {user_id}: {results}"
-            )
+    def nearest_titles(self, title: str, n: int = 20) -> List[BookRecord]:
+        """Catalogue records of the ``n`` books whose embeddings are nearest ``title``.
+
+        For resolving misspelled or partial titles; the vector query is
+        cached like any other.
+        """
+        return self._records(self._query(title, n))
 
-            books = []
-            for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
-                genres = meta.get("genres", [])
-                if not isinstance(genres, list):
-                    genres = [genres]
-                books.append(
-                    {
-                        "title": doc,
-                        "author": meta.get("author", ""),
-                        "num_pages": meta.get("num_pages", ""),
-                        "cover_image_uri": meta.get("cover_image_uri", ""),
-                        "book_details": meta.get("book_details", ""),
-                        "genres": genres,
-                        "available": meta.get("available", True),
-                    }
+    def search_books_batch(
+        self,
+        queries: List[str],
+        n_results: int = 10,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search several queries with one embedding batch and one vector query."""
+        self.query_cache.check_version()
+        filters_key = filters.cache_key() if filters else None
+        lexical: Dict[str, List[str]] = {}
+        if self.lexical_index is not None:
+            for query_text in set(queries):
+                lexical[query_text] = self._lexical_ids(query_text, n_results, filters)
+
+        results: Dict[str, List[str]] = {}
+        for query_text in set(queries):
+            if query_text in lexical and self._is_lexical_answer(query_text, lexical[query_text]):
+                results[query_text] = lexical.pop(query_text)
+                continue
+            cached = self.query_cache.results.get((query_text, n_results, filters_key))
+            if cached is not None:
+                results[query_text] = cached
+
+        missing = [q for q in dict.fromkeys(queries) if q not in results]
+        if missing:
+            try:
+                raw = self._filtered_query(self._embed_many(missing), n_results, filters)
+            except Exception as e:
+                logger.error(f"Error running batch search for {len(missing)} queries: {e}")
+                raw = None
+            for i, query_text in enumerate(missing):
+                if raw is None:
+                    results[query_text] = []
+                    continue
+                results[query_text] = raw[i]
+                self.query_cache.results.set(
+                    (query_text, n_results, filters_key), results[query_text]
                 )
-                print(
-                    f"Search results for query '{query_text}' by user {user_id}: {books}"
+
+        for query_text, lexical_ids in lexical.items():
+            results[query_text] = reciprocal_rank_fusion(
+                lexical_ids, results[query_text]
+            )[:n_results]
+
+        return [
+            [self._search_result(record) for record in self._records(results[query_text])]
+            for query_text in queries
+        ]
+
+    def recommend_books_batch(
+        self,
+        user_ids: List[str],
+        n_recommendations: int = 5,
+        filters: Optional[SearchFilters] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Recommendations for many users, served by one multi-vector query.
+
+        Users whose co-view neighbours fill the list skip the vector query.
+        The result is keyed by user id in request order.
+        """
+        recommendations: Dict[str, List[Dict[str, Any]]] = {}
+        query_users, query_vectors, viewed, coviewed = [], [], {}, {}
+
+        for user_id in dict.fromkeys(user_ids):
+            history = self.view_history.get(user_id)
+            taste = None
+            if history:
+                try:
+                    coviewed[user_id] = self._coview_recommendations(
+                        history,
+                        n_recommendations,
+                        (filters or SearchFilters()).excluding(self._viewed_book_ids(history)),
+                    )
+                except Exception as e:
+                    logger.error(f"Error generating co-view recommendations for user {user_id}: {e}")
+                if len(coviewed.get(user_id, [])) == n_recommendations:
+                    recommendations[user_id] = coviewed[user_id]
+                    continue
+                try:
+                    taste = self._taste_vector(user_id, history)
+                except Exception as e:
+                    logger.error(f"Error building taste vector for user {user_id}: {e}")
+            if taste is None:
+                recommendations[user_id] = coviewed.get(user_id) or None
+                continue
+            query_users.append(user_id)
+            query_vectors.append(TasteVectorStore.normalize(taste).tolist())
+            viewed[user_id] = {item["title"] for item in history}
+
+        if query_users:
+            try:
+                results = self._filtered_query(
+                    query_vectors,
+                    n_recommendations
+                    + max(len(titles) for titles in viewed.values())
+                    + max(len(coviewed.get(user_id, [])) for user_id in query_users),
+                    filters,
                 )
-            return books
-        except Exception as e:
-            print(
-                f"Error searching books for query '{query_text}' by user {user_id}: {e}"
-            )
-            return []
+                for user_id, ids in zip(query_users, results):
+                    found = coviewed.get(user_id, [])
+                    seen = {book["id"] for book in found}
+                    recommendations[user_id] = found + self._exclude_viewed(
+                        [r for r in self._records(ids) if str(r.book_id) not in seen],
+                        viewed[user_id],
+                        n_recommendations - len(found),
+                    )
+            except Exception as e:
+                logger.error(f"Error generating batch recommendations: {e}")
+                for user_id in query_users:
+                    recommendations[user_id] = coviewed.get(user_id) or None
+
+        if any(recs is None for recs in recommendations.values()):
+            defaults = self._get_default_recommendations(n_recommendations, filters)
+            for user_id, recs in recommendations.items():
+                if recs is None:
+                    recommendations[user_id] = defaults
+
+        logger.debug(f"Generated batch recommendations for {len(recommendations)} users")
+        return {user_id: recommendations[user_id] for user_id in dict.fromkeys(user_ids)}
 
     def _get_default_recommendations(
-        self, n_recommendations: int
+        self, n_recommendations: int, filters: Optional[SearchFilters] = None
     ) -> List[Dict[str, Any]]:
-        """Get default recommendations when no history is available."""
-        try:
-            results = self.collection.query(
-                query_texts=["popular books"],
-                n_results=n_recommendations,
-                include=["documents", "metadatas"],
-            )
+        """Most viewed books lately, for users without history.
 
+        Served from the popularity tracker's precomputed list; until enough
+        views have been recorded the rest is filled from the catalogue in
+        book id order, so no model call is made.
+        """
+        try:
             recommendations = []
-            for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
-                book = {
-                    "id": meta.get("id", str(hash(doc))),
-                    "title": doc,
-                    "author": meta.get("author", ""),
-                    "num_pages": meta.get("num_pages", ""),
-                    "cover_image_uri": meta.get("cover_image_uri", ""),
-                    "book_details": meta.get("book_details", ""),
-                    "genres": meta.get("genres", []),
-                    "available": meta.get("available", True),
-                }
-                recommendations.append(book)
-
-            logger.info(f"Generated {len(recommendations)} default recommendations")
+            for key, _ in self.popularity.top_books():
+                record = self.catalogue.by_chroma_id(key)
+                if record is None or (filters and not filters.matches(record)):
+                    continue
+                recommendations.append(self._recommendation(record))
+                if len(recommendations) == n_recommendations:
+                    return recommendations
+
+            seen = {book["id"] for book in recommendations}
+            cursor = None
+            while len(recommendations) < n_recommendations:
+                records, cursor = self.catalogue.page(
+                    cursor,
+                    n_recommendations - len(recommendations),
+                    lambda record: str(record.book_id) not in seen
+                    and (not filters or filters.matches(record)),
+                )
+                recommendations.extend(self._recommendation(record) for record in records)
+                if cursor is None:
+                    break
+
+            logger.debug(f"Generated {len(recommendations)} default recommendations")
             return recommendations
 
         except Exception as e:
@@ -1,13 +1,33 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import chromadb.errors
 from chromadb import PersistentClient
 import firebase_admin
-from firebase_admin import auth as firebase_auth
 from firebase_admin import credentials
 from functools import wraps
 import ast
 from recommendation_system import BookRecommendationSystem
+from catalogue import Catalogue
+from snapshot import CatalogueSnapshot
+from startup import Lazy, Readiness, WarmUp
+from history_store import create_history_store
+from blocking_pool import BlockingPool, Overloaded
+from token_verifier import TokenVerifier
+from search_filters import SearchFilters
+from similar_books import NeighborTable
+from lexical_index import LexicalIndex
+from vector_index import ChromaIndex, QuantizedIndex, ShardedIndex
+from popularity import create_popularity_tracker
+from coview import create_coview_model
+from http_cache import ResponseCache, select_fields
+import atexit
+import csv
+import io
+import json
+import os
+import threading
+import time
+import metrics
 from difflib import get_close_matches
 from urllib.parse import unquote
 import logging
@@ -26,26 +46,316 @@ CORS(
     },
 )
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate(
-    "D:\\CITL project\\library-management\\backend\\serviceAccountKey.json"
+
+def create_token_verifier():
+    """Initialize the Firebase Admin SDK and the local ID token verifier."""
+    cred = credentials.Certificate(
+        os.environ.get(
+            "FIREBASE_CREDENTIALS",
+            "D:\\CITL project\\library-management\\backend\\serviceAccountKey.json",
+        )
+    )
+    firebase_admin.initialize_app(cred)
+    return TokenVerifier(project_id=cred.project_id)
+
+
+# Verifies ID tokens locally against cached signing certificates; created on
+# the first authenticated request so startup does not wait for Firebase
+token_verifier = Lazy(create_token_verifier)
+
+# Components warmed in the background; /api/health reports ready once all are
+readiness = Readiness(["embedding_model", "vector_index"])
+
+DB_PATH = os.environ.get(
+    "BOOKS_DB_PATH", "D:\\CITL project\\library-management\\backend\\db_storage"
 )
-firebase_admin.initialize_app(cred)
 
-# Initialize ChromaDB Client
-client = PersistentClient(
-    path="D:\\CITL project\\library-management\\backend\\db_storage"
+
+def open_books_collection():
+    # Initialize ChromaDB Client
+    client = PersistentClient(path=DB_PATH)
+
+    try:
+        collection = client.get_collection("books")
+    except chromadb.errors.InvalidCollectionException:
+        collection = client.create_collection(
+            name="books", metadata={"description": "Books collection"}
+        )
+    return client, collection
+
+
+client, collection = open_books_collection()
+
+def catalogue_version():
+    """Version stamp written by database.py whenever the catalogue changes."""
+    return (client.get_collection("books").metadata or {}).get("catalogue_version")
+
+
+# View history shared by all worker processes through a WAL-mode SQLite file
+history_store = create_history_store(
+    os.environ.get(
+        "VIEW_HISTORY_DB",
+        "D:\\CITL project\\library-management\\backend\\view_history.sqlite3",
+    )
+)
+atexit.register(history_store.close)
+
+# Co-view counts behind item-to-item recommendations; workers add their
+# increments to one SQLite file and read the neighbours of viewed books from it
+coview_model = create_coview_model(
+    os.environ.get(
+        "COVIEW_DB",
+        "D:\\CITL project\\library-management\\backend\\coview.sqlite3",
+    ),
+    max_neighbors=int(os.environ.get("COVIEW_NEIGHBORS", 50)),
+    cache_ttl=float(os.environ.get("COVIEW_CACHE_SECONDS", 60)),
+)
+atexit.register(coview_model.close)
+
+# Decayed view counts behind /api/popular and cold-start recommendations,
+# summed over every worker in one SQLite file
+popularity = create_popularity_tracker(
+    os.environ.get(
+        "POPULARITY_DB",
+        "D:\\CITL project\\library-management\\backend\\popularity.sqlite3",
+    ),
+    half_life=float(os.environ.get("POPULARITY_HALF_LIFE_HOURS", 168)) * 3600,
+    refresh_interval=float(os.environ.get("POPULARITY_REFRESH_SECONDS", 30)),
+)
+atexit.register(popularity.close)
+
+# The in-memory catalogue (queries return ids hydrated from it), the title
+# index used by the book details page and the autocomplete structure come
+# from one prebuilt snapshot; they are rebuilt only when it is out of date.
+CATALOGUE_SNAPSHOT = os.environ.get(
+    "CATALOGUE_SNAPSHOT",
+    "D:\\CITL project\\library-management\\backend\\catalogue_snapshot.pickle",
 )
 
-try:
-    collection = client.get_collection("books")
-except chromadb.errors.InvalidCollectionException:
-    collection = client.create_collection(
-        name="books", metadata={"description": "Books collection"}
+
+def load_catalogue_snapshot():
+    version = catalogue_version()
+    snapshot = CatalogueSnapshot.load(CATALOGUE_SNAPSHOT)
+    if snapshot is not None and snapshot.catalogue_version == version:
+        return snapshot
+    logging.warning("Catalogue snapshot missing or stale; rebuilding it from the collection")
+    snapshot = CatalogueSnapshot.build(Catalogue.from_collection(collection), version)
+    if CATALOGUE_SNAPSHOT:
+        try:
+            snapshot.save(CATALOGUE_SNAPSHOT)
+        except OSError as e:
+            logging.warning(f"Could not write catalogue snapshot: {e}")
+    return snapshot
+
+
+snapshot = load_catalogue_snapshot()
+catalogue = snapshot.catalogue
+title_index = snapshot.title_index
+# Prefix completions for typed titles and authors; never touches the model
+autocomplete = snapshot.autocomplete
+
+# Precomputed related books, memory-mapped and shared by every worker
+similar_books = NeighborTable.load(
+    os.environ.get(
+        "SIMILAR_BOOKS_PATH",
+        "D:\\CITL project\\library-management\\backend\\similar_books",
+    )
+)
+if similar_books and similar_books.catalogue_version != catalogue_version():
+    logging.warning("Similar books table predates the catalogue; rerun similar_books.py")
+
+# BM25 index written by database.py; rebuilt in memory if the catalogue has moved on
+lexical_index = LexicalIndex.load(
+    os.environ.get(
+        "LEXICAL_INDEX_PATH",
+        "D:\\CITL project\\library-management\\backend\\lexical_index.pickle",
     )
+)
+if lexical_index is None or lexical_index.catalogue_version != catalogue_version():
+    logging.warning("Lexical index missing or stale; building it from the catalogue")
+    lexical_index = LexicalIndex.from_catalogue(catalogue, catalogue_version())
+
+# "chroma" queries the collection's index; "sharded" fans out over the shard
+# collections written by database.py --shards; "quantized" scans the int8
+# index written by vector_index.py in-process
+VECTOR_INDEX = os.environ.get("VECTOR_INDEX", "chroma")
+if VECTOR_INDEX == "sharded":
+    shard_count = (collection.metadata or {}).get("shard_count", 0)
+    if not shard_count:
+        raise RuntimeError("VECTOR_INDEX=sharded but the store has no shards; run database.py --shards N")
+    vector_index = ShardedIndex(DB_PATH, shard_count)
+    atexit.register(vector_index.shutdown)
+elif VECTOR_INDEX == "quantized":
+    vector_index = QuantizedIndex.load(
+        os.environ.get(
+            "QUANTIZED_INDEX_PATH",
+            "D:\\CITL project\\library-management\\backend\\quantized_index",
+        ),
+        rerank_factor=int(os.environ.get("QUANTIZED_RERANK_FACTOR", 4)),
+    )
+    if vector_index.catalogue_version != catalogue_version():
+        logging.warning("Quantized index predates the catalogue; rerun vector_index.py")
+else:
+    vector_index = ChromaIndex(collection)
 
 # Initialize recommendation system
-recommendation_system = BookRecommendationSystem(collection)
+recommendation_system = BookRecommendationSystem(
+    collection,
+    catalogue_version_fn=catalogue_version,
+    history_store=history_store,
+    title_index=title_index,
+    catalogue=catalogue,
+    lexical_index=lexical_index,
+    vector_index=vector_index,
+    batch_max_size=int(os.environ.get("BATCH_MAX_SIZE", 32)),
+    batch_max_wait=float(os.environ.get("BATCH_MAX_WAIT_MS", 5)) / 1000,
+    popularity=popularity,
+    coview=coview_model,
+)
+
+# Vector queries and token verification run here so a slow call cannot tie up
+# every request thread; beyond the limit callers get a 503 straight away.
+blocking_pool = BlockingPool(
+    max_workers=int(os.environ.get("BLOCKING_WORKERS", 8)),
+    max_pending=int(os.environ.get("BLOCKING_QUEUE", 32)),
+    timeout=float(os.environ.get("BLOCKING_TIMEOUT", 10)),
+)
+
+
+def warm_up():
+    """Load the embedding model and vector index so the first request is not cold.
+
+    Under gunicorn this runs in the master before workers fork, so they
+    share the loaded model copy-on-write.
+    """
+    vector = None
+    with readiness.track("embedding_model"):
+        vector = recommendation_system.embedding_function(["warm up"])[0]
+        logging.info("Embedding model loaded")
+    if vector is not None:
+        with readiness.track("vector_index"):
+            recommendation_system.vector_index.query([list(vector)], 1)
+            logging.info("Vector index loaded")
+
+
+warm_up_once = WarmUp(warm_up, readiness)
+
+
+def start_warm_up(wait=False):
+    """Single entry point for warming up this process; safe to call repeatedly.
+
+    Runs in the background unless ``wait``. Called by the gunicorn hooks
+    and before every request, so any WSGI server gets a warm-up.
+    """
+    warm_up_once.start(wait)
+
+
+@app.before_request
+def ensure_warm_up():
+    start_warm_up()
+
+
+def reopen_after_fork():
+    """Give a forked worker its own ChromaDB client, SQLite handle and thread pool."""
+    global client, collection, blocking_pool
+    client.clear_system_cache()
+    client, collection = open_books_collection()
+    recommendation_system.collection = collection
+    if isinstance(vector_index, ChromaIndex):
+        # The new client loads the index from disk again on its first query
+        vector_index.collection = collection
+        readiness.reset("vector_index")
+    history_store.reopen()
+    coview_model.reopen()
+    popularity.reopen()
+    blocking_pool = BlockingPool(
+        max_workers=blocking_pool.max_workers,
+        max_pending=blocking_pool.max_pending,
+        timeout=blocking_pool.timeout,
+    )
+
+
+def verify_id_token(token):
+    """Decoded ID token, from the verifier's cache or verified in the blocking pool."""
+    with metrics.timer("auth"):
+        verifier = token_verifier.get()
+        decoded_token = verifier.cached(token)
+        if decoded_token is None:
+            decoded_token = blocking_pool.run(verifier.verify, token)
+    return decoded_token
+
+
+def json_response(payload, status=200):
+    # ?fields=title,author trims every book object to the listed fields
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+    with metrics.timer("serialize"):
+        return jsonify(select_fields(payload, fields)), status
+
+
+# Serialized read responses with ETags, 304s and gzip; cleared with the catalogue
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get("RESPONSE_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 300)),
+    version_fn=recommendation_system.query_cache.version,
+)
+
+
+# Requests slower than this are counted and a sample of them logged with stage timings
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", 0.5))
+SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get("SLOW_REQUEST_SAMPLE_RATE", 0.1))
+
+metrics.registry.gauge(
+    "library_query_cache_hits", "Query result cache hits",
+    lambda: recommendation_system.query_cache.results.hits,
+)
+metrics.registry.gauge(
+    "library_query_cache_misses", "Query result cache misses",
+    lambda: recommendation_system.query_cache.results.misses,
+)
+metrics.registry.gauge(
+    "library_catalogue_books", "Books in the in-memory catalogue",
+    lambda: len(catalogue),
+    aggregate="max",
+)
+
+
+@app.before_request
+def start_request_trace():
+    g.request_start = time.perf_counter()
+    metrics.begin_trace()
+
+
+@app.after_request
+def finish_request_trace(response):
+    start = g.get("request_start")
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.end_trace(
+            endpoint,
+            response.status_code,
+            time.perf_counter() - start,
+            slow_threshold=SLOW_REQUEST_SECONDS,
+            slow_sample_rate=SLOW_REQUEST_SAMPLE_RATE,
+        )
+    return response
+
+
+def overloaded_response():
+    return jsonify({"error": "Server is busy, please retry"}), 503
+
+
+def request_filters():
+    """Search filters from the query string; repeated or comma-separated lists both work."""
+    args = request.args.to_dict()
+    for name in ("genres", "formats"):
+        if name in request.args:
+            args[name] = ",".join(request.args.getlist(name))
+    return SearchFilters.from_mapping(args)
+
+
+def invalid_filters_response(error):
+    return jsonify({"error": f"Invalid filters: {error}"}), 400
+
 
 def verify_token(f):
     @wraps(f)
@@ -59,18 +369,29 @@ def verify_token(f):
 
         token = auth_header.split("Bearer ")[1]
         try:
-            decoded_token = firebase_auth.verify_id_token(token)
-            request.user = decoded_token
-            return f(*args, **kwargs)
+            decoded_token = verify_id_token(token)
+        except Overloaded:
+            return overloaded_response()
         except Exception as e:
             return jsonify({"error": f"Invalid token: {str(e)}"}), 401
+        request.user = decoded_token
+        return f(*args, **kwargs)
 
     return decorated_function
 
 
 @app.route("/api/health", methods=["GET"])
 def health_check():
-    return jsonify({"status": "ok"}), 200
+    # 503 until warm-up finishes so load balancers hold traffic back
+    status = readiness.status()
+    if status["ready"]:
+        return jsonify({"status": "ok", **status}), 200
+    return jsonify({"status": "starting", **status}), 503
+
+
+@app.route("/api/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.registry.expose(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/api/login", methods=["POST"])
@@ -81,81 +402,142 @@ def login():
             return jsonify({"error": "Authorization header is required"}), 401
 
         id_token = auth_header.split(" ")[1]
-        decoded_token = firebase_auth.verify_id_token(id_token)
+        decoded_token = verify_id_token(id_token)
         user_id = decoded_token["uid"]
 
-        # Debugging: Print the decoded token and user ID
-        print(f"Decoded token: {decoded_token}")
-        print(f"User ID: {user_id}")
-
         # You can add additional logic here, such as creating a user in your database
 
         return jsonify({"message": "Login successful", "user_id": user_id}), 200
+    except Overloaded:
+        return overloaded_response()
     except Exception as e:
         print(f"Error during login: {e}")
         return jsonify({"error": "Failed to log in"}), 500
 
 
-try:
-    books_collection = client.get_collection("books")
-except chromadb.errors.InvalidCollectionException:
-    print("Error: Books collection not found. Please run database.py first.")
+def _format_book_details(record):
+    book_details = record.to_dict()
+    del book_details['id']
+    return book_details
 
 
 @app.route("/api/book_details/<book_title>", methods=["GET"])
+@response_cache.cached(max_age=300)
 def get_book_details(book_title):
     try:
         # Decode URL-encoded characters
         decoded_title = unquote(book_title)
-        print(f"Fetching details for book title: {decoded_title}")  # Debugging statement
 
-        # Fetch results from the database
-        results = collection.query(
-            query_texts=[decoded_title],
-            n_results= 200,  # Fetch more results to find the exact match or close matches
-            include=['documents', 'metadatas']  # Correct include items
-        )
+        # Exact, case-folded and trigram lookups are served from the title index
+        book_id = title_index.lookup(decoded_title)
+        record = catalogue.by_chroma_id(book_id) if book_id else None
+        if record:
+            return json_response(_format_book_details(record))
 
-        if not results['documents'][0]:
-            return jsonify({"error": "Book not found"}), 404
+        # Fall back to a vector query for titles the index cannot resolve
+        records = blocking_pool.run(recommendation_system.nearest_titles, decoded_title, 20)
 
-        # Print all titles fetched from the collection
-        titles_from_results = [title for title in results['documents'][0]]
-        print(f"Titles fetched from database: {titles_from_results}")  # Debugging
+        if not records:
+            return jsonify({"error": "Book not found"}), 404
 
         # Use get_close_matches to find the closest match from the query results
+        titles_from_results = [r.title for r in records]
         closest_match = get_close_matches(decoded_title, titles_from_results, n=1, cutoff=0.6)
-        print(f"Closest match found: {closest_match}")  # Debugging
 
         if closest_match:
-            # Find the metadata for the closest matching title
-            matched_title = closest_match[0]
-            for title, metadata in zip(results['documents'][0], results['metadatas'][0]):
-                if title.lower() == matched_title.lower():
-                    book_details = {
-                        'title': title,
-                        'author': metadata.get('author', ''),
-                        'num_pages': metadata.get('num_pages', ''),
-                        'cover_image_uri': metadata.get('cover_image_uri', ''),
-                        'book_details': metadata.get('book_details', ''),
-                        'genres': metadata['genres'],
-                        'available': metadata.get('available', True)
-                    }
-
-                    # Ensure num_pages is a single value
-                    if isinstance(book_details['num_pages'], list):
-                        book_details['num_pages'] = book_details['num_pages'][0]
-
-                    print(f"Book details fetched: {book_details}")  # Debugging statement
-                    return jsonify(book_details), 200
+            record = records[titles_from_results.index(closest_match[0])]
+            title_index.add(record.title, record.chroma_id)
+            return json_response(_format_book_details(record))
 
         return jsonify({"error": "Book not found"}), 404
 
+    except Overloaded:
+        return overloaded_response()
     except Exception as e:
         print(f"Error fetching book details: {e}")
         return jsonify({"error": "Failed to fetch book details"}), 500
 
 
+# Upper bound on completions returned per keystroke
+MAX_AUTOCOMPLETE_RESULTS = 20
+# Completions are re-ranked by the shared view counts this often
+AUTOCOMPLETE_RERANK_SECONDS = float(os.environ.get("AUTOCOMPLETE_RERANK_SECONDS", 600))
+autocomplete_ranked_at = None
+autocomplete_rerank_lock = threading.Lock()
+
+
+def rerank_autocomplete():
+    """Rank completions by the decayed view counts every worker records."""
+    weights = {}
+    for key, score in popularity.top_books():
+        record = catalogue.by_chroma_id(key)
+        if record is not None:
+            weights[record.book_id] = score
+    autocomplete.set_popularity(weights)
+
+
+def maybe_rerank_autocomplete():
+    """Start a background re-rank when the last one is older than the interval."""
+    global autocomplete_ranked_at
+    now = time.monotonic()
+    if autocomplete_ranked_at is not None and now - autocomplete_ranked_at < AUTOCOMPLETE_RERANK_SECONDS:
+        return
+    if not autocomplete_rerank_lock.acquire(blocking=False):
+        return
+    autocomplete_ranked_at = now
+
+    def run():
+        try:
+            rerank_autocomplete()
+        except Exception as e:
+            logging.error(f"Error re-ranking autocomplete: {e}")
+        finally:
+            autocomplete_rerank_lock.release()
+
+    threading.Thread(target=run, name="autocomplete-rerank", daemon=True).start()
+
+
+@app.route("/api/autocomplete", methods=["GET"])
+def autocomplete_books():
+    try:
+        maybe_rerank_autocomplete()
+        prefix = request.args.get("q", "")
+        limit = min(int(request.args.get("limit", 10)), MAX_AUTOCOMPLETE_RESULTS)
+        with metrics.timer("autocomplete"):
+            suggestions = autocomplete.complete(prefix, limit)
+        return json_response({"suggestions": suggestions})
+    except Exception as e:
+        logging.error(f"Autocomplete error: {e}")
+        return jsonify({"error": "Autocomplete failed"}), 500
+
+
+@app.route("/api/similar/<book_id>", methods=["GET"])
+@response_cache.cached(max_age=3600)
+def get_similar_books(book_id):
+    try:
+        if similar_books is None:
+            return jsonify({"error": "Similar books are not available"}), 503
+        limit = int(request.args.get("limit", 10))
+        record = catalogue.get(int(book_id)) if book_id.isdigit() else None
+        if record is None:
+            return jsonify({"error": "Book not found"}), 404
+
+        with metrics.timer("similar_lookup"):
+            neighbors = similar_books.neighbors(record.chroma_id, limit)
+        results = []
+        for chroma_id, score in neighbors:
+            neighbor = catalogue.by_chroma_id(chroma_id)
+            if neighbor is not None:
+                book = neighbor.to_dict()
+                book["score"] = round(score, 4)
+                results.append(book)
+        return json_response({"book_id": book_id, "results": results})
+
+    except Exception as e:
+        logging.error(f"Error fetching similar books for {book_id}: {e}")
+        return jsonify({"error": "Failed to fetch similar books"}), 500
+
+
 @app.route("/api/store_search_history", methods=["POST"])
 def store_search_history():
     try:
@@ -164,7 +546,7 @@ def store_search_history():
         book_title = data.get("book_title")
         genres = data.get("genres")
 
-        logging.info(f"Storing view history - User: {user_id}, Book: {book_title}, Genres: {genres}")
+        logging.debug(f"Storing view history - User: {user_id}, Book: {book_title}")
 
         if not all([user_id, book_title, genres]):
             logging.warning("Missing required fields in view history storage request")
@@ -179,24 +561,59 @@ def store_search_history():
         return jsonify({"error": "Failed to store view history"}), 500
 
 @app.route("/api/recommendations/<user_id>", methods=["GET"])
+@response_cache.cached(max_age=0, private=True, store=False)
 def get_recommendations(user_id):
     try:
-        logging.info(f"Fetching recommendations for user: {user_id}")
+        logging.debug(f"Fetching recommendations for user: {user_id}")
+        try:
+            filters = request_filters()
+        except ValueError as e:
+            return invalid_filters_response(e)
         # Use the new history-based recommendation method
-        recommendations = recommendation_system.recommend_books_based_on_history(user_id)
+        recommendations = blocking_pool.run(
+            recommendation_system.recommend_books_based_on_history,
+            user_id,
+            int(request.args.get("limit", 5)),
+            filters,
+        )
         
         if not recommendations:
             logging.warning(f"No recommendations generated for user: {user_id}")
             return jsonify([]), 200
             
-        logging.info(f"Successfully generated {len(recommendations)} recommendations")
-        return jsonify(recommendations), 200
+        return json_response(recommendations)
+    except Overloaded:
+        return overloaded_response()
     except Exception as e:
         logging.error(f"Error fetching recommendations: {e}")
         return jsonify({"error": "Failed to fetch recommendations"}), 500
 
 
+@app.route("/api/popular", methods=["GET"])
+def get_popular():
+    """Most viewed books and genres, with view counts decayed over time."""
+    try:
+        limit = int(request.args.get("limit", 10))
+        popularity = recommendation_system.popularity
+        books = []
+        for key, score in popularity.top_books():
+            record = catalogue.by_chroma_id(key)
+            if record is not None:
+                books.append({**record.to_dict(), "score": round(score, 3)})
+                if len(books) == limit:
+                    break
+        genres = [
+            {"genre": genre, "score": round(score, 3)}
+            for genre, score in popularity.top_genres()[:limit]
+        ]
+        return json_response({"books": books, "genres": genres})
+    except Exception as e:
+        logging.error(f"Error fetching popular books: {e}")
+        return jsonify({"error": "Failed to fetch popular books"}), 500
+
+
 @app.route("/api/search", methods=["GET"])
+@response_cache.cached(max_age=60)
 def search_books():
     try:
         query = request.args.get("q", "").strip()
@@ -206,44 +623,177 @@ def search_books():
 
         if not query:
             return jsonify({"results": []}), 200
+        try:
+            filters = request_filters()
+        except ValueError as e:
+            return invalid_filters_response(e)
 
-        books = recommendation_system.search_books(user_id, query, n_results)
-        return jsonify({"results": books}), 200
+        books = blocking_pool.run(
+            recommendation_system.search_books, user_id, query, n_results, filters
+        )
+        return json_response({"results": books})
 
+    except Overloaded:
+        return overloaded_response()
     except Exception as e:
         print(f"Search error: {e}")
         return jsonify({"error": "Search failed"}), 500
 
 
-@app.route("/api/debug/books", methods=["GET"])
-def debug_all_books():
+# Upper bound on queries or user ids accepted by the batch endpoints
+MAX_BATCH_SIZE = 1000
+
+
+@app.route("/api/search/batch", methods=["POST"])
+def search_books_batch():
     try:
-        # Retrieve all documents and their metadata from ChromaDB
-        results = collection.query(
-            query_texts=[""], n_results=100, include=["documents", "metadatas"]
+        data = request.json or {}
+        queries = [str(q).strip() for q in data.get("queries", [])]
+        n_results = int(data.get("limit", 10))
+
+        if not queries:
+            return jsonify({"results": []}), 200
+        if len(queries) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} queries per batch"}), 400
+        try:
+            filters = SearchFilters.from_mapping(data.get("filters") or {})
+        except ValueError as e:
+            return invalid_filters_response(e)
+
+        non_empty = [q for q in queries if q]
+        found = dict(zip(
+            non_empty,
+            blocking_pool.run(
+                recommendation_system.search_books_batch, non_empty, n_results, filters
+            ),
+        ))
+        return json_response({"results": [found.get(q, []) for q in queries]})
+
+    except Overloaded:
+        return overloaded_response()
+    except Exception as e:
+        logging.error(f"Batch search error: {e}")
+        return jsonify({"error": "Batch search failed"}), 500
+
+
+@app.route("/api/recommendations/batch", methods=["POST"])
+def get_recommendations_batch():
+    try:
+        data = request.json or {}
+        user_ids = [str(u) for u in data.get("user_ids", []) if u]
+        n_recommendations = int(data.get("limit", 5))
+
+        if len(user_ids) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} user ids per batch"}), 400
+        try:
+            filters = SearchFilters.from_mapping(data.get("filters") or {})
+        except ValueError as e:
+            return invalid_filters_response(e)
+
+        recommendations = blocking_pool.run(
+            recommendation_system.recommend_books_batch, user_ids, n_recommendations, filters
         )
+        return json_response({"recommendations": recommendations})
 
-        if not results["documents"]:
-            print("No books found in the collection.")
-            return jsonify({"error": "No books in the collection"}), 404
+    except Overloaded:
+        return overloaded_response()
+    except Exception as e:
+        logging.error(f"Error fetching batch recommendations: {e}")
+        return jsonify({"error": "Failed to fetch batch recommendations"}), 500
 
-        all_books = [
-            {
-                "title": doc,
-                "author": meta.get("author", ""),
-                "genres": meta.get("genres", ""),
-            }
-            for doc, meta in zip(results["documents"][0], results["metadatas"][0])
-        ]
 
-        print(f"Total books fetched: {len(all_books)}")
-        return jsonify({"books": all_books}), 200
+# Largest page served by the browse endpoint
+MAX_PAGE_SIZE = 1000
+# Books fetched from the collection per export round trip
+EXPORT_PAGE_SIZE = 1000
+EXPORT_FIELDS = ["id", "title", "author", "num_pages", "genres", "format", "cover_image_uri", "book_details"]
+
 
+@app.route("/api/books", methods=["GET"])
+@app.route("/api/debug/books", methods=["GET"])
+@response_cache.cached(max_age=300)
+def browse_books():
+    """One page of the catalogue in book id order; pass next_cursor back as cursor."""
+    try:
+        cursor = request.args.get("cursor")
+        limit = min(int(request.args.get("limit", 100)), MAX_PAGE_SIZE)
+        try:
+            filters = request_filters()
+        except ValueError as e:
+            return invalid_filters_response(e)
+
+        records, next_cursor = catalogue.page(
+            int(cursor) if cursor else None,
+            limit,
+            filters.matches if filters else None,
+        )
+        return json_response({
+            "books": [record.to_dict() for record in records],
+            "next_cursor": str(next_cursor) if next_cursor is not None else None,
+        })
+
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
     except Exception as e:
-        print(f"Error during debug: {e}")
+        logging.error(f"Error browsing books: {e}")
         return jsonify({"error": "Failed to fetch books"}), 500
 
 
+def export_rows():
+    """Every stored book as a dict, paging through the collection without embeddings."""
+    offset = 0
+    while True:
+        page = collection.get(
+            limit=EXPORT_PAGE_SIZE, offset=offset, include=["documents", "metadatas"]
+        )
+        if not page["ids"]:
+            return
+        for chroma_id, title, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            metadata = metadata or {}
+            yield {
+                "id": str(Catalogue.stable_book_id(chroma_id)),
+                "title": title or "",
+                **{field: metadata.get(field, "") for field in EXPORT_FIELDS[2:]},
+            }
+        offset += len(page["ids"])
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+@app.route("/api/books/export", methods=["GET"])
+def export_books():
+    """Stream the whole catalogue as NDJSON (default) or CSV in constant memory."""
+    export_format = request.args.get("format", "ndjson")
+    if export_format == "csv":
+        body = csv_lines(export_rows())
+        mimetype = "text/csv"
+    elif export_format == "ndjson":
+        body = (json.dumps(row) + "\n" for row in export_rows())
+        mimetype = "application/x-ndjson"
+    else:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=books.{export_format}"},
+    )
+
+
+@app.route("/api/debug/cache", methods=["GET"])
+def debug_cache_stats():
+    return jsonify(recommendation_system.query_cache.stats()), 200
+
 
 if __name__ == "__main__":
+    start_warm_up()
     app.run(port=5000, debug=True)
@@ -0,0 +1,145 @@
+from typing import Any, Dict, Iterable, List, Optional
+import re
+
+# Bump when the filterable metadata written at ingestion changes, so the
+# next database.py run rewrites every row with the new keys.
+METADATA_VERSION = 2
+
+
+def genre_key(genre: str) -> str:
+    """Boolean metadata key flagging that a book has ``genre``."""
+    return "genre_" + re.sub(r"[^a-z0-9]+", "_", genre.strip().casefold()).strip("_")
+
+
+def filter_metadata(book_id: int, genres: Iterable[str], available: bool = True) -> Dict[str, Any]:
+    """Extra metadata written at ingestion so filters can run inside the vector query."""
+    metadata = {"book_id": book_id, "available": available}
+    for genre in genres:
+        if genre.strip():
+            metadata[genre_key(genre)] = True
+    return metadata
+
+
+def _split(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+def _parse_bool(value: Any) -> Optional[bool]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+class SearchFilters:
+    """Structured constraints pushed down into the vector query as a ``where`` clause."""
+
+    __slots__ = ("genres", "min_pages", "max_pages", "formats", "available", "exclude_ids")
+
+    def __init__(
+        self,
+        genres: Iterable[str] = (),
+        min_pages: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        formats: Iterable[str] = (),
+        available: Optional[bool] = None,
+        exclude_ids: Iterable[int] = (),
+    ):
+        self.genres = frozenset(genres)
+        self.min_pages = min_pages
+        self.max_pages = max_pages
+        self.formats = frozenset(formats)
+        self.available = available
+        self.exclude_ids = frozenset(exclude_ids)
+
+    @classmethod
+    def from_mapping(cls, data: Dict[str, Any]) -> "SearchFilters":
+        """Build filters from request args or a JSON object; list values may be comma separated."""
+        min_pages = data.get("min_pages")
+        max_pages = data.get("max_pages")
+        return cls(
+            genres=_split(data.get("genres") or data.get("genre")),
+            min_pages=int(min_pages) if min_pages not in (None, "") else None,
+            max_pages=int(max_pages) if max_pages not in (None, "") else None,
+            formats=_split(data.get("formats") or data.get("format")),
+            available=_parse_bool(data.get("available")),
+            exclude_ids=[int(i) for i in _split(data.get("exclude_ids") or data.get("exclude"))],
+        )
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.genres
+            or self.min_pages is not None
+            or self.max_pages is not None
+            or self.formats
+            or self.available is not None
+            or self.exclude_ids
+        )
+
+    def excluding(self, book_ids: Iterable[int]) -> "SearchFilters":
+        """Copy of these filters that also excludes ``book_ids``."""
+        return SearchFilters(
+            self.genres,
+            self.min_pages,
+            self.max_pages,
+            self.formats,
+            self.available,
+            self.exclude_ids | frozenset(book_ids),
+        )
+
+    def cache_key(self) -> tuple:
+        return (
+            tuple(sorted(self.genres)),
+            self.min_pages,
+            self.max_pages,
+            tuple(sorted(self.formats)),
+            self.available,
+            tuple(sorted(self.exclude_ids)),
+        )
+
+    def matches(self, record) -> bool:
+        """Evaluate the filters against a catalogue record (used when not pushed down)."""
+        if self.exclude_ids and record.book_id in self.exclude_ids:
+            return False
+        if self.genres and {genre_key(g) for g in self.genres}.isdisjoint(
+            genre_key(g) for g in record.genres
+        ):
+            return False
+        pages = record.num_pages
+        if self.min_pages is not None and (pages == "" or pages < self.min_pages):
+            return False
+        if self.max_pages is not None and (pages == "" or pages > self.max_pages):
+            return False
+        if self.formats and record.format not in self.formats:
+            return False
+        if self.available is not None and record.available != self.available:
+            return False
+        return True
+
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        """Chroma ``where`` clause for these filters, or None when unfiltered."""
+        clauses: List[Dict[str, Any]] = []
+        if self.genres:
+            genre_clauses = [{genre_key(g): {"$eq": True}} for g in sorted(self.genres)]
+            clauses.append(genre_clauses[0] if len(genre_clauses) == 1 else {"$or": genre_clauses})
+        if self.min_pages is not None:
+            clauses.append({"num_pages": {"$gte": self.min_pages}})
+        if self.max_pages is not None:
+            clauses.append({"num_pages": {"$lte": self.max_pages}})
+        if self.formats:
+            clauses.append({"format": {"$in": sorted(self.formats)}})
+        if self.available is not None:
+            clauses.append({"available": {"$eq": self.available}})
+        if self.exclude_ids:
+            clauses.append({"book_id": {"$nin": sorted(self.exclude_ids)}})
+
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
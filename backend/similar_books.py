@@ -0,0 +1,228 @@
+"""Offline "similar books" neighbour table.
+
+Computes the top-K nearest neighbours of every book in the ``books``
+collection from the stored embeddings, in one blocked pass split across
+processes, and writes them as memory-mapped arrays the server reads
+without touching the model or the vector index:
+
+    python similar_books.py --db db_storage --out similar_books --k 20
+"""
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+import argparse
+import json
+import os
+import time
+import numpy as np
+import chromadb
+import logging
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "D:\\CITL project\\library-management\\backend\\db_storage"
+OUT_PATH = "D:\\CITL project\\library-management\\backend\\similar_books"
+
+IDS_FILE = "neighbor_ids.npy"
+SCORES_FILE = "neighbor_scores.npy"
+MANIFEST_FILE = "manifest.json"
+# Normalized embeddings shared with the worker processes while building
+EMBEDDINGS_FILE = "embeddings.tmp.npy"
+
+DEFAULT_K = 20
+# Query rows handled per task and candidate columns scored per matrix product
+DEFAULT_ROW_BLOCK = 1024
+DEFAULT_COLUMN_BLOCK = 16384
+
+
+def load_embeddings(collection, page_size: int = 5000) -> Tuple[List[str], np.ndarray]:
+    """All collection ids with their L2-normalized embeddings as one float32 matrix."""
+    ids: List[str] = []
+    chunks = []
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        if not len(page["ids"]):
+            break
+        ids.extend(page["ids"])
+        chunks.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    if not chunks:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+    embeddings = np.concatenate(chunks)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.where(norms == 0, 1, norms)
+    return ids, embeddings
+
+
+def _top_k_block(args) -> int:
+    """Fill the neighbour rows ``start:end`` of the output arrays."""
+    out_dir, start, end, k, column_block = args
+    embeddings = np.load(os.path.join(out_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    neighbor_ids = np.load(os.path.join(out_dir, IDS_FILE), mmap_mode="r+")
+    neighbor_scores = np.load(os.path.join(out_dir, SCORES_FILE), mmap_mode="r+")
+
+    queries = np.asarray(embeddings[start:end])
+    rows = np.arange(end - start)
+    best_ids = np.empty((end - start, 0), dtype=np.int64)
+    best_scores = np.empty((end - start, 0), dtype=np.float32)
+
+    for col_start in range(0, len(embeddings), column_block):
+        col_end = min(col_start + column_block, len(embeddings))
+        scores = queries @ np.asarray(embeddings[col_start:col_end]).T
+        # A book is not its own neighbour
+        own = rows + start - col_start
+        inside = (own >= 0) & (own < col_end - col_start)
+        scores[rows[inside], own[inside]] = -np.inf
+
+        # Merge this tile's candidates with the best seen so far
+        candidate_scores = np.concatenate([best_scores, scores], axis=1)
+        candidate_ids = np.concatenate(
+            [best_ids, np.broadcast_to(np.arange(col_start, col_end), scores.shape)], axis=1
+        )
+        keep = min(k, candidate_scores.shape[1])
+        top = np.argpartition(-candidate_scores, keep - 1, axis=1)[:, :keep]
+        best_scores = np.take_along_axis(candidate_scores, top, axis=1)
+        best_ids = np.take_along_axis(candidate_ids, top, axis=1)
+
+    order = np.argsort(-best_scores, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_ids = np.take_along_axis(best_ids, order, axis=1)
+    best_ids[~np.isfinite(best_scores)] = -1
+
+    neighbor_ids[start:end, : best_ids.shape[1]] = best_ids
+    neighbor_scores[start:end, : best_scores.shape[1]] = np.nan_to_num(best_scores, neginf=0.0)
+    neighbor_ids.flush()
+    neighbor_scores.flush()
+    return end - start
+
+
+def build(
+    db_path: str = DB_PATH,
+    out_dir: str = OUT_PATH,
+    k: int = DEFAULT_K,
+    processes: Optional[int] = None,
+    row_block: int = DEFAULT_ROW_BLOCK,
+    column_block: int = DEFAULT_COLUMN_BLOCK,
+) -> int:
+    """Compute and write the neighbour table; returns the number of books."""
+    start_time = time.time()
+    client = chromadb.PersistentClient(path=db_path)
+    collection = client.get_collection("books")
+    catalogue_version = (collection.metadata or {}).get("catalogue_version")
+    ids, embeddings = load_embeddings(collection)
+    print(f"Loaded {len(ids)} embeddings in {time.time() - start_time:.2f}s")
+
+    # Build in a staging directory so running servers keep reading the old files
+    staging = os.path.join(out_dir, ".building")
+    os.makedirs(staging, exist_ok=True)
+    k = max(0, min(k, len(ids) - 1))
+    np.save(os.path.join(staging, EMBEDDINGS_FILE), embeddings)
+    del embeddings
+    neighbor_ids = np.lib.format.open_memmap(
+        os.path.join(staging, IDS_FILE), mode="w+", dtype=np.int32, shape=(len(ids), k)
+    )
+    neighbor_ids[:] = -1
+    neighbor_scores = np.lib.format.open_memmap(
+        os.path.join(staging, SCORES_FILE), mode="w+", dtype=np.float16, shape=(len(ids), k)
+    )
+    neighbor_ids.flush()
+    del neighbor_ids, neighbor_scores
+
+    tasks = [
+        (staging, start, min(start + row_block, len(ids)), k, column_block)
+        for start in range(0, len(ids), row_block)
+    ] if k else []
+    try:
+        with Pool(processes=processes) as pool:
+            done = 0
+            for count in pool.imap_unordered(_top_k_block, tasks):
+                done += count
+                print(f"Neighbours computed for {done}/{len(ids)} books")
+    finally:
+        os.remove(os.path.join(staging, EMBEDDINGS_FILE))
+
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+        json.dump({"ids": ids, "k": k, "catalogue_version": catalogue_version}, f)
+    for name in (IDS_FILE, SCORES_FILE, MANIFEST_FILE):
+        os.replace(os.path.join(staging, name), os.path.join(out_dir, name))
+    os.rmdir(staging)
+    print(f"Neighbour table for {len(ids)} books written in {time.time() - start_time:.2f}s")
+    return len(ids)
+
+
+class NeighborTable:
+    """Precomputed neighbours served from read-only memory-mapped arrays.
+
+    The arrays are shared between worker processes through the page cache;
+    a lookup is one dict access and one row slice.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        neighbor_ids: np.ndarray,
+        neighbor_scores: np.ndarray,
+        catalogue_version=None,
+    ):
+        self.ids = ids
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_scores = neighbor_scores
+        self.catalogue_version = catalogue_version
+        self._rows = {chroma_id: row for row, chroma_id in enumerate(ids)}
+
+    @classmethod
+    def load(cls, path: str) -> Optional["NeighborTable"]:
+        """Open a table written by ``build``; None if it has not been built."""
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            logger.warning(f"No similar books table at {path}; run similar_books.py")
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        table = cls(
+            manifest["ids"],
+            np.load(os.path.join(path, IDS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, SCORES_FILE), mmap_mode="r"),
+            manifest.get("catalogue_version"),
+        )
+        logger.info(f"Similar books table loaded for {len(table)} books")
+        return table
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def neighbors(self, chroma_id: str, n: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Nearest books to ``chroma_id`` as (collection id, cosine score), best first."""
+        row = self._rows.get(chroma_id)
+        if row is None:
+            return []
+        neighbor_rows = self.neighbor_ids[row, :n]
+        scores = self.neighbor_scores[row, :n]
+        return [
+            (self.ids[neighbor], float(score))
+            for neighbor, score in zip(neighbor_rows.tolist(), scores.tolist())
+            if neighbor >= 0
+        ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute the similar books neighbour table")
+    parser.add_argument("--db", default=DB_PATH, help="ChromaDB storage directory")
+    parser.add_argument("--out", default=OUT_PATH, help="Directory for the neighbour table")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Neighbours stored per book")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--row-block", type=int, default=DEFAULT_ROW_BLOCK, help="Books scored per task")
+    parser.add_argument("--column-block", type=int, default=DEFAULT_COLUMN_BLOCK, help="Candidates per matrix product")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    build(
+        db_path=args.db,
+        out_dir=args.out,
+        k=args.k,
+        processes=args.processes,
+        row_block=args.row_block,
+        column_block=args.column_block,
+    )
@@ -0,0 +1,55 @@
+from typing import Optional
+import logging
+import atomic_pickle
+from autocomplete import Autocomplete
+from catalogue import Catalogue
+from title_index import TitleIndex
+
+logger = logging.getLogger(__name__)
+
+# Bump when any snapshotted structure changes shape so old files are rebuilt
+FORMAT_VERSION = 4
+
+
+class CatalogueSnapshot:
+    """The catalogue and the lookup structures derived from it, saved as one file.
+
+    Loading a snapshot replaces paging the whole collection and rebuilding
+    the title index and autocomplete on every start.
+    """
+
+    def __init__(
+        self,
+        catalogue: Catalogue,
+        title_index: TitleIndex,
+        autocomplete: Autocomplete,
+        catalogue_version=None,
+    ):
+        self.catalogue = catalogue
+        self.title_index = title_index
+        self.autocomplete = autocomplete
+        self.catalogue_version = catalogue_version
+
+    @classmethod
+    def build(cls, catalogue: Catalogue, catalogue_version=None) -> "CatalogueSnapshot":
+        return cls(
+            catalogue,
+            TitleIndex.from_catalogue(catalogue),
+            Autocomplete.from_catalogue(catalogue),
+            catalogue_version,
+        )
+
+    def save(self, path: str) -> None:
+        """Pickle the catalogue and its lookup structures as one object."""
+        atomic_pickle.dump(path, FORMAT_VERSION, {"snapshot": self})
+        logger.info(f"Catalogue snapshot with {len(self.catalogue)} books written to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CatalogueSnapshot"]:
+        """The saved snapshot, or None if there is none for this code version."""
+        data = atomic_pickle.load(path, FORMAT_VERSION)
+        if data is None:
+            return None
+        snapshot = data["snapshot"]
+        logger.info(f"Catalogue snapshot with {len(snapshot.catalogue)} books loaded from {path}")
+        return snapshot
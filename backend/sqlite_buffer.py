@@ -0,0 +1,97 @@
+from typing import Any, Callable, List
+import os
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteWriteBuffer:
+    """A WAL-mode SQLite file shared by worker processes, written in batches.
+
+    Rows passed to ``add`` are handed to ``write(conn, rows)`` in one
+    transaction once ``batch_size`` are pending. A background thread writes
+    whatever is left every ``flush_interval`` seconds, so other processes
+    see a row within that time even when no further writes arrive.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        schema: str,
+        write: Callable[[sqlite3.Connection, List[Any]], None],
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+        name: str = "sqlite",
+    ):
+        self.path = path
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self._pending: List[Any] = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._pid = None
+
+        self._conn = self._connect()
+        self._conn.executescript(schema)
+        self._conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def reopen(self) -> None:
+        # Connections, locks and the flusher thread do not survive fork()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._pending = []
+        self._pid = None
+        self._conn = self._connect()
+
+    def _ensure_flusher(self) -> None:
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(
+            target=self._run_flusher, args=(self._closed,), name=f"{self.name}-flusher", daemon=True
+        ).start()
+
+    def _run_flusher(self, closed: threading.Event) -> None:
+        while not closed.wait(self.flush_interval):
+            self.flush()
+
+    def add(self, *rows: Any) -> None:
+        with self._lock:
+            self._ensure_flusher()
+            self._pending.extend(rows)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def read(self, query: Callable[[sqlite3.Connection, List[Any]], Any]) -> Any:
+        """Run ``query(conn, pending_rows)`` with writes held off."""
+        with self._lock:
+            return query(self._conn, self._pending)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        self._closed.set()
+        self.flush()
+        self._conn.close()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            with self._conn:
+                self.write(self._conn, pending)
+        except sqlite3.Error as e:
+            logger.error(f"Error flushing {self.name}: {e}")
@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy:
+    """Value created by ``factory`` on first use, exactly once across threads."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._value = None
+        self._created = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if not self._created:
+            with self._lock:
+                if not self._created:
+                    self._value = self._factory()
+                    self._created = True
+        return self._value
+
+
+class Readiness:
+    """Tracks which startup components have finished warming up."""
+
+    def __init__(self, components: Iterable[str]):
+        self._state: Dict[str, str] = {name: "pending" for name in components}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, component: str):
+        """Mark ``component`` ready when the block succeeds, failed if it raises."""
+        try:
+            yield
+        except Exception as e:
+            logger.error(f"Warm-up of {component} failed: {e}")
+            with self._lock:
+                self._state[component] = "failed"
+                self._errors[component] = str(e)
+        else:
+            with self._lock:
+                self._state[component] = "ready"
+                self._errors.pop(component, None)
+
+    def reset(self, component: str) -> None:
+        with self._lock:
+            self._state[component] = "pending"
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(state == "ready" for state in self._state.values())
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = {
+                "ready": all(state == "ready" for state in self._state.values()),
+                "components": dict(self._state),
+            }
+            if self._errors:
+                status["errors"] = dict(self._errors)
+            return status
+
+
+class WarmUp:
+    """Runs ``fn`` at most once per process, in the background unless asked to wait.
+
+    Server hooks and the first request may all call ``start``; repeated or
+    concurrent calls, and calls once ``readiness`` is complete, do nothing.
+    A forked child gets a run of its own.
+    """
+
+    def __init__(self, fn: Callable[[], Any], readiness: Readiness):
+        self._fn = fn
+        self._readiness = readiness
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self, wait: bool = False) -> bool:
+        """Start warming up; True if this call started it."""
+        if self._pid == os.getpid():
+            return False
+        with self._lock:
+            if self._pid == os.getpid():
+                return False
+            self._pid = os.getpid()
+        if self._readiness.ready:
+            return False
+        if wait:
+            self._fn()
+        else:
+            run_in_background(self._fn)
+        return True
+
+
+def run_in_background(fn: Callable[[], Any], name: str = "warm-up") -> threading.Thread:
+    """Run ``fn`` on a daemon thread so startup does not wait for it."""
+    thread = threading.Thread(target=fn, name=name, daemon=True)
+    thread.start()
+    return thread
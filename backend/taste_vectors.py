@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from typing import Iterable, Optional
+import threading
+import numpy as np
+
+
+class TasteVector:
+    """Recency-weighted mean of the embeddings of a user's latest viewed books."""
+
+    __slots__ = ("total", "weight", "count", "latest")
+
+    def __init__(self, total: np.ndarray, weight: float, count: int, latest: str):
+        self.total = total  # decay-weighted sum of the embeddings in the window
+        self.weight = weight  # sum of those weights
+        self.count = count  # views in the window
+        self.latest = latest  # timestamp of the newest view folded in
+
+    @property
+    def vector(self) -> np.ndarray:
+        return self.total / self.weight
+
+
+class TasteVectorStore:
+    """Bounded per-user taste vectors, updated incrementally in O(d).
+
+    A taste vector covers the user's last ``window`` views, the same
+    entries the view history keeps: each new view is folded in, views
+    before it are discounted by ``decay``, and the view the history evicts
+    is subtracted. A vector built by ``update`` therefore equals one
+    ``rebuild`` computes from the history after a restart or on another
+    worker.
+    """
+
+    def __init__(self, decay: float = 0.7, window: int = 5, max_users: int = 100_000):
+        self.decay = decay
+        self.window = window
+        self.max_users = max_users
+        self._vectors: "OrderedDict[str, TasteVector]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fold(
+        self,
+        taste: Optional[TasteVector],
+        embedding: np.ndarray,
+        timestamp: str,
+        evicted: Optional[np.ndarray] = None,
+    ) -> TasteVector:
+        if taste is None:
+            return TasteVector(embedding.astype(np.float32, copy=True), 1.0, 1, timestamp)
+        taste.total *= self.decay
+        taste.total += embedding
+        taste.weight = self.decay * taste.weight + 1.0
+        if evicted is None:
+            taste.count += 1
+        else:
+            # The evicted view is the oldest, now weighted decay ** window
+            taste.total -= self.decay ** self.window * evicted
+            taste.weight -= self.decay ** self.window
+        taste.latest = timestamp
+        return taste
+
+    def _store(self, user_id: str, taste: TasteVector) -> None:
+        self._vectors[user_id] = taste
+        self._vectors.move_to_end(user_id)
+        while len(self._vectors) > self.max_users:
+            self._vectors.popitem(last=False)
+
+    def update(
+        self,
+        user_id: str,
+        embedding: Iterable[float],
+        timestamp: str,
+        previous: Optional[str] = None,
+        evicted: Optional[Iterable[float]] = None,
+    ) -> None:
+        """Fold one newly viewed book into the user's taste vector.
+
+        ``previous`` is the timestamp of the user's prior newest view and
+        ``evicted`` the embedding of the view the history dropped to make
+        room. If the stored vector does not match ``previous`` (another
+        process recorded views), or its window is full and nothing was
+        evicted, the vector is dropped and rebuilt from history on the
+        next read.
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            taste = self._vectors.get(user_id)
+            current = taste.latest if taste is not None else None
+            full = taste is not None and taste.count >= self.window
+            if current != previous or full != (evicted is not None):
+                self._vectors.pop(user_id, None)
+                return
+            if evicted is not None:
+                evicted = np.asarray(evicted, dtype=np.float32)
+            self._store(user_id, self._fold(taste, embedding, timestamp, evicted))
+
+    def rebuild(self, user_id: str, embeddings: Iterable[Iterable[float]], latest: str) -> Optional[np.ndarray]:
+        """Recompute a taste vector from embeddings ordered oldest first.
+
+        Only the newest ``window`` embeddings are used.
+        """
+        taste = None
+        for embedding in list(embeddings)[-self.window:]:
+            taste = self._fold(taste, np.asarray(embedding, dtype=np.float32), latest)
+        if taste is None:
+            return None
+        with self._lock:
+            self._store(user_id, taste)
+        return taste.vector
+
+    def get(self, user_id: str, latest: str) -> Optional[np.ndarray]:
+        """Return the vector if it already reflects the view stamped ``latest``."""
+        with self._lock:
+            taste = self._vectors.get(user_id)
+            if taste is None or taste.latest != latest:
+                return None
+            self._vectors.move_to_end(user_id)
+            return taste.vector
+
+    @staticmethod
+    def normalize(vector: np.ndarray) -> np.ndarray:
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
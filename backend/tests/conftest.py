@@ -0,0 +1,127 @@
+import hashlib
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other by bare name, as when run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from catalogue import Catalogue  # noqa: E402
+from search_filters import METADATA_VERSION, filter_metadata  # noqa: E402
+
+BOOKS = [
+    ("The Hobbit", "J.R.R. Tolkien", "Fantasy, Classics", "A hobbit goes on an unexpected journey."),
+    ("The Lord of the Rings", "J.R.R. Tolkien", "Fantasy, Classics", "The one ring must be destroyed."),
+    ("Dune", "Frank Herbert", "Science Fiction", "Spice, sand and the desert planet Arrakis."),
+    ("Emma", "Jane Austen", "Romance, Classics", "A young woman meddles in matchmaking."),
+    ("Pride and Prejudice", "Jane Austen", "Romance, Classics", "ISBN 978-0-14-143951-8"),
+]
+
+
+def chroma_id(title):
+    return hashlib.md5(title.encode()).hexdigest()
+
+
+def book_metadata(i, book):
+    _, author, genres, details = book
+    return {
+        "author": author,
+        "genres": genres,
+        "book_details": details,
+        "num_pages": 100 * (i + 1),
+        "format": "Paperback" if i % 2 else "Hardcover",
+    }
+
+
+def make_catalogue(books=BOOKS):
+    catalogue = Catalogue()
+    for i, book in enumerate(books):
+        catalogue.add(chroma_id(book[0]), book[0], book_metadata(i, book))
+    return catalogue
+
+
+class StubEmbeddingFunction:
+    """Deterministic embeddings derived from the text; counts the texts embedded."""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.embedded = 0
+
+    def __call__(self, texts):
+        self.embedded += len(texts)
+        return [
+            np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16))
+            .normal(size=self.dim)
+            .astype(np.float32)
+            for text in texts
+        ]
+
+
+def make_books_collection(db_path, books=BOOKS):
+    """A ``books`` collection written the way database.py writes it."""
+    chromadb = pytest.importorskip("chromadb")
+    collection = chromadb.PersistentClient(path=str(db_path)).create_collection(
+        "books", metadata={"metadata_version": METADATA_VERSION, "catalogue_version": 1}
+    )
+    ids = [chroma_id(book[0]) for book in books]
+    metadatas = [
+        {
+            **book_metadata(i, book),
+            **filter_metadata(Catalogue.stable_book_id(id_), book[2].split(", ")),
+        }
+        for i, (id_, book) in enumerate(zip(ids, books))
+    ]
+    collection.add(
+        ids=ids,
+        documents=[book[0] for book in books],
+        metadatas=metadatas,
+        embeddings=[
+            list(map(float, e))
+            for e in StubEmbeddingFunction()([f"{book[0]} {book[2]}" for book in books])
+        ],
+    )
+    return collection
+
+
+@pytest.fixture
+def catalogue():
+    return make_catalogue()
+
+
+@pytest.fixture
+def books_collection(tmp_path):
+    return make_books_collection(tmp_path / "db")
+
+
+@pytest.fixture(scope="session")
+def routes(tmp_path_factory):
+    """The Flask app module, served from a temporary store with a stub embedding model."""
+    pytest.importorskip("flask")
+    pytest.importorskip("firebase_admin")
+    path = tmp_path_factory.mktemp("routes")
+    make_books_collection(path / "db")
+    monkeypatch = pytest.MonkeyPatch()
+    for name, value in {
+        "BOOKS_DB_PATH": path / "db",
+        "VIEW_HISTORY_DB": path / "view_history.sqlite3",
+        "COVIEW_DB": path / "coview.sqlite3",
+        "POPULARITY_DB": path / "popularity.sqlite3",
+        "CATALOGUE_SNAPSHOT": path / "catalogue_snapshot.pickle",
+        "LEXICAL_INDEX_PATH": path / "lexical_index.pickle",
+        "SIMILAR_BOOKS_PATH": path / "similar_books",
+        "BATCH_MAX_SIZE": 1,
+    }.items():
+        monkeypatch.setenv(name, str(value))
+    import routes
+
+    routes.recommendation_system.embedding_function = StubEmbeddingFunction()
+    yield routes
+    monkeypatch.undo()
+
+
+@pytest.fixture
+def client(routes):
+    return routes.app.test_client()
@@ -0,0 +1,68 @@
+import hashlib
+
+from autocomplete import Autocomplete, normalize
+
+
+def texts(results):
+    return [result["text"] for result in results]
+
+
+def test_normalize_matches_typed_queries():
+    assert normalize("  The   Lord-of the RINGS ") == "the lord of the rings"
+
+
+def test_completes_titles_and_authors(catalogue):
+    index = Autocomplete.from_catalogue(catalogue)
+
+    assert texts(index.complete("the h")) == ["The Hobbit"]
+    assert texts(index.complete("jane")) == ["Jane Austen"]
+    assert index.complete("dune") == [
+        {"text": "Dune", "type": "title", "id": str(catalogue.book_ids[catalogue.titles.index("Dune")])}
+    ]
+    assert index.complete("") == []
+    assert index.complete("zzz") == []
+
+
+def test_matches_later_words_in_titles(catalogue):
+    index = Autocomplete.from_catalogue(catalogue)
+
+    assert texts(index.complete("prej")) == ["Pride and Prejudice"]
+
+
+def test_ranks_by_popularity(catalogue):
+    hobbit = catalogue.book_ids[catalogue.titles.index("The Hobbit")]
+    rings = catalogue.book_ids[catalogue.titles.index("The Lord of the Rings")]
+    index = Autocomplete.from_catalogue(catalogue, popularity={hobbit: 1, rings: 5})
+
+    assert texts(index.complete("the", 2)) == ["The Lord of the Rings", "The Hobbit"]
+
+
+def test_walking_buckets_matches_direct_ranking(catalogue, monkeypatch):
+    for i in range(300):
+        catalogue.add(hashlib.md5(str(i).encode()).hexdigest(), f"Theory of Everything {i}", {"author": f"Writer {i % 7}"})
+    popularity = {book_id: (book_id * 7919) % 101 for book_id in catalogue.book_ids}
+    index = Autocomplete.from_catalogue(catalogue, popularity=popularity)
+    monkeypatch.setattr(Autocomplete, "DIRECT_RANK_LIMIT", 10)
+    walked = [texts(index.complete(prefix, 15)) for prefix in ("theory", "theory of e", "writer")]
+    monkeypatch.setattr(Autocomplete, "DIRECT_RANK_LIMIT", 10_000)
+    ranked = [texts(index.complete(prefix, 15)) for prefix in ("theory", "theory of e", "writer")]
+
+    def weights(results):
+        return [sorted(index.weights[index.texts.index(text)] for text in r) for r in results]
+
+    assert weights(walked) == weights(ranked)
+    assert all(len(results) == 15 for results in walked[:2])
+
+
+def test_view_counts_rank_ahead_of_title_counts(catalogue):
+    index = Autocomplete.from_catalogue(catalogue)
+    rings = catalogue.book_ids[catalogue.titles.index("The Lord of the Rings")]
+    # Without views, ties on title count go to the shorter text
+    assert texts(index.complete("the", 2)) == ["The Hobbit", "The Lord of the Rings"]
+    assert texts(index.complete("j", 2)) == ["Jane Austen", "J.R.R. Tolkien"]
+
+    index.set_popularity({rings: 0.5})
+
+    assert texts(index.complete("the", 2)) == ["The Lord of the Rings", "The Hobbit"]
+    assert texts(index.complete("j", 2)) == ["J.R.R. Tolkien", "Jane Austen"]
+    assert index.weights[index.texts.index("J.R.R. Tolkien")] == 0.5
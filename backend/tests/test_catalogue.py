@@ -0,0 +1,85 @@
+import logging
+
+from catalogue import Catalogue, parse_num_pages
+from conftest import BOOKS, chroma_id, make_catalogue
+
+
+def test_parse_num_pages():
+    assert parse_num_pages("320") == 320
+    assert parse_num_pages(["412 pages"]) == 412
+    assert parse_num_pages("") == -1
+    assert parse_num_pages("unknown") == -1
+
+
+def test_stable_book_ids_come_from_the_hex_prefix():
+    assert Catalogue.stable_book_id("0123456789abcdef0123") == 0x0123456789ABCDE
+    assert Catalogue.stable_book_id("01234567-89ab-cdef") == 0x0123456789ABCDE
+    assert Catalogue.stable_book_id("f" * 40) < 2**60
+    # Non-hex ids use their last seven bytes
+    assert Catalogue.stable_book_id("book-0000042") == int.from_bytes(b"0000042", "big")
+
+
+def test_truncated_id_collisions_keep_the_newer_book(caplog):
+    catalogue = Catalogue()
+    first = catalogue.add("0123456789abcde" + "0" * 25, "First", {})
+    second = catalogue.add("0123456789abcde" + "1" * 25, "Second", {})
+    book_id = Catalogue.stable_book_id("0123456789abcde")
+
+    assert "collides" in caplog.text
+    assert catalogue.record(first).book_id == catalogue.record(second).book_id == book_id
+    assert catalogue.get(book_id).title == "Second"
+    assert catalogue.by_chroma_id("0123456789abcde" + "0" * 25).title == "First"
+
+
+def test_re_adding_an_id_is_not_a_collision(caplog):
+    catalogue = make_catalogue()
+    caplog.set_level(logging.WARNING)
+    catalogue.add(chroma_id("Dune"), "Dune", {"author": "Frank Herbert"})
+
+    assert "collides" not in caplog.text
+    assert len(catalogue) == len(BOOKS)
+    assert catalogue.by_chroma_id(chroma_id("Dune")).author == "Frank Herbert"
+
+
+def test_pages_follow_book_id_order(catalogue):
+    records, cursor = catalogue.page(limit=2)
+    rest, end = catalogue.page(cursor, limit=10)
+
+    ids = [record.book_id for record in records + rest]
+    assert ids == sorted(record.book_id for record in catalogue)
+    assert cursor == records[-1].book_id and end is None
+
+
+def test_paging_is_stable_while_books_are_added(catalogue):
+    seen = []
+    records, cursor = catalogue.page(limit=2)
+    seen += records
+    # Books added behind the cursor are not returned; those ahead of it are
+    catalogue.add("0" * 40, "Lowest", {})
+    catalogue.add("f" * 40, "Highest", {})
+    while cursor is not None:
+        records, cursor = catalogue.page(cursor, limit=2)
+        seen += records
+
+    titles = [record.title for record in seen]
+    assert len(titles) == len(set(titles)) == len(BOOKS) + 1
+    assert "Lowest" not in titles and titles[-1] == "Highest"
+
+
+def test_pages_apply_the_predicate(catalogue):
+    records, cursor = catalogue.page(limit=1, predicate=lambda record: record.author == "Jane Austen")
+    rest, end = catalogue.page(cursor, limit=5, predicate=lambda record: record.author == "Jane Austen")
+
+    assert {record.title for record in records + rest} == {"Emma", "Pride and Prejudice"}
+    assert end is None
+
+
+def test_hydrate_fetches_missing_books_in_result_order(books_collection):
+    catalogue = make_catalogue(BOOKS[:2])
+    ids = [chroma_id("Emma"), chroma_id("The Hobbit"), "unknown", chroma_id("Dune")]
+
+    records = catalogue.hydrate(books_collection, ids)
+
+    assert [record.title for record in records] == ["Emma", "The Hobbit", "Dune"]
+    assert len(catalogue) == 4
+    assert catalogue.by_chroma_id(chroma_id("Dune")).genres == ["Science Fiction"]
@@ -0,0 +1,88 @@
+import sqlite3
+import time
+
+from coview import CoViewModel, CoViewStore, create_coview_model
+
+
+def test_recommends_books_co_viewed_with_history():
+    model = CoViewModel()
+    model.record("hobbit", [])
+    model.record("lotr", ["hobbit"])
+    model.record("silmarillion", ["lotr", "hobbit"])
+    model.record("dune", [])
+
+    assert model.recommend(["hobbit"], 5) == ["lotr", "silmarillion"]
+    assert model.recommend(["hobbit"], 5, exclude=["lotr"]) == ["silmarillion"]
+    assert model.recommend(["dune"], 5) == []
+
+
+def test_newer_history_weighs_more():
+    model = CoViewModel()
+    model.record("a", ["x"])
+    model.record("b", ["y"])
+
+    assert model.recommend(["a", "b"], 2) == ["x", "y"]
+    assert model.recommend(["b", "a"], 2) == ["y", "x"]
+
+
+def test_neighbour_lists_stay_bounded():
+    model = CoViewModel(max_neighbors=3)
+    for i in range(20):
+        model.record("popular", [f"book{i}"])
+
+    assert len(model.neighbors["popular"]) <= 6
+    assert len(model.recommend(["popular"], 10)) <= 6
+
+
+def test_counts_persist_and_combine_across_workers(tmp_path):
+    path = str(tmp_path / "coview.sqlite3")
+    worker_a = create_coview_model(path)
+    worker_b = create_coview_model(path)
+    worker_a.record("lotr", ["hobbit"])
+    worker_b.record("silmarillion", ["hobbit"])
+    worker_a.close()
+    worker_b.close()
+
+    reloaded = create_coview_model(path)
+    assert set(reloaded.recommend(["hobbit"], 5)) == {"lotr", "silmarillion"}
+    assert reloaded.store.neighbors(["lotr", "dune"], 5) == {
+        "lotr": (1, [("hobbit", 1, 1)]),
+        "dune": (1, []),
+    }
+    reloaded.close()
+
+
+def test_store_prunes_to_strongest_neighbours(tmp_path):
+    path = str(tmp_path / "coview.sqlite3")
+    store = CoViewStore(path, keep=2, batch_size=1)
+    store.add("popular", ["a"])
+    store.add("popular", ["a", "b"])
+    store.add("popular", ["a", "b", "c", "d"])
+    store.close()
+
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        "SELECT neighbor, count FROM coview_pairs WHERE item = 'popular' ORDER BY count DESC"
+    ).fetchall()
+    conn.close()
+    assert rows == [("a", 3), ("b", 2)]
+
+
+def test_neighbour_lists_are_read_per_item_and_cached(tmp_path):
+    path = str(tmp_path / "coview.sqlite3")
+    reader = create_coview_model(path, cache_ttl=0.05)
+    reader.cache_size = 2
+    writer = create_coview_model(path, batch_size=1)
+    assert reader.recommend(["hobbit"], 5) == []
+
+    writer.record("lotr", ["hobbit"])
+    # Cached until the entry expires
+    assert reader.recommend(["hobbit"], 5) == []
+    time.sleep(0.06)
+    assert reader.recommend(["hobbit"], 5) == ["lotr"]
+
+    reader.recommend(["dune", "emma", "hobbit"], 5)
+    assert not reader.views and not reader.neighbors
+    assert len(reader._cache) == 2
+    reader.close()
+    writer.close()
@@ -0,0 +1,115 @@
+import csv
+import hashlib
+
+import numpy as np
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+
+import database
+from vector_index import shard_name
+
+ROWS = [
+    ("The Hobbit", "J.R.R. Tolkien", "310", "['Fantasy', 'Classics']"),
+    ("Dune", "Frank Herbert", "412", "['Science Fiction']"),
+    ("Emma", "Jane Austen", "474", "['Romance', 'Classics']"),
+]
+
+
+class StubEncoder:
+    """Deterministic 8-dimensional embeddings derived from the text."""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        vectors = [
+            np.frombuffer(hashlib.sha256(text.encode()).digest()[:8], dtype=np.uint8)
+            for text in texts
+        ]
+        return np.asarray(vectors, dtype=np.float32) / 255.0
+
+
+def write_csv(path, rows, genres_column="genres"):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["book_title", "author", "num_pages", genres_column, "cover_image_uri", "book_details"])
+        for title, author, pages, genres in rows:
+            writer.writerow([title, author, pages, genres, f"https://covers/{title}.jpg", f"About {title}"])
+
+
+@pytest.fixture
+def paths(tmp_path):
+    csv_path = tmp_path / "books.csv"
+    write_csv(csv_path, ROWS)
+    return {
+        "csv_path": str(csv_path),
+        "db_path": str(tmp_path / "db"),
+        "lexical_index_path": str(tmp_path / "lexical_index.pickle"),
+        "snapshot_path": str(tmp_path / "catalogue_snapshot.pickle"),
+    }
+
+
+def test_ingest_loads_csv_and_serving_state(paths, tmp_path):
+    encoder = StubEncoder()
+    collection = database.ingest(model=encoder, **paths)
+
+    assert collection.count() == len(ROWS)
+    assert encoder.encoded == len(ROWS)
+    metadata = collection.metadata
+    assert metadata["shard_count"] == 0
+    assert "catalogue_version" in metadata
+    assert (tmp_path / "lexical_index.pickle").exists()
+    assert (tmp_path / "catalogue_snapshot.pickle").exists()
+
+
+def test_reingest_skips_unchanged_and_prunes_missing(paths):
+    database.ingest(model=StubEncoder(), **paths)
+    write_csv(paths["csv_path"], ROWS[:2])
+
+    encoder = StubEncoder()
+    collection = database.ingest(model=encoder, **paths)
+
+    assert encoder.encoded == 0
+    assert collection.count() == 2
+
+
+def test_reingest_of_a_drifted_csv_prunes_nothing(paths):
+    database.ingest(model=StubEncoder(), **paths)
+    version = database.get_books_collection(paths["db_path"]).metadata["catalogue_version"]
+    # A renamed column rejects every row
+    write_csv(paths["csv_path"], ROWS, genres_column="genre")
+
+    collection = database.ingest(model=StubEncoder(), **paths)
+
+    assert collection.count() == len(ROWS)
+    assert collection.metadata["catalogue_version"] == version
+
+
+def test_mostly_rejected_csv_prunes_nothing(paths):
+    database.ingest(model=StubEncoder(), **paths)
+    write_csv(paths["csv_path"], ROWS[:1] + [(title, author, pages, "[]") for title, author, pages, _ in ROWS[1:]])
+
+    collection = database.ingest(model=StubEncoder(), **paths)
+    assert collection.count() == len(ROWS)
+
+    collection = database.ingest(model=StubEncoder(), max_reject_ratio=1.0, **paths)
+    assert collection.count() == 1
+
+
+def test_ingest_partitions_and_keeps_stored_shard_count(paths):
+    database.ingest(model=StubEncoder(), shards=2, **paths)
+    write_csv(paths["csv_path"], ROWS + [("Beloved", "Toni Morrison", "324", "['Fiction']")])
+
+    # shards=None keeps the two stored shards and writes new books into them
+    collection = database.ingest(model=StubEncoder(), **paths)
+
+    assert collection.metadata["shard_count"] == 2
+    client = chromadb.PersistentClient(path=paths["db_path"])
+    sharded = sum(client.get_collection(shard_name(i)).count() for i in range(2))
+    assert sharded == collection.count() == 4
+
+    collection = database.ingest(model=StubEncoder(), shards=0, **paths)
+    assert collection.metadata["shard_count"] == 0
+    assert shard_name(0) not in [c.name for c in client.list_collections()]
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from history_store import InMemoryHistoryStore, SQLiteHistoryStore, ViewHistoryStore
+
+
+def entry(title):
+    return {"title": title, "genres": ["Fiction"], "timestamp": "2024-01-01T00:00:00"}
+
+
+def titles(history):
+    return [item["title"] for item in history]
+
+
+def test_view_history_store_is_abstract():
+    with pytest.raises(TypeError):
+        ViewHistoryStore()
+
+
+def test_in_memory_caps_history_and_evicts_idle_users():
+    store = InMemoryHistoryStore(max_per_user=2, max_users=2)
+    for title in ("A", "B", "C"):
+        store.add("alice", entry(title))
+    store.add("bob", entry("X"))
+    store.get("alice")
+    store.add("carol", entry("Y"))
+
+    assert titles(store.get("alice")) == ["C", "B"]
+    assert store.get("bob") == []
+
+
+def test_sqlite_reads_pending_entries_in_process(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), max_per_user=3, flush_interval=60)
+    for title in ("A", "B", "C", "D"):
+        store.add("alice", entry(title))
+
+    assert titles(store.get("alice")) == ["D", "C", "B"]
+    store.close()
+
+
+def test_sqlite_caps_rows_per_user(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    store = SQLiteHistoryStore(path, max_per_user=2, batch_size=1)
+    for title in ("A", "B", "C"):
+        store.add("alice", entry(title))
+    store.close()
+
+    reopened = SQLiteHistoryStore(path, max_per_user=2)
+    assert titles(reopened.get("alice")) == ["C", "B"]
+    reopened.close()
+
+
+def test_sqlite_stores_share_history_without_further_writes(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    worker_a = SQLiteHistoryStore(path, flush_interval=0.05)
+    worker_b = SQLiteHistoryStore(path, flush_interval=0.05)
+    worker_a.add("alice", entry("A"))
+    worker_a.add("alice", entry("B"))
+
+    deadline = time.monotonic() + 2
+    while titles(worker_b.get("alice")) != ["B", "A"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert titles(worker_b.get("alice")) == ["B", "A"]
+    worker_a.close()
+    worker_b.close()
+
+
+def test_sqlite_evicts_idle_users(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"), max_users=1, batch_size=1)
+    store.add("alice", entry("A"))
+    time.sleep(0.01)
+    store.add("bob", entry("B"))
+
+    assert store.get("alice") == []
+    assert titles(store.get("bob")) == ["B"]
+    store.close()
@@ -0,0 +1,91 @@
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from http_cache import ResponseCache, select_fields
+
+
+def test_select_fields_reduces_book_objects_only():
+    payload = {"results": [{"title": "Dune", "author": "Frank Herbert", "id": "1"}], "total": 1}
+
+    assert select_fields(payload, ["title", "id"]) == {"results": [{"title": "Dune", "id": "1"}], "total": 1}
+    assert select_fields(payload, None) is payload
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask(__name__)
+    version = {"value": 1}
+    calls = {"count": 0}
+    cache = ResponseCache(version_fn=lambda: version["value"], min_compress_size=100)
+
+    @app.route("/books")
+    @cache.cached(max_age=60)
+    def books():
+        calls["count"] += 1
+        return flask.jsonify([{"title": f"Book {i}"} for i in range(20)])
+
+    @app.route("/mine")
+    @cache.cached(max_age=0, private=True, store=False)
+    def mine():
+        calls["count"] += 1
+        return flask.jsonify({"user": "me"})
+
+    @app.route("/missing")
+    @cache.cached()
+    def missing():
+        return flask.jsonify({"error": "not found"}), 404
+
+    app.version = version
+    app.calls = calls
+    return app
+
+
+def test_responses_are_cached_until_the_version_changes(app):
+    client = app.test_client()
+    first = client.get("/books")
+    second = client.get("/books")
+
+    assert first.data == second.data
+    assert app.calls["count"] == 1
+    assert first.headers["Cache-Control"] == "public, max-age=60"
+    app.version["value"] = 2
+    client.get("/books")
+    assert app.calls["count"] == 2
+
+
+def test_matching_etag_gets_304(app):
+    client = app.test_client()
+    etag = client.get("/books").headers["ETag"]
+
+    response = client.get("/books", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_large_bodies_are_gzipped_with_their_own_etag(app):
+    client = app.test_client()
+    plain = client.get("/books")
+    gzipped = client.get("/books", headers={"Accept-Encoding": "gzip"})
+
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.headers["ETag"] != plain.headers["ETag"]
+    assert "Accept-Encoding" in gzipped.headers["Vary"]
+    assert client.get("/books", headers={"If-None-Match": plain.headers["ETag"]}).status_code == 304
+
+
+def test_unstored_responses_are_recomputed_but_validated(app):
+    client = app.test_client()
+    etag = client.get("/mine").headers["ETag"]
+    response = client.get("/mine", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert app.calls["count"] == 2
+
+
+def test_errors_are_passed_through_uncached(app):
+    response = app.test_client().get("/missing")
+
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
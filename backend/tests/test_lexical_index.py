@@ -0,0 +1,64 @@
+import lexical_index
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+
+def titles(catalogue, hits):
+    return [catalogue.by_chroma_id(chroma_id).title for chroma_id, _ in hits]
+
+
+def test_tokenize_keeps_isbns_whole():
+    assert tokenize("ISBN 978-0-14-143951-8, Pride") == ["isbn", "9780141439518", "pride"]
+
+
+def test_reciprocal_rank_fusion_favours_ids_in_both_rankings():
+    assert reciprocal_rank_fusion(["a", "b"], ["c", "b"])[0] == "b"
+
+
+def test_search_ranks_title_matches_first(catalogue):
+    index = LexicalIndex.from_catalogue(catalogue)
+
+    assert titles(catalogue, index.search("hobbit"))[0] == "The Hobbit"
+    assert titles(catalogue, index.search("tolkien rings"))[0] == "The Lord of the Rings"
+    assert titles(catalogue, index.search("978-0-14-143951-8")) == ["Pride and Prejudice"]
+
+
+def test_search_ignores_stopwords(catalogue):
+    index = LexicalIndex.from_catalogue(catalogue)
+
+    assert index.search("the of and") == []
+
+
+def test_common_terms_only_rescore_rare_term_matches(catalogue, monkeypatch):
+    monkeypatch.setattr(lexical_index, "MAX_SCANNED_POSTINGS", 1)
+    index = LexicalIndex.from_catalogue(catalogue)
+
+    # "classics" is in several books: alone it is left to semantic search
+    assert index.search("classics") == []
+    # ...but it still adds to the score of the book "emma" found
+    (hit,) = index.search("emma classics")
+    (plain,) = index.search("emma")
+    assert hit[0] == plain[0] and hit[1] > plain[1]
+
+
+def test_known_items_need_a_title_author_or_phrase_match(catalogue):
+    index = LexicalIndex.from_catalogue(catalogue)
+
+    assert index.is_known_item("The Hobbit")
+    assert index.is_known_item("jane austen")
+    assert index.is_known_item("lord of the")
+    # Every word occurs in some title or author, but not as a phrase
+    assert not index.is_known_item("hobbit austen")
+    assert not index.is_known_item("the")
+    assert not index.is_known_item("of the")
+    assert not index.is_known_item("fantasy")
+
+
+def test_save_and_load_round_trip(catalogue, tmp_path):
+    path = str(tmp_path / "lexical_index.pickle")
+    LexicalIndex.from_catalogue(catalogue, catalogue_version=7).save(path)
+
+    loaded = LexicalIndex.load(path)
+    assert loaded.catalogue_version == 7
+    assert titles(catalogue, loaded.search("dune")) == ["Dune"]
+    assert loaded.is_known_item("dune")
+    assert LexicalIndex.load(str(tmp_path / "missing.pickle")) is None
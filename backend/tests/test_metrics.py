@@ -0,0 +1,89 @@
+import multiprocessing
+
+import pytest
+
+from metrics import Registry
+
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.gauge("books", "Books", lambda: 3)
+
+    requests.inc("/api/search")
+    requests.inc("/api/search", amount=2)
+    latency.observe(0.05)
+    latency.observe(5)
+
+    assert registry.expose().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/api/search"} 3',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 1',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        "latency_seconds_sum 5.05",
+        "latency_seconds_count 2",
+        "# HELP books Books",
+        "# TYPE books gauge",
+        "books 3",
+    ]
+
+
+def make_shared_registry(shared_dir):
+    registry = Registry(str(shared_dir), write_interval=3600)
+    counter = registry.counter("requests_total", "Requests", ("route",))
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(1.0,))
+    registry.gauge("cache_hits", "Cache hits", lambda: 2)
+    registry.gauge("books", "Books", lambda: 7, aggregate="max")
+    return registry, counter, histogram
+
+
+def record_in_worker(registry, counter, histogram):
+    counter.inc("/api/search", amount=4)
+    histogram.observe(0.5)
+    # multiprocessing exits without running atexit hooks
+    registry.write()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_scrapes_merge_every_worker(tmp_path):
+    registry, counter, histogram = make_shared_registry(tmp_path)
+    counter.inc("/api/search")
+    histogram.observe(2.0)
+
+    worker = multiprocessing.get_context("fork").Process(
+        target=record_in_worker, args=(registry, counter, histogram)
+    )
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+
+    lines = registry.expose().splitlines()
+
+    # The exited worker's counts stay, so totals never go backwards
+    assert 'requests_total{route="/api/search"} 5' in lines
+    assert 'latency_seconds_bucket{le="1"} 1' in lines
+    assert "latency_seconds_count 2" in lines
+    assert "latency_seconds_sum 2.5" in lines
+    # Its gauges do not: only this live process is counted
+    assert "cache_hits 2" in lines
+    assert "books 7" in lines
+
+
+def test_gauges_sum_or_take_the_max_over_live_processes(tmp_path, monkeypatch):
+    registry, _, _ = make_shared_registry(tmp_path)
+    (tmp_path / "1.json").write_text('{"cache_hits": 3, "books": 5, "requests_total": [[["/"], 1]]}')
+    monkeypatch.setattr("metrics._pid_alive", lambda pid: True)
+
+    lines = registry.expose().splitlines()
+
+    assert "cache_hits 5" in lines
+    assert "books 7" in lines
+    assert 'requests_total{route="/"} 1' in lines
+
+    registry.clear_shared_dir()
+    assert not list(tmp_path.glob("*.json"))
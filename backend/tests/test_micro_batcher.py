@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def test_single_calls_get_their_own_results():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_wait=0.001)
+
+    assert batcher.submit(3) == 6
+    assert batcher.submit(4) == 8
+
+
+def test_concurrent_calls_are_coalesced():
+    batches = []
+    release = threading.Event()
+
+    def double(items):
+        batches.append(len(items))
+        release.wait(1)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait=0.2)
+    results = {}
+
+    def call(i):
+        results[i] = batcher.submit(i)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: i * 2 for i in range(8)}
+    assert sum(batches) == 8
+    assert len(batches) < 8
+    assert max(batches) <= 8
+
+
+def test_batch_failures_reach_every_caller():
+    def fail(items):
+        raise RuntimeError("model unavailable")
+
+    batcher = MicroBatcher(fail, max_wait=0.001)
+
+    with pytest.raises(RuntimeError, match="model unavailable"):
+        batcher.submit(1)
+    # The worker keeps running after a failed batch
+    batcher.fn = lambda items: items
+    assert batcher.submit(2) == 2
@@ -0,0 +1,117 @@
+import sqlite3
+import time
+
+import pytest
+
+import popularity
+from popularity import (
+    DecayedCountMinSketch,
+    DecayedTopK,
+    PopularityStore,
+    PopularityTracker,
+    create_popularity_tracker,
+)
+
+DAY = 24 * 3600
+
+
+def test_sketch_counts_and_decays():
+    sketch = DecayedCountMinSketch(width=256, depth=4, half_life=DAY)
+    start = sketch.origin
+    for _ in range(8):
+        sketch.add("hobbit", timestamp=start)
+
+    assert sketch.estimate("hobbit", start) == pytest.approx(8)
+    assert sketch.estimate("hobbit", start + DAY) == pytest.approx(4)
+    assert sketch.estimate("dune", start) == 0
+
+
+def test_sketch_rebases_before_scale_overflows():
+    sketch = DecayedCountMinSketch(width=64, depth=2, half_life=1)
+    start = sketch.origin
+    sketch.add("a", timestamp=start)
+    # 2**50 > MAX_SCALE, so the counters are rescaled to a new origin
+    sketch.add("a", timestamp=start + 50)
+
+    assert sketch.origin == start + 50
+    assert sketch.estimate("a", start + 50) == pytest.approx(1, rel=1e-6)
+
+
+def test_top_k_ranks_recent_views_above_old_ones():
+    top = DecayedTopK(k=2, half_life=DAY)
+    now = time.time()
+    for _ in range(3):
+        top.add("old", timestamp=now - 5 * DAY)
+    top.add("new", timestamp=now)
+    top.add("newer", timestamp=now)
+    top.add("newer", timestamp=now)
+
+    assert [key for key, _ in top.top()] == ["newer", "new"]
+
+
+def test_top_k_stays_bounded():
+    top = DecayedTopK(k=5)
+    for i in range(100):
+        top.add(f"book{i}", weight=i)
+
+    assert len(top.candidates) <= 10
+    assert [key for key, _ in top.top(3)] == ["book99", "book98", "book97"]
+
+
+def test_tracker_refreshes_its_lists_on_an_interval():
+    tracker = PopularityTracker(refresh_interval=3600)
+    tracker.record("hobbit", ["Fantasy"])
+    assert [key for key, _ in tracker.top_books()] == ["hobbit"]
+
+    tracker.record("dune", ["Science Fiction"], weight=5)
+    assert [key for key, _ in tracker.top_books()] == ["hobbit"]
+    tracker.refresh()
+    assert [key for key, _ in tracker.top_books()] == ["dune", "hobbit"]
+    assert [genre for genre, _ in tracker.top_genres()] == ["Science Fiction", "Fantasy"]
+
+
+def test_store_counts_are_shared_and_survive_restarts(tmp_path):
+    path = str(tmp_path / "popularity.sqlite3")
+    worker_a = create_popularity_tracker(path)
+    worker_b = create_popularity_tracker(path)
+    worker_a.record("hobbit", ["Fantasy"])
+    worker_b.record("hobbit", ["Fantasy"])
+    worker_b.record("dune", ["Science Fiction"])
+    worker_a.close()
+    worker_b.close()
+
+    restarted = create_popularity_tracker(path)
+    assert [(key, round(score, 3)) for key, score in restarted.top_books()] == [("hobbit", 2), ("dune", 1)]
+    assert [genre for genre, _ in restarted.top_genres()] == ["Fantasy", "Science Fiction"]
+    restarted.close()
+
+
+def test_store_decays_and_rebases(tmp_path, monkeypatch):
+    store = PopularityStore(str(tmp_path / "popularity.sqlite3"), half_life=DAY, batch_size=1)
+    now = time.time()
+    store.add("book", "old", 4, timestamp=now - DAY)
+    store.add("book", "new", 1, timestamp=now)
+    assert [(key, round(score, 3)) for key, score in store.top("book", 5)] == [("old", 2), ("new", 1)]
+
+    # Force a rebase on the next write; decayed counts are unchanged
+    monkeypatch.setattr(PopularityStore, "MAX_SCALE", 1.0)
+    store.add("book", "new", 2, timestamp=now + 1)
+    assert {key: round(score, 3) for key, score in store.top("book", 5)} == {"new": 3, "old": 2}
+    conn = sqlite3.connect(store.path)
+    assert conn.execute("SELECT origin FROM popularity_origin").fetchone() == (now + 1,)
+    conn.close()
+    store.close()
+
+
+def test_tracker_keeps_its_lists_if_the_store_fails(tmp_path, monkeypatch):
+    tracker = create_popularity_tracker(str(tmp_path / "popularity.sqlite3"))
+    tracker.record("hobbit")
+    assert [key for key, _ in tracker.top_books()] == ["hobbit"]
+
+    def fail(kind, n):
+        raise popularity.sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(tracker.store, "top", fail)
+    tracker.refresh()
+    assert [key for key, _ in tracker.top_books()] == ["hobbit"]
+    tracker.close()
@@ -0,0 +1,64 @@
+import time
+
+from query_cache import QueryCache, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    cache = TTLCache(maxsize=10, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=100)
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 50)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_get_or_set_computes_once():
+    cache = TTLCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_set("key", compute) == "value"
+    assert cache.get_or_set("key", compute) == "value"
+    assert calls == [1]
+
+
+def test_query_cache_clears_when_the_catalogue_version_moves():
+    version = [1]
+    cache = QueryCache(version_fn=lambda: version[0], version_check_interval=0)
+    cache.embedding("fantasy", lambda: [0.1])
+    cache.result(("fantasy", 10), lambda: ["a"])
+
+    assert cache.embedding("fantasy", lambda: [0.2]) == [0.1]
+    version[0] = 2
+    assert cache.version() == 2
+    assert cache.embedding("fantasy", lambda: [0.2]) == [0.2]
+    assert cache.result(("fantasy", 10), lambda: ["b"]) == ["b"]
+
+
+def test_query_cache_keeps_entries_if_the_version_cannot_be_read():
+    def version_fn():
+        raise RuntimeError("store unavailable")
+
+    cache = QueryCache(version_fn=lambda: 1, version_check_interval=0)
+    cache.result("key", lambda: "cached")
+    cache.version_fn = version_fn
+
+    assert cache.result("key", lambda: "recomputed") == "cached"
@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+
+from catalogue import Catalogue
+from conftest import BOOKS, StubEmbeddingFunction, chroma_id
+from lexical_index import LexicalIndex
+from search_filters import SearchFilters
+from vector_index import ChromaIndex
+
+recommendation_system = pytest.importorskip("recommendation_system")
+
+
+def make_system(collection, **kwargs):
+    catalogue = Catalogue.from_collection(collection)
+    kwargs.setdefault("lexical_index", LexicalIndex.from_catalogue(catalogue))
+    return recommendation_system.BookRecommendationSystem(
+        collection,
+        embedding_function=StubEmbeddingFunction(),
+        catalogue=catalogue,
+        batch_max_size=1,
+        **kwargs,
+    )
+
+
+def titles(books):
+    return [book["title"] for book in books]
+
+
+@pytest.mark.parametrize("query", ["The Hobbit", "Jane Austen"])
+def test_known_item_queries_never_embed(books_collection, query):
+    system = make_system(books_collection)
+
+    results = system.search_books("user", query, n_results=10)
+    batched = system.search_books_batch([query], n_results=10)
+
+    assert results and batched == [results]
+    assert system.embedding_function.embedded == 0
+
+
+def test_known_item_results_are_the_lexical_hits(books_collection):
+    system = make_system(books_collection)
+
+    assert titles(system.search_books("user", "The Hobbit", n_results=10)) == ["The Hobbit"]
+    assert set(titles(system.search_books("user", "Jane Austen", n_results=10))) == {
+        "Emma",
+        "Pride and Prejudice",
+    }
+
+
+def test_other_queries_fuse_lexical_and_vector_results(books_collection):
+    system = make_system(books_collection)
+
+    results = system.search_books("user", "desert planet", n_results=3)
+
+    assert titles(results)[0] == "Dune"
+    assert len(results) == 3
+    assert system.embedding_function.embedded == 1
+
+
+class RecordingIndex:
+    """Wraps a vector index and records the ``where`` clause of each query."""
+
+    supports_where = True
+
+    def __init__(self, index):
+        self.index = index
+        self.wheres = []
+
+    def query(self, query_embeddings, n_results, where=None):
+        self.wheres.append(where)
+        return self.index.query(query_embeddings, n_results, where)
+
+
+FILTERS = [
+    SearchFilters(genres=["Classics"]),
+    SearchFilters(genres=["Classics"], min_pages=200),
+    SearchFilters(genres=["Fantasy", "Romance"], max_pages=400, formats=["Paperback"]),
+    SearchFilters(min_pages=200, exclude_ids=[Catalogue.stable_book_id(chroma_id("Dune"))]),
+]
+
+
+def test_filters_are_pushed_down_on_current_metadata(books_collection):
+    index = RecordingIndex(ChromaIndex(books_collection))
+    system = make_system(books_collection, lexical_index=None, vector_index=index)
+    filters = SearchFilters(genres=["Classics"], min_pages=200)
+
+    system.search_books("user", "adventure", n_results=5, filters=filters)
+
+    assert system.filter_pushdown
+    assert index.wheres == [filters.to_where()]
+
+
+def test_older_metadata_falls_back_to_post_filtering(books_collection):
+    books_collection.modify(metadata={"metadata_version": 1})
+    index = RecordingIndex(ChromaIndex(books_collection))
+    system = make_system(books_collection, lexical_index=None, vector_index=index)
+
+    results = system.search_books("user", "adventure", n_results=2, filters=FILTERS[1])
+
+    assert not system.filter_pushdown
+    assert index.wheres == [None]
+    assert {book["title"] for book in results} <= {"The Lord of the Rings", "Emma", "Pride and Prejudice"}
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_pushdown_and_post_filter_agree(books_collection, filters):
+    system = make_system(books_collection, lexical_index=None)
+    queries = [list(map(float, e)) for e in StubEmbeddingFunction()(["adventure", "romance"])]
+
+    pushed = system._filtered_query(queries, 3, filters)
+    system.filter_pushdown = False
+    post_filtered = system._filtered_query(queries, 3, filters)
+
+    assert pushed == post_filtered and all(pushed)
+    for ids in pushed:
+        assert all(filters.matches(record) for record in system.catalogue.hydrate(books_collection, ids))
+
+
+def test_batch_search_matches_single_searches_in_order(books_collection):
+    system = make_system(books_collection)
+    queries = ["desert planet", "The Hobbit", "matchmaking", "desert planet"]
+
+    batched = system.search_books_batch(queries, n_results=3)
+
+    assert batched == [system.search_books("user", query, n_results=3) for query in queries]
+    assert titles(batched[1]) == ["The Hobbit"]
+
+
+def test_batch_recommendations_match_single_recommendations(books_collection):
+    system = make_system(books_collection)
+    system.add_to_view_history("reader", "Dune", ["Science Fiction"])
+    system.add_to_view_history("reader", "Emma", ["Romance", "Classics"])
+    system.add_to_view_history("fan", "The Hobbit", ["Fantasy"])
+
+    batched = system.recommend_books_batch(["fan", "newcomer", "reader"], 2)
+
+    assert list(batched) == ["fan", "newcomer", "reader"]
+    for user_id, recommendations in batched.items():
+        assert recommendations == system.recommend_books_based_on_history(user_id, 2)
+    assert not {"Dune", "Emma"} & set(titles(batched["reader"]))
+
+
+def test_taste_vectors_survive_history_eviction_and_restarts(books_collection):
+    system = make_system(books_collection)
+    for title, genres in [(book[0], book[2].split(", ")) for book in BOOKS] + [("Dune", ["Science Fiction"])]:
+        system.add_to_view_history("reader", title, genres)
+    history = system.get_user_view_history("reader")
+    assert len(history) == 5
+
+    # A restarted process rebuilds the vector from the capped history alone
+    restarted = make_system(books_collection, history_store=system.view_history)
+    np.testing.assert_allclose(
+        system.taste_vectors.get("reader", history[0]["timestamp"]),
+        restarted._taste_vector("reader", history),
+        rtol=1e-5,
+        atol=1e-6,
+    )
+
+
+def test_cold_start_lists_are_filled_from_the_catalogue(books_collection):
+    system = make_system(books_collection)
+    system.popularity.record(chroma_id("Dune"), ["Science Fiction"])
+
+    recommendations = system.recommend_books_based_on_history("newcomer", 3)
+    classics = system.recommend_books_based_on_history(
+        "newcomer", 10, SearchFilters(genres=["Classics"])
+    )
+
+    assert titles(recommendations)[0] == "Dune" and len(recommendations) == 3
+    assert len(set(titles(recommendations))) == 3
+    assert sorted(titles(classics)) == ["Emma", "Pride and Prejudice", "The Hobbit", "The Lord of the Rings"]
+    assert system.embedding_function.embedded == 0
+
+
+def test_nearest_titles_returns_catalogue_records(books_collection):
+    system = make_system(books_collection)
+
+    [record] = system.nearest_titles("Dune Science Fiction", 1)
+
+    assert record.title == "Dune" and record.chroma_id == chroma_id("Dune")
+    assert len(system.nearest_titles("Dune Science Fiction")) == len(BOOKS)
+    # Repeats are answered from the query cache
+    assert system.embedding_function.embedded == 1
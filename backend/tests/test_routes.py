@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+
+from conftest import BOOKS, chroma_id
+
+def test_batch_search_keeps_query_order(client):
+    queries = ["desert planet", "", "The Hobbit", "desert planet"]
+
+    response = client.post("/api/search/batch", json={"queries": queries, "limit": 3})
+
+    assert response.status_code == 200
+    results = response.json["results"]
+    assert len(results) == len(queries) and results[1] == []
+    for query, found in zip(queries, results):
+        if query:
+            assert found == client.get("/api/search", query_string={"q": query, "limit": 3}).json["results"]
+
+
+def test_batch_endpoints_reject_oversized_batches(client, routes, monkeypatch):
+    monkeypatch.setattr(routes, "MAX_BATCH_SIZE", 2)
+
+    search = client.post("/api/search/batch", json={"queries": ["a", "b", "c"]})
+    recommendations = client.post("/api/recommendations/batch", json={"user_ids": ["a", "b", "c"]})
+
+    assert search.status_code == recommendations.status_code == 400
+    assert "At most 2" in search.json["error"]
+
+
+def test_batch_recommendations_match_single_requests(client):
+    client.post(
+        "/api/store_search_history",
+        json={"user_id": "batch-reader", "book_title": "Dune", "genres": ["Science Fiction"]},
+    )
+
+    response = client.post(
+        "/api/recommendations/batch", json={"user_ids": ["batch-reader", "batch-newcomer"], "limit": 2}
+    )
+
+    recommendations = response.json["recommendations"]
+    assert set(recommendations) == {"batch-reader", "batch-newcomer"}
+    for user_id, books in recommendations.items():
+        assert books == client.get(f"/api/recommendations/{user_id}", query_string={"limit": 2}).json
+    assert "Dune" not in [book["title"] for book in recommendations["batch-reader"]]
+
+
+def browse(client, path, **args):
+    books, cursor, pages = [], None, 0
+    while True:
+        response = client.get(path, query_string={**args, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        books += response.json["books"]
+        cursor = response.json["next_cursor"]
+        pages += 1
+        if cursor is None:
+            return books, pages
+
+
+def test_browse_pages_through_the_catalogue_with_a_cursor(client, routes):
+    books, pages = browse(client, "/api/books", limit=2)
+
+    assert pages == 3
+    assert [int(book["id"]) for book in books] == sorted(record.book_id for record in routes.catalogue)
+    assert browse(client, "/api/debug/books", limit=2)[0] == books
+
+
+def test_browse_ends_with_a_null_cursor(client):
+    response = client.get("/api/books", query_string={"limit": 100})
+
+    assert len(response.json["books"]) == 5
+    assert response.json["next_cursor"] is None
+    last = response.json["books"][-1]["id"]
+    assert client.get("/api/books", query_string={"cursor": last}).json == {"books": [], "next_cursor": None}
+
+
+def test_browse_filters_and_rejects_bad_cursors(client):
+    books, _ = browse(client, "/api/books", limit=1, genres="Romance")
+
+    assert sorted(book["title"] for book in books) == ["Emma", "Pride and Prejudice"]
+    assert client.get("/api/books", query_string={"cursor": "abc"}).status_code == 400
+
+
+def test_export_streams_ndjson(client, routes):
+    response = client.get("/api/books/export")
+
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.mimetype == "application/x-ndjson"
+    assert "books.ndjson" in response.headers["Content-Disposition"]
+    assert sorted(row["title"] for row in rows) == sorted(book[0] for book in BOOKS)
+    assert list(rows[0]) == routes.EXPORT_FIELDS
+
+
+def test_export_streams_csv(client):
+    response = client.get("/api/books/export", query_string={"format": "csv"})
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert response.mimetype == "text/csv"
+    assert sorted(row["title"] for row in rows) == sorted(book[0] for book in BOOKS)
+    assert {row["title"]: row["author"] for row in rows}["Dune"] == "Frank Herbert"
+    assert client.get("/api/books/export", query_string={"format": "xml"}).status_code == 400
+
+
+def test_autocomplete_is_ranked_by_recorded_views(client, routes):
+    rings = routes.catalogue.by_chroma_id(chroma_id("The Lord of the Rings"))
+    routes.popularity.record(rings.chroma_id, ["Fantasy"])
+    routes.popularity.refresh()
+
+    routes.rerank_autocomplete()
+    response = client.get("/api/autocomplete", query_string={"q": "the", "limit": 2})
+
+    assert response.status_code == 200
+    assert [s["text"] for s in response.get_json()["suggestions"]] == ["The Lord of the Rings", "The Hobbit"]
+
+
+def test_book_details_falls_back_to_the_nearest_titles(client, routes, monkeypatch):
+    monkeypatch.setattr(routes.title_index, "lookup", lambda title: None)
+    monkeypatch.setattr(routes.title_index, "add", lambda title, book_id: None)
+
+    response = client.get("/api/book_details/The%20Hobbitt")
+
+    assert response.status_code == 200
+    assert response.get_json()["title"] == "The Hobbit"
+    assert client.get("/api/book_details/Zzyzx").status_code == 404
@@ -0,0 +1,57 @@
+import pytest
+
+from search_filters import SearchFilters, filter_metadata, genre_key
+
+
+def test_genre_keys_are_normalized():
+    assert genre_key(" Science Fiction ") == "genre_science_fiction"
+    assert filter_metadata(7, ["Fantasy", " "]) == {"book_id": 7, "available": True, "genre_fantasy": True}
+
+
+def test_from_mapping_parses_request_args():
+    filters = SearchFilters.from_mapping(
+        {"genre": "Fantasy, Classics", "min_pages": "200", "max_pages": "", "available": "yes", "exclude": "1,2"}
+    )
+
+    assert filters.genres == {"Fantasy", "Classics"}
+    assert filters.min_pages == 200 and filters.max_pages is None
+    assert filters.available is True
+    assert filters.exclude_ids == {1, 2}
+    assert not SearchFilters.from_mapping({})
+    with pytest.raises(ValueError):
+        SearchFilters.from_mapping({"min_pages": "many"})
+
+
+def test_to_where_combines_clauses_with_and():
+    assert SearchFilters().to_where() is None
+    assert SearchFilters(genres=["Fantasy"]).to_where() == {"genre_fantasy": {"$eq": True}}
+    assert SearchFilters(genres=["Fantasy", "Classics"], min_pages=200).to_where() == {
+        "$and": [
+            {"$or": [{"genre_classics": {"$eq": True}}, {"genre_fantasy": {"$eq": True}}]},
+            {"num_pages": {"$gte": 200}},
+        ]
+    }
+    assert SearchFilters(max_pages=300, exclude_ids=[3, 1]).to_where() == {
+        "$and": [{"num_pages": {"$lte": 300}}, {"book_id": {"$nin": [1, 3]}}]
+    }
+
+
+def test_matches_evaluates_every_filter(catalogue):
+    def titles(filters):
+        return sorted(record.title for record in catalogue if filters.matches(record))
+
+    assert titles(SearchFilters(genres=["classics"])) == [
+        "Emma", "Pride and Prejudice", "The Hobbit", "The Lord of the Rings"
+    ]
+    assert titles(SearchFilters(genres=["Classics"], min_pages=300, max_pages=400)) == ["Emma"]
+    assert titles(SearchFilters(formats=["Paperback"])) == ["Emma", "The Lord of the Rings"]
+    hobbit = next(record for record in catalogue if record.title == "The Hobbit")
+    assert "The Hobbit" not in titles(SearchFilters(exclude_ids=[hobbit.book_id]))
+    assert titles(SearchFilters(available=False)) == []
+
+
+def test_excluding_and_cache_key():
+    filters = SearchFilters(genres=["Fantasy"]).excluding([5])
+
+    assert filters.exclude_ids == {5}
+    assert filters.cache_key() == SearchFilters(genres=["Fantasy"], exclude_ids=[5]).cache_key()
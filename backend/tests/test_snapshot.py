@@ -0,0 +1,26 @@
+import pickle
+
+import snapshot
+from snapshot import CatalogueSnapshot
+
+
+def test_round_trip(catalogue, tmp_path):
+    path = str(tmp_path / "snapshot.pickle")
+    CatalogueSnapshot.build(catalogue, catalogue_version=3).save(path)
+
+    loaded = CatalogueSnapshot.load(path)
+    assert loaded.catalogue_version == 3
+    assert len(loaded.catalogue) == len(catalogue)
+    assert loaded.title_index.lookup("The Hobit") == loaded.title_index.book_id("The Hobbit")
+    assert [r["text"] for r in loaded.autocomplete.complete("dun")] == ["Dune"]
+    # The catalogue's lock is recreated on load
+    loaded.catalogue.add("f" * 32, "New Book", {"author": "Someone"})
+
+
+def test_missing_or_old_snapshots_are_ignored(tmp_path):
+    path = tmp_path / "snapshot.pickle"
+    assert CatalogueSnapshot.load(str(path)) is None
+    assert CatalogueSnapshot.load("") is None
+
+    path.write_bytes(pickle.dumps({"format": snapshot.FORMAT_VERSION - 1, "snapshot": None}))
+    assert CatalogueSnapshot.load(str(path)) is None
@@ -0,0 +1,77 @@
+import threading
+
+from startup import Lazy, Readiness, WarmUp
+
+
+def test_lazy_creates_once():
+    calls = []
+    lazy = Lazy(lambda: calls.append(1) or "value")
+
+    assert lazy.get() == "value"
+    assert lazy.get() == "value"
+    assert calls == [1]
+
+
+def test_readiness_reports_failures_and_resets():
+    readiness = Readiness(["model", "index"])
+    with readiness.track("model"):
+        pass
+    with readiness.track("index"):
+        raise RuntimeError("no index")
+
+    status = readiness.status()
+    assert status["ready"] is False
+    assert status["components"] == {"model": "ready", "index": "failed"}
+    assert status["errors"] == {"index": "no index"}
+
+    with readiness.track("index"):
+        pass
+    assert readiness.ready
+    readiness.reset("index")
+    assert not readiness.ready
+
+
+def test_warm_up_runs_once_per_process():
+    readiness = Readiness(["model"])
+    runs = []
+
+    def warm_up():
+        runs.append(1)
+        with readiness.track("model"):
+            pass
+
+    warm = WarmUp(warm_up, readiness)
+    assert warm.start(wait=True)
+    assert not warm.start(wait=True)
+    assert not warm.start()
+    assert runs == [1]
+    assert readiness.ready
+
+
+def test_warm_up_in_background_is_started_once_under_concurrency():
+    readiness = Readiness(["model"])
+    done = threading.Event()
+    runs = []
+
+    def warm_up():
+        runs.append(1)
+        with readiness.track("model"):
+            pass
+        done.set()
+
+    warm = WarmUp(warm_up, readiness)
+    threads = [threading.Thread(target=warm.start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert done.wait(2)
+    assert runs == [1]
+
+
+def test_warm_up_skips_a_ready_process():
+    readiness = Readiness([])
+    warm = WarmUp(lambda: (_ for _ in ()).throw(AssertionError("should not run")), readiness)
+
+    assert not warm.start(wait=True)
@@ -0,0 +1,74 @@
+import numpy as np
+
+from taste_vectors import TasteVectorStore
+
+
+def embeddings(n, dim=8):
+    return list(np.random.default_rng(0).normal(size=(n, dim)).astype(np.float32))
+
+
+def record(store, user_id, views):
+    """Update ``store`` with ``views`` as a history capped at its window would."""
+    for i, embedding in enumerate(views):
+        full = i >= store.window
+        store.update(
+            user_id,
+            embedding,
+            str(i),
+            previous=str(i - 1) if i else None,
+            evicted=views[i - store.window] if full else None,
+        )
+
+
+def test_a_single_view_is_its_own_taste():
+    store = TasteVectorStore()
+    (view,) = embeddings(1)
+    store.update("user", view, "0")
+
+    np.testing.assert_allclose(store.get("user", "0"), view)
+
+
+def test_newer_views_weigh_more():
+    store = TasteVectorStore(decay=0.5)
+    old, new = np.eye(2, dtype=np.float32)
+    record(store, "user", [old, new])
+
+    np.testing.assert_allclose(store.get("user", "1"), [1 / 3, 2 / 3])
+
+
+def test_updates_match_a_rebuild_of_the_window():
+    views = embeddings(12)
+    store = TasteVectorStore(decay=0.7, window=5)
+    record(store, "user", views)
+
+    rebuilt = TasteVectorStore(decay=0.7, window=5).rebuild("user", views[-5:], "11")
+    np.testing.assert_allclose(store.get("user", "11"), rebuilt, rtol=1e-5, atol=1e-6)
+    # Older views no longer count at all
+    np.testing.assert_allclose(
+        TasteVectorStore(window=5).rebuild("user", views, "11"), rebuilt, rtol=1e-6
+    )
+
+
+def test_out_of_step_updates_drop_the_vector():
+    store = TasteVectorStore(window=2)
+    views = embeddings(3)
+    record(store, "user", views[:2])
+
+    # Another process recorded a view in between
+    store.update("user", views[2], "2", previous="other")
+    assert store.get("user", "1") is None
+
+    record(store, "user", views[:2])
+    # The window is full but nothing was evicted
+    store.update("user", views[2], "2", previous="1")
+    assert store.get("user", "2") is None
+
+
+def test_get_needs_the_latest_view_and_users_are_bounded():
+    store = TasteVectorStore(max_users=2)
+    for user_id, view in zip("abc", embeddings(3)):
+        store.update(user_id, view, "0")
+
+    assert store.get("a", "0") is None
+    assert store.get("b", "1") is None
+    assert store.get("c", "0") is not None
@@ -0,0 +1,45 @@
+import pytest
+
+from title_index import TitleIndex
+
+
+@pytest.fixture
+def index(catalogue):
+    return TitleIndex.from_catalogue(catalogue)
+
+
+def test_exact_and_casefolded_lookups(index, catalogue):
+    hobbit = catalogue.titles.index("The Hobbit")
+    assert index.lookup("The Hobbit") == catalogue.chroma_ids[hobbit]
+    assert index.lookup("the hobbit") == catalogue.chroma_ids[hobbit]
+    assert index.book_id("THE HOBBIT") == catalogue.chroma_ids[hobbit]
+
+
+def test_fuzzy_lookup_finds_near_misses(index, catalogue):
+    assert index.lookup("The Hobit") == catalogue.chroma_ids[catalogue.titles.index("The Hobbit")]
+    assert index.lookup("Pride and Prejudise") == catalogue.chroma_ids[
+        catalogue.titles.index("Pride and Prejudice")
+    ]
+    assert index.lookup("Moby Dick") is None
+    # book_id never guesses
+    assert index.book_id("The Hobit") is None
+
+
+def test_fuzzy_lookup_prefers_the_closer_short_title():
+    index = TitleIndex()
+    index.add("Emma", "short")
+    index.add("Emma and the Many Adventures of a Long Title", "long")
+
+    assert index.lookup("Emmaa") == "short"
+
+
+def test_common_trigrams_do_not_nominate_candidates(monkeypatch):
+    index = TitleIndex()
+    for i in range(5):
+        index.add(f"The Book {i}", f"book{i}")
+    index.add("The Hobbit", "hobbit")
+    monkeypatch.setattr(TitleIndex, "MAX_TRIGRAM_POSTINGS", 2)
+
+    assert index.lookup("The Hobit") == "hobbit"
+    # Only common trigrams: no candidates, left to the vector fallback
+    assert index.lookup("The Boo") is None
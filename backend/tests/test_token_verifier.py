@@ -0,0 +1,170 @@
+import datetime
+import time
+
+import pytest
+
+pytest.importorskip("google.auth")
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+
+from token_verifier import InvalidTokenError, StubKeyProvider, TokenVerifier
+
+PROJECT = "library-test"
+
+
+def make_key(kid):
+    """(signer, PEM certificate) for a fresh RSA key."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=kid)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {kid: make_key(kid) for kid in ("key-1", "key-2")}
+
+
+class CountingProvider(StubKeyProvider):
+    def __init__(self, keys):
+        super().__init__(keys)
+        self.calls = 0
+
+    def get_keys(self):
+        self.calls += 1
+        return super().get_keys()
+
+
+def make_token(signer, **overrides):
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT}",
+        "aud": PROJECT,
+        "sub": "user-1",
+        "iat": now,
+        "exp": now + 3600,
+        **overrides,
+    }
+    return google_jwt.encode(signer, claims).decode()
+
+
+def verifier_for(keys, *kids):
+    return TokenVerifier(PROJECT, key_provider=CountingProvider({kid: keys[kid][1] for kid in kids}))
+
+
+def test_valid_token(keys):
+    verifier = verifier_for(keys, "key-1")
+
+    claims = verifier.verify(make_token(keys["key-1"][0]))
+
+    assert claims["uid"] == "user-1"
+    assert claims["aud"] == PROJECT
+
+
+def test_bad_signature(keys):
+    header, payload, signature = make_token(keys["key-1"][0]).split(".")
+    # Same header and claims, signature from another key
+    other = make_token(keys["key-2"][0]).split(".")[2]
+    verifier = verifier_for(keys, "key-1")
+
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(f"{header}.{payload}.{other}")
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(f"{header}.{payload}.{signature[:-4]}AAAA")
+
+
+def test_wrong_audience(keys):
+    verifier = verifier_for(keys, "key-1")
+
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(make_token(keys["key-1"][0], aud="another-project"))
+
+
+def test_wrong_issuer(keys):
+    verifier = verifier_for(keys, "key-1")
+
+    with pytest.raises(InvalidTokenError, match="issuer"):
+        verifier.verify(make_token(keys["key-1"][0], iss="https://securetoken.google.com/other"))
+
+
+def test_expired_token(keys):
+    verifier = verifier_for(keys, "key-1")
+    past = int(time.time()) - 7200
+
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(make_token(keys["key-1"][0], iat=past, exp=past + 3600))
+
+
+def test_missing_subject(keys):
+    verifier = verifier_for(keys, "key-1")
+
+    with pytest.raises(InvalidTokenError, match="subject"):
+        verifier.verify(make_token(keys["key-1"][0], sub=""))
+
+
+def test_kid_rotation(keys):
+    verifier = verifier_for(keys, "key-1")
+    rotated = make_token(keys["key-2"][0])
+
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(rotated)
+
+    # The provider now publishes both keys, as during a Firebase rotation
+    verifier.key_provider.keys = {kid: cert for kid, (_, cert) in keys.items()}
+    assert verifier.verify(rotated)["uid"] == "user-1"
+    assert verifier.verify(make_token(keys["key-1"][0], sub="user-2"))["uid"] == "user-2"
+
+
+def test_verified_tokens_are_cached(keys):
+    verifier = verifier_for(keys, "key-1")
+    token = make_token(keys["key-1"][0])
+
+    assert verifier.cached(token) is None
+    first = verifier.verify(token)
+    assert verifier.key_provider.calls == 1
+
+    assert verifier.cached(token) == first
+    assert verifier.verify(token) == first
+    assert verifier.key_provider.calls == 1
+    assert verifier.tokens.stats()["hits"] == 2
+
+
+def test_failed_tokens_are_not_cached(keys):
+    verifier = verifier_for(keys, "key-1")
+    token = make_token(keys["key-1"][0], aud="another-project")
+
+    for _ in range(2):
+        with pytest.raises(InvalidTokenError):
+            verifier.verify(token)
+    assert verifier.cached(token) is None
+    assert verifier.key_provider.calls == 2
+
+
+def test_cached_claims_expire_with_the_token(keys, monkeypatch):
+    verifier = verifier_for(keys, "key-1")
+    token = make_token(keys["key-1"][0], exp=int(time.time()) + 60)
+    verifier.verify(token)
+
+    real_monotonic = time.monotonic
+    monkeypatch.setattr(time, "monotonic", lambda: real_monotonic() + 120)
+    assert verifier.cached(token) is None
@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+
+import vector_index
+from database import open_shards, upsert_to_shards
+from vector_index import QuantizedIndex, ShardedIndex
+
+
+def served_shard():
+    """Runs in a pool process: its pid and the shard it opened."""
+    return os.getpid(), vector_index._worker_shard
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(40, 8)).astype(np.float32)
+    return [f"book-{i}" for i in range(len(embeddings))], embeddings
+
+
+@pytest.fixture(scope="module")
+def sharded(tmp_path_factory, vectors):
+    # Module-scoped: starting a spawned process per shard is slow
+    ids, embeddings = vectors
+    db_path = str(tmp_path_factory.mktemp("sharded") / "db")
+    shards = open_shards(db_path, 4)
+    upsert_to_shards(shards, ids, embeddings.tolist(), [{"num_pages": i} for i in range(len(ids))])
+    index = ShardedIndex(db_path, 4)
+    yield index
+    index.shutdown()
+
+
+def test_each_pool_process_serves_one_shard(sharded, vectors):
+    _, embeddings = vectors
+    for query in embeddings[:20]:
+        sharded.query([query], 3)
+
+    served = [executor.submit(served_shard).result() for executor in sharded._executors()]
+    assert [shard for _, shard in served] == [0, 1, 2, 3]
+    assert len({pid for pid, _ in served}) == 4
+
+
+def test_merged_results_match_an_exact_search(sharded, vectors):
+    ids, embeddings = vectors
+    queries = embeddings[:3] + 0.1
+
+    results = sharded.query(queries, 5)
+
+    for query, found in zip(queries, results):
+        distances = ((embeddings - query) ** 2).sum(axis=1)
+        assert found == [ids[i] for i in np.argsort(distances)[:5]]
+
+
+def test_where_is_applied_on_every_shard(sharded, vectors):
+    _, embeddings = vectors
+    [found] = sharded.query(embeddings[:1], 10, where={"num_pages": {"$lt": 5}})
+    assert sorted(found) == [f"book-{i}" for i in range(5)]
+
+
+def normalized(embeddings):
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def exact_top(embeddings, query, n):
+    return list(np.argsort(-(normalized(embeddings) @ (query / np.linalg.norm(query))))[:n])
+
+
+def test_vector_index_is_abstract():
+    with pytest.raises(TypeError):
+        vector_index.VectorIndex()
+
+
+def test_quantized_index_round_trip(tmp_path, vectors):
+    ids, embeddings = vectors
+    QuantizedIndex.build(ids, normalized(embeddings), str(tmp_path), catalogue_version=3)
+
+    index = QuantizedIndex.load(str(tmp_path), rerank_factor=2)
+
+    assert len(index) == len(ids) and index.catalogue_version == 3
+    assert isinstance(index.codes, np.memmap) and isinstance(index.vectors, np.memmap)
+    assert index.query(embeddings[:2], 1) == [[ids[0]], [ids[1]]]
+
+
+def test_quantized_rerank_matches_exact_search():
+    rng = np.random.default_rng(1)
+    embeddings = normalized(rng.normal(size=(500, 32)).astype(np.float32))
+    ids = [str(i) for i in range(len(embeddings))]
+    codes, scales = vector_index.quantize(embeddings)
+    index = QuantizedIndex(ids, codes, scales, embeddings, rerank_factor=4)
+    queries = rng.normal(size=(20, 32)).astype(np.float32)
+
+    results = index.query(queries, 10)
+
+    recall = np.mean([
+        len(set(found) & {ids[i] for i in exact_top(embeddings, query, 10)}) / 10
+        for query, found in zip(queries, results)
+    ])
+    assert recall >= 0.95
+    # Re-ranking is exact, so whatever is returned is in exact order
+    for query, found in zip(queries, results):
+        scores = embeddings[[int(i) for i in found]] @ (query / np.linalg.norm(query))
+        assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_quantized_index_scans_in_blocks(monkeypatch, vectors):
+    ids, embeddings = vectors
+    embeddings = normalized(embeddings)
+    codes, scales = vector_index.quantize(embeddings)
+    index = QuantizedIndex(ids, codes, scales, embeddings)
+    expected = index.query(embeddings[:3], 5)
+
+    monkeypatch.setattr(QuantizedIndex, "BLOCK_SIZE", 7)
+    assert index.query(embeddings[:3], 5) == expected
+
+
+def test_quantized_index_rejects_where_clauses(vectors):
+    ids, embeddings = vectors
+    codes, scales = vector_index.quantize(embeddings)
+    index = QuantizedIndex(ids, codes, scales, embeddings)
+
+    assert not index.supports_where
+    with pytest.raises(ValueError):
+        index.query(embeddings[:1], 3, where={"num_pages": {"$lt": 5}})
+    assert QuantizedIndex([], codes[:0], scales[:0], embeddings[:0]).query(embeddings[:1], 3) == [[]]
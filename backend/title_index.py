@@ -0,0 +1,117 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TitleIndex:
+    """In-process lookup table from book title to its collection id."""
+
+    MAX_FUZZY_CANDIDATES = 20
+    # Trigrams in more titles than this ("the", " th") do not nominate candidates
+    MAX_TRIGRAM_POSTINGS = 1000
+
+    def __init__(self):
+        self.ids: Dict[str, str] = {}  # exact title -> collection id
+        self.folded: Dict[str, str] = {}  # casefolded title -> exact title
+        self.trigrams: Dict[str, set] = defaultdict(set)  # trigram -> casefolded titles
+        self.gram_counts: Dict[str, int] = {}  # casefolded title -> number of trigrams
+
+    @classmethod
+    def from_catalogue(cls, catalogue) -> "TitleIndex":
+        """Build the index from every book in the in-memory catalogue."""
+        index = cls()
+        for record in catalogue:
+            index.add(record.title, record.chroma_id)
+        logger.info(f"Title index built with {len(index.ids)} titles")
+        return index
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        padded = f"  {text} "
+        return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, title: str, book_id: str) -> None:
+        """Add or replace a single title in the index."""
+        if not title:
+            return
+        self.ids[title] = book_id
+        folded = title.casefold()
+        self.folded.setdefault(folded, title)
+        grams = self._trigrams(folded)
+        self.gram_counts[folded] = len(grams)
+        for gram in grams:
+            self.trigrams[gram].add(folded)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def book_id(self, title: str) -> Optional[str]:
+        """Collection id for an exact or case-folded title, if known."""
+        if title in self.ids:
+            return self.ids[title]
+        return self.ids.get(self.folded.get(title.casefold(), ""))
+
+    def lookup(self, title: str, cutoff: float = 0.6) -> Optional[str]:
+        """Return the collection id of an exact, case-folded or fuzzy match."""
+        if title in self.ids:
+            return self.ids[title]
+
+        folded = title.casefold()
+        if folded in self.folded:
+            return self.ids[self.folded[folded]]
+
+        match = self._fuzzy_match(folded, cutoff)
+        if match:
+            return self.ids[match]
+        return None
+
+    def _fuzzy_match(self, folded: str, cutoff: float) -> Optional[str]:
+        """Rank titles by trigram Dice similarity, then confirm with difflib.
+
+        Only rare trigrams nominate candidates; common ones are checked
+        against the candidates by set membership, so a near-miss costs
+        the same however many titles share its common words.
+        """
+        query_grams = self._trigrams(folded)
+        rare, common = [], []
+        for gram in query_grams:
+            titles = self.trigrams.get(gram)
+            if titles:
+                (rare if len(titles) <= self.MAX_TRIGRAM_POSTINGS else common).append(titles)
+
+        shared = defaultdict(int)
+        for titles in rare:
+            for candidate in titles:
+                shared[candidate] += 1
+        if not shared:
+            return None
+        for titles in common:
+            for candidate in shared:
+                if candidate in titles:
+                    shared[candidate] += 1
+
+        # Dice coefficient, so long titles do not win on shared count alone
+        dice = {
+            candidate: 2 * count / (len(query_grams) + self.gram_counts[candidate])
+            for candidate, count in shared.items()
+        }
+        candidates: List[str] = heapq.nlargest(self.MAX_FUZZY_CANDIDATES, dice, key=dice.get)
+
+        best, best_score = None, cutoff
+        matcher = SequenceMatcher()
+        matcher.set_seq2(folded)
+        for candidate in candidates:
+            matcher.set_seq1(candidate)
+            if matcher.real_quick_ratio() < best_score:
+                continue
+            if matcher.quick_ratio() < best_score:
+                continue
+            score = matcher.ratio()
+            if score >= best_score:
+                best, best_score = candidate, score
+
+        return self.folded[best] if best else None
@@ -0,0 +1,124 @@
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.request
+import logging
+from google.auth import jwt as google_jwt
+from query_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_CERTS_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/"
+    "securetoken@system.gserviceaccount.com"
+)
+
+
+class InvalidTokenError(ValueError):
+    """Raised when an ID token fails signature or claim checks."""
+
+
+class StubKeyProvider:
+    """Fixed ``{kid: PEM certificate}`` mapping for offline use and tests."""
+
+    def __init__(self, keys: Dict[str, str]):
+        self.keys = keys
+
+    def get_keys(self) -> Dict[str, str]:
+        return self.keys
+
+
+class GoogleCertificateProvider:
+    """Firebase signing certificates, re-fetched only when their max-age expires.
+
+    If a refresh fails the previous certificates are kept until the next try.
+    """
+
+    def __init__(self, url: str = FIREBASE_CERTS_URL, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._keys: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_keys(self) -> Dict[str, str]:
+        with self._lock:
+            if time.monotonic() >= self._expires_at:
+                self._refresh()
+            return self._keys
+
+    def _refresh(self) -> None:
+        try:
+            with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+                keys = json.loads(response.read().decode("utf-8"))
+                cache_control = response.headers.get("Cache-Control", "")
+        except Exception as e:
+            if not self._keys:
+                raise
+            logger.error(f"Error refreshing Firebase certificates: {e}")
+            self._expires_at = time.monotonic() + 60
+            return
+
+        max_age = re.search(r"max-age=(\d+)", cache_control)
+        self._keys = keys
+        self._expires_at = time.monotonic() + (int(max_age.group(1)) if max_age else 3600)
+        logger.info(f"Fetched {len(keys)} Firebase signing certificates")
+
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens locally and memoizes them until they expire.
+
+    Decoded tokens are kept in a bounded LRU keyed by a SHA-256 of the
+    token, so the raw token is never held as a cache key.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        key_provider=None,
+        maxsize: int = 10_000,
+        clock_skew: int = 0,
+    ):
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.key_provider = key_provider or GoogleCertificateProvider()
+        self.clock_skew = clock_skew
+        self.tokens = TTLCache(maxsize=maxsize, ttl=None)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def cached(self, token: str) -> Optional[Dict[str, Any]]:
+        """Decoded claims if this token was already verified and has not expired."""
+        return self.tokens.get(self._key(token))
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        key = self._key(token)
+        claims = self.tokens.get(key)
+        if claims is not None:
+            return claims
+
+        try:
+            claims = google_jwt.decode(
+                token,
+                certs=self.key_provider.get_keys(),
+                audience=self.project_id,
+                clock_skew_in_seconds=self.clock_skew,
+            )
+        except ValueError as e:
+            raise InvalidTokenError(str(e))
+
+        if claims.get("iss") != self.issuer:
+            raise InvalidTokenError(f"Token has incorrect issuer: {claims.get('iss')}")
+        if not claims.get("sub") or len(claims["sub"]) > 128:
+            raise InvalidTokenError("Token has an invalid subject")
+        claims["uid"] = claims["sub"]
+
+        remaining = claims["exp"] - time.time()
+        if remaining > 0:
+            self.tokens.set(key, claims, ttl=remaining)
+        return claims
@@ -0,0 +1,289 @@
+"""Vector index backends used by BookRecommendationSystem.
+
+``ChromaIndex`` queries the ``books`` collection. ``ShardedIndex`` spreads
+the same query over ``books_shard_<i>`` collections searched in parallel,
+each by a process of its own. ``QuantizedIndex`` is an
+in-process alternative: int8 vectors with a per-row scale in a
+memory-mapped NumPy file are scanned to pick candidates, which are then
+re-ranked exactly against float32 vectors read from a second memory map.
+Build it from the collection with:
+
+    python vector_index.py --db db_storage --out quantized_index
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+import numpy as np
+import chromadb
+import logging
+from similar_books import load_embeddings
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "D:\\CITL project\\library-management\\backend\\db_storage"
+OUT_PATH = "D:\\CITL project\\library-management\\backend\\quantized_index"
+
+CODES_FILE = "codes.int8.npy"
+SCALES_FILE = "scales.npy"
+VECTORS_FILE = "vectors.f32.npy"
+MANIFEST_FILE = "manifest.json"
+
+
+class VectorIndex(ABC):
+    """Nearest-neighbour lookup over book embeddings, returning collection ids."""
+
+    # Whether ``query`` accepts a Chroma ``where`` clause
+    supports_where = False
+
+    @abstractmethod
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[List[str]]:
+        """Ids of the ``n_results`` nearest books for each query embedding."""
+
+
+class ChromaIndex(VectorIndex):
+    """The collection's own HNSW index."""
+
+    supports_where = True
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def query(self, query_embeddings, n_results, where=None):
+        kwargs = {"where": where} if where else {}
+        results = self.collection.query(
+            query_embeddings=query_embeddings, n_results=n_results, include=[], **kwargs
+        )
+        return results["ids"]
+
+
+def shard_name(shard: int) -> str:
+    return f"books_shard_{shard}"
+
+
+def shard_for(chroma_id: str, shard_count: int) -> int:
+    """Shard holding ``chroma_id``; stable across processes and runs."""
+    return zlib.crc32(chroma_id.encode("utf-8")) % shard_count
+
+
+# The one shard collection a pool process serves, opened by its initializer
+_worker_shard: Optional[int] = None
+_worker_collection = None
+
+
+def _init_shard_worker(db_path: str, shard: int) -> None:
+    global _worker_shard, _worker_collection
+    client = chromadb.PersistentClient(path=db_path)
+    _worker_shard, _worker_collection = shard, client.get_collection(shard_name(shard))
+
+
+def _search_shard(query_embeddings, n_results: int, where) -> tuple:
+    """Runs in a pool process: (ids, distances) per query for its shard."""
+    kwargs = {"where": where} if where else {}
+    results = _worker_collection.query(
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        include=["distances"],
+        **kwargs,
+    )
+    return results["ids"], results["distances"]
+
+
+class ShardedIndex(VectorIndex):
+    """Scatter-gather over shard collections written by ``database.py --shards``.
+
+    Every shard has a single-process pool of its own, so each process
+    holds one shard and the shards are searched on separate cores. A query
+    is sent to all shards at once and the per-shard top-k lists are merged
+    by distance.
+    """
+
+    supports_where = True
+
+    def __init__(self, db_path: str, shard_count: int):
+        self.db_path = db_path
+        self.shard_count = shard_count
+        self._pools: List[ProcessPoolExecutor] = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _executors(self) -> List[ProcessPoolExecutor]:
+        # Created per process: pools inherited over fork have no live workers
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    context = multiprocessing.get_context("spawn")
+                    self._pools = [
+                        ProcessPoolExecutor(
+                            max_workers=1,
+                            mp_context=context,
+                            initializer=_init_shard_worker,
+                            initargs=(self.db_path, shard),
+                        )
+                        for shard in range(self.shard_count)
+                    ]
+                    self._pid = os.getpid()
+        return self._pools
+
+    def query(self, query_embeddings, n_results, where=None):
+        query_embeddings = [list(map(float, q)) for q in query_embeddings]
+        futures = [
+            executor.submit(_search_shard, query_embeddings, n_results, where)
+            for executor in self._executors()
+        ]
+        per_shard = [future.result() for future in futures]
+
+        results = []
+        for i in range(len(query_embeddings)):
+            candidates = (
+                (distance, chroma_id)
+                for ids, distances in per_shard
+                for chroma_id, distance in zip(ids[i], distances[i])
+            )
+            results.append(
+                [chroma_id for _, chroma_id in heapq.nsmallest(n_results, candidates)]
+            )
+        return results
+
+    def shutdown(self) -> None:
+        if self._pid == os.getpid():
+            for executor in self._pools:
+                executor.shutdown(wait=False)
+
+
+def quantize(vectors: np.ndarray):
+    """Symmetric per-row int8 quantization; returns (codes, scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedIndex(VectorIndex):
+    """Exhaustive int8 scan with exact float32 re-ranking of the best candidates.
+
+    Vectors are L2-normalized, so inner product ranks like the collection's
+    distance. The int8 codes are a quarter of the float store and are the
+    only data touched for every query; float rows are paged in only for
+    the ``rerank_factor * n_results`` candidates.
+    """
+
+    # Rows converted and scored per matrix product
+    BLOCK_SIZE = 65536
+
+    def __init__(
+        self,
+        ids: List[str],
+        codes: np.ndarray,
+        scales: np.ndarray,
+        vectors: np.ndarray,
+        rerank_factor: int = 4,
+        catalogue_version=None,
+    ):
+        self.ids = ids
+        self.codes = codes
+        self.scales = scales
+        self.vectors = vectors
+        self.rerank_factor = rerank_factor
+        self.catalogue_version = catalogue_version
+
+    @classmethod
+    def load(cls, path: str, rerank_factor: int = 4) -> "QuantizedIndex":
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        index = cls(
+            manifest["ids"],
+            np.load(os.path.join(path, CODES_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, SCALES_FILE)),
+            np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r"),
+            rerank_factor=rerank_factor,
+            catalogue_version=manifest.get("catalogue_version"),
+        )
+        logger.info(f"Quantized index loaded with {len(index)} vectors from {path}")
+        return index
+
+    @staticmethod
+    def build(ids: List[str], embeddings: np.ndarray, path: str, catalogue_version=None) -> None:
+        """Write codes, scales and float vectors for normalized ``embeddings``."""
+        os.makedirs(path, exist_ok=True)
+        codes, scales = quantize(embeddings)
+        # Write next to the live files, then swap, so running servers keep their maps
+        for name, array in ((CODES_FILE, codes), (SCALES_FILE, scales), (VECTORS_FILE, embeddings)):
+            tmp_path = os.path.join(path, f"tmp.{name}")
+            np.save(tmp_path, array)
+            os.replace(tmp_path, os.path.join(path, name))
+        with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+            json.dump(
+                {"ids": ids, "dim": int(embeddings.shape[1]), "catalogue_version": catalogue_version},
+                f,
+            )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _candidates(self, queries: np.ndarray, n_candidates: int) -> np.ndarray:
+        """Approximate top candidate rows per query from the int8 codes."""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.ids), self.BLOCK_SIZE):
+            end = min(start + self.BLOCK_SIZE, len(self.ids))
+            block = np.asarray(self.codes[start:end], dtype=np.float32)
+            scores = (queries @ block.T) * self.scales[start:end]
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate(
+                [best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))],
+                axis=1,
+            )
+            keep = min(n_candidates, scores.shape[1])
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        return best_rows
+
+    def query(self, query_embeddings, n_results, where=None):
+        if where:
+            raise ValueError("QuantizedIndex does not evaluate where clauses")
+        if not self.ids or n_results <= 0:
+            return [[] for _ in query_embeddings]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1, norms)
+
+        candidates = self._candidates(queries, n_results * self.rerank_factor)
+        results = []
+        for query, rows in zip(queries, candidates):
+            rows = np.sort(rows)  # sequential reads from the float memory map
+            exact = np.asarray(self.vectors[rows]) @ query
+            order = np.argsort(-exact)[:n_results]
+            results.append([self.ids[row] for row in rows[order]])
+        return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the in-process quantized vector index")
+    parser.add_argument("--db", default=DB_PATH, help="ChromaDB storage directory")
+    parser.add_argument("--out", default=OUT_PATH, help="Directory for the index files")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start_time = time.time()
+    collection = chromadb.PersistentClient(path=args.db).get_collection("books")
+    ids, embeddings = load_embeddings(collection)
+    QuantizedIndex.build(
+        ids, embeddings, args.out, (collection.metadata or {}).get("catalogue_version")
+    )
+    print(f"Quantized index for {len(ids)} books written in {time.time() - start_time:.2f}s")